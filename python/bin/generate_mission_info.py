@@ -1,6 +1,8 @@
+import numpy as np
 from deca.db_core import VfsDatabase
 from deca.db_processor import vfs_structure_open
 from deca.ff_adf import AdfDatabase
+from deca.ff_adf_columns import adf_columns
 from deca.digest import process_translation_adf
 
 vfs: VfsDatabase = vfs_structure_open('/home/krys/prj/work/gz/project.json')
@@ -11,45 +13,34 @@ vnode = vfs.nodes_where_match(v_path=b'text/master_eng.stringlookup')[0]
 tr = process_translation_adf(vfs, adf_db, vnode)
 
 vnode = vfs.nodes_where_match(v_path=b'missions/missions.group.hpmissionsc')[0]
-adf = adf_db.read_node(vfs, vnode)
+adf = adf_db.read_node(vfs, vnode, lazy=True)
+missions = adf_columns(adf.table_instance_values[0]['Missions'])
 
 
-class GZMission:
-    def __init__(self, tr, v):
-        self.id = v.value['Id'].value
+def translate(hash_strings):
+    # each distinct string is translated once
+    strings, inverse = np.unique(hash_strings.astype(np.bytes_), return_inverse=True)
+    strings = [s.decode('utf-8') for s in strings.tolist()]
+    strings = np.array([tr.get(s, s).replace('\n', '<br/>') for s in strings], dtype=object)
+    return strings[inverse.reshape(-1)]
 
-        mission_name = v.value['Name'].hash_string.decode('utf-8')
-        mission_name_short = v.value['NameShort'].hash_string.decode('utf-8')
-        mission_summary = v.value['Summary'].hash_string.decode('utf-8')
-        mission_description = v.value['Description'].hash_string.decode('utf-8')
 
-        self.name = tr.get(mission_name, mission_name).replace('\n', '<br/>')
-        self.name_short = tr.get(mission_name_short, mission_name_short).replace('\n', '<br/>')
-        self.summary = tr.get(mission_summary, mission_summary).replace('\n', '<br/>')
-        self.description = tr.get(mission_description, mission_description).replace('\n', '<br/>')
+columns = {
+    'id': missions['Id'],
+    'name': translate(missions['Name.hash_string']),
+    'name_short': translate(missions['NameShort.hash_string']),
+    'summary': translate(missions['Summary.hash_string']),
+    'description': translate(missions['Description.hash_string']),
+    'dep_required': missions['DependenciesRequired'],
+    'dep_optional': missions['DependenciesOptional'],
+}
 
-        self.dep_required = v.value['DependenciesRequired'].value
-        self.dep_optional = v.value['DependenciesOptional'].value
-
-    def __repr__(self):
-        str = ''
-        str += f'{self.id}\n'
-        str += f'  {self.name}\n'
-        str += f'  {self.name_short}\n'
-        str += f'  {self.summary}\n'
-        str += f'  {self.description}\n'
-        str += f'  {self.dep_required}\n'
-        str += f'  {self.dep_optional}\n'
-
-        return str
-
-
-missions = {}
-for mraw in adf.table_instance_full_values[0].value['Missions'].value:
-    mission = GZMission(tr, mraw)
-    missions[mission.id] = mission
+# the last mission of an id wins
+rows = {}
+for row in zip(*[column.tolist() for column in columns.values()]):
+    rows[row[0]] = row
 
 with open('missions.tsv', 'w') as f:
-    f.write('id\tname\tname_short\tsummary\tdescription\tdep_required\tdep_optional\n')
-    for k, v in missions.items():
-        f.write(f'{v.id}\t{v.name}\t{v.name_short}\t{v.summary}\t{v.description}\t{v.dep_required}\t{v.dep_optional}\n')
+    f.write('\t'.join(columns.keys()) + '\n')
+    for row in rows.values():
+        f.write('\t'.join(str(v) for v in row) + '\n')
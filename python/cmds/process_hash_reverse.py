@@ -0,0 +1,28 @@
+import argparse
+import os
+from deca.db_processor import VfsProcessor
+from deca.hash_reverse import HashReverser
+from deca.util import Logger
+
+
+# reverse unmatched v_hashes of a processed project, can be stopped and run again to resume
+#   python process_hash_reverse.py ../work/gz/project.json '{prefix}{word}_{nn:02d}.{ext}' '{prefix}{word}.{ext}'
+parser = argparse.ArgumentParser(description='Reverse unmatched v_hashes using name templates')
+parser.add_argument('project_file')
+parser.add_argument('templates', nargs='*', help='fields: {prefix} {word} {ext}, other fields are numbers, {nn:02d}')
+parser.add_argument('--restart', action='store_true', help='mine tokens again and restart the given templates')
+parser.add_argument('--time-limit', type=float, default=None, help='seconds')
+parser.add_argument('--chunk-size', type=int, default=1 << 24)
+parser.add_argument('--number-count', type=int, default=100)
+parser.add_argument('--max-tokens', type=int, default=1000)
+args = parser.parse_args()
+
+working_dir = os.path.join(os.path.split(args.project_file)[0], '')
+logger = Logger(working_dir)
+vfs = VfsProcessor(args.project_file, working_dir, logger)
+
+reverser = HashReverser(
+    vfs, logger, chunk_size=args.chunk_size, number_count=args.number_count, max_tokens=args.max_tokens)
+reverser.jobs_add(args.templates, restart=args.restart)
+v_hashes = reverser.run(time_limit=args.time_limit)
+reverser.apply(v_hashes)
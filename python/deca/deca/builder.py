@@ -242,16 +242,19 @@ class Builder:
                 if len(vnodes) == 0:
                     print('TODO: WARNING: FILE {} NOT HANDLED'.format(v_path))
                 else:
+                    # parents and grandparents of all the nodes of the v_path in one query
+                    ancestors = vfs.nodes_ancestors_where_uids([vnode.uid for vnode in vnodes])
+
                     vnode: VfsNode
                     for vnode in vnodes:
                         pid = vnode.pid
                         if pid is not None:
-                            pnode: VfsNode = vfs.node_where_uid(pid)
+                            pnode: VfsNode = ancestors[pid]
 
                             if pnode.file_type == FTYPE_GDCBODY:
                                 # handle case of gdcc files
                                 pid = pnode.pid
-                                pnode = vfs.node_where_uid(pid)
+                                pnode = ancestors[pid]
 
                             if pnode.file_type != FTYPE_ARC and pnode.file_type != FTYPE_TAB:
                                 if pnode.file_type is None:
@@ -267,8 +270,7 @@ class Builder:
         if subset is not None:
             print('CALCULATING SUBSET')
             subset_vpaths = set()
-            for uid in subset:
-                vnode: VfsNode = vfs.node_where_uid(uid)
+            for vnode in vfs.nodes_where_uids(subset):
                 subset_vpaths.add(vnode.v_path)
 
             depends_keep = set()
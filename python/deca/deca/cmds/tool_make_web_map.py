@@ -474,7 +474,7 @@ class ToolMakeWebMap:
             fn = tileo[0]
             vnode = self.vfs.nodes_where_match(v_path=fn)[0]
 
-            bmp_adf = self.adf_db.read_node(self.vfs, vnode)
+            bmp_adf = self.adf_db.read_node(self.vfs, vnode, lazy=True)
 
             bitfield = bmp_adf.table_instance_values[0]['Layers'][0]['Bitfield']
             bitfield = np.asarray(bitfield, dtype=np.uint32).data
@@ -532,7 +532,7 @@ class ToolMakeWebMap:
         # LOAD from global/collection.collectionc
         # todo dump of different vnodes, one in gdcc is stripped
         vnode = self.vfs.nodes_where_match(v_path=b'global/collection.collectionc')[0]
-        adf = self.adf_db.read_node(self.vfs, vnode)
+        adf = self.adf_db.read_node(self.vfs, vnode, lazy=True)
         collectables = []
         for v in adf.table_instance_values[0]['Collectibles']:
             obj_id = v['ID']
@@ -575,7 +575,7 @@ class ToolMakeWebMap:
             print('PROCESSING: {}'.format(fn))
             vnodes = self.vfs.nodes_where_match(v_path=fn)
             vnode = vnodes[0]
-            adf = self.adf_db.read_node(self.vfs, vnode)
+            adf = self.adf_db.read_node(self.vfs, vnode, lazy=True)
             aabb = AABB(all6=adf.table_instance_values[0]['AABB'])
             border = [
                 [aabb.min[0], aabb.min[2]],
@@ -1,6 +1,7 @@
 import os
 import multiprocessing
 import queue
+import threading
 import time
 import sys
 import traceback
@@ -10,17 +11,19 @@ from typing import List, Optional, Callable
 
 from .file import ArchiveFile
 from .db_core import VfsDatabase, VfsNode, language_codes, node_flag_v_hash_type_4, node_flag_v_hash_type_8
-from .db_wrap import DbWrap, determine_file_type, determine_file_type_by_name
+from .db_wrap import DbWrap, DbWrapBatch, determine_file_type, determine_file_type_by_name
+from .decompress_cache import DECOMPRESS_CACHE_NONE
 from .db_types import *
 from .ff_types import *
 from .errors import *
 from .ff_txt import load_json
-from .ff_adf import GdcArchiveEntry, TypeDef, MemberDef
+from .ff_adf import AdfDatabase, GdcArchiveEntry, TypeDef, MemberDef
 from .ff_rtpc import RtpcVisitorGatherStrings, k_type_event, k_type_objid, k_type_str, parse_prop_data
 from .ff_arc_tab import tab_file_load, TabEntryFileBase
 from .ff_sarc import FileSarc, EntrySarc
 from .ff_gtoc import process_buffer_gtoc, GtocArchiveEntry, GtocFileEntry
 from .util import remove_prefix_if_present, remove_suffix_if_present
+from .util import log_level_warning, log_level_log, log_level_trace
 from .kaitai.gfx import Gfx
 
 print_node_info = False
@@ -99,6 +102,8 @@ class RtpcGatherObjectEventStringInfo(RtpcVisitorGatherStrings):
 class LogWrapper:
     def __init__(self, logger):
         self._logger = logger
+        self.status_interval_sec = 5.0
+        self._status_last = None
 
     def log(self, msg):
         self._logger.log(msg)
@@ -106,18 +111,99 @@ class LogWrapper:
     def trace(self, msg):
         self._logger.trace(msg)
 
+    def error(self, msg):
+        self._logger.error(msg)
+
     def status(self, i, n):
-        self._logger.log(f'STATUS: {i} of {n}')
+        curr_time = time.time()
+        if i >= n or self._status_last is None or self._status_last + self.status_interval_sec < curr_time:
+            self._status_last = curr_time
+            self._logger.log(f'STATUS: {i} of {n}')
 
     def exception(self, exc):
         self._logger.error(f'EXCEPTION {exc}')
 
 
+class DbWriter:
+    """
+    Single writer for the results of the worker processes. Workers send their DbWrap changes as DbWrapBatch
+    messages, the writer thread merges whatever is queued and applies it with its own connection, so the workers
+    never wait on the database write lock.
+    """
+    def __init__(self, project_file, working_dir, logger, max_batch_size=100000, db_profile=None):
+        self.project_file = project_file
+        self.working_dir = working_dir
+        self.logger = logger
+        self.max_batch_size = max_batch_size
+        self.db_profile = db_profile
+        self.exception = None
+        self._q_batches = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='DbWriter', daemon=True)
+        self._thread.start()
+
+    def put(self, batch: DbWrapBatch):
+        self._q_batches.put(batch)
+
+    def flush(self):
+        # wait until all queued batches are in the database
+        self._q_batches.join()
+
+    def shutdown(self):
+        if self._thread is not None:
+            self._q_batches.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        vfs = VfsDatabase(
+            self.project_file, self.working_dir, self.logger,
+            max_uncompressed_cache_size=0, decompress_cache=DECOMPRESS_CACHE_NONE, db_profile=self.db_profile)
+        try:
+            keep_running = True
+            while keep_running:
+                batch = self._q_batches.get()
+                n_batches = 1
+                if batch is None:
+                    keep_running = False
+                    batch = DbWrapBatch()
+
+                # merge what is already waiting into one larger batch
+                while keep_running and len(batch) < self.max_batch_size:
+                    try:
+                        other = self._q_batches.get(block=False)
+                    except queue.Empty:
+                        break
+                    n_batches += 1
+                    if other is None:
+                        keep_running = False
+                    else:
+                        batch.merge(other)
+
+                try:
+                    if self.exception is None:
+                        t0 = time.time()
+                        batch.apply(vfs, self.logger)
+                        self.logger.debug('DbWriter: applied {} batches, {} records in {:0.3f} seconds'.format(
+                            n_batches, len(batch), time.time() - t0))
+                except Exception as exc:
+                    self.exception = exc
+                    self.logger.error('DbWriter: EXCEPTION: {}'.format(traceback.format_exc()))
+                finally:
+                    for i in range(n_batches):
+                        self._q_batches.task_done()
+        finally:
+            vfs.shutdown()
+
+
 class MultiProcessControl:
-    def __init__(self, project_file, working_dir, logger):
+    def __init__(self, project_file, working_dir, logger, db_profile=None):
         self.project_file = project_file
         self.working_dir = working_dir
         self.logger = logger
+        self.db_profile = db_profile
         self.progress_update_time_sec = 5.0
 
         # assuming hyper-threading exists and slows down processing
@@ -125,16 +211,64 @@ class MultiProcessControl:
         # self.mp_n_processes = max(1, 2 * multiprocessing.cpu_count() // 4)
         self.mp_n_processes = max(1, 3 * multiprocessing.cpu_count() // 4)
 
-    def do_map(self, cmd, params, step_id=None, idle_call: Optional[Callable] = None):
-        self.logger.log(f'Manager: "{cmd}" with {len(params)} parameters using {self.mp_n_processes} processes')
-
-        indexes = [params[v::self.mp_n_processes] for v in range(0, self.mp_n_processes)]
+        # split the in memory uncompressed cache budget across the worker processes
+        self.max_uncompressed_cache_size = 2 * 1024**3
+
+        # do_map work chunks, a chunk is the unit handed to an idle process and committed to the db in one go
+        self.mp_chunk_factor = 4
+        self.mp_chunk_min_size = 8
+        self.mp_chunk_max_size = 4096
+        self.mp_result_wait_time_sec = 0.5
+
+        # worker pool, see pool_start
+        self.mp_db_writer = None
+        self.mp_q_results = None
+        self.mp_processes = None
+        self.mp_processes_available = set()
+
+    def chunk_params(self, params, costs=None):
+        # guided self scheduling, chunks start large and shrink as the remaining work drops so the last chunks
+        # even out the finish times of the processes. with costs the params are ordered most expensive first and
+        # chunks are sized by cost instead of count, so a few large files do not end up together in one chunk
+        n_params = len(params)
+        if costs is None:
+            order = list(range(n_params))
+            costs = [1] * n_params
+        else:
+            costs = [max(1, c or 0) for c in costs]
+            order = sorted(range(n_params), key=lambda v: costs[v], reverse=True)
+
+        cost_remain = sum(costs)
+        cost_min = self.mp_chunk_min_size * (costs[order[n_params // 2]] if n_params else 1)
+        chunks = []
+        pos = 0
+        while pos < n_params:
+            cost_target = max(cost_min, cost_remain // (self.mp_chunk_factor * self.mp_n_processes))
+            chunk = []
+            chunk_cost = 0
+            while pos < n_params and len(chunk) < self.mp_chunk_max_size and chunk_cost < cost_target:
+                idx = order[pos]
+                pos += 1
+                chunk.append(params[idx])
+                chunk_cost += costs[idx]
+            cost_remain -= chunk_cost
+            chunks.append(chunk)
+
+        return chunks
+
+    def do_map(self, cmd, params, step_id=None, idle_call: Optional[Callable] = None, costs: Optional[list] = None):
+        chunks = self.chunk_params(params, costs)
+
+        self.logger.log(
+            f'Manager: "{cmd}" with {len(params)} parameters in {len(chunks)} chunks '
+            f'using {self.mp_n_processes} processes')
 
         command_list = []
-        for ii in indexes:
-            command_list.append([cmd, [ii]])
+        for chunk in chunks:
+            command_list.append([cmd, [chunk]])
 
-        results = self.mp_issue_commands(command_list, step_id=step_id, idle_call=idle_call)
+        results = self.mp_issue_commands(
+            command_list, step_id=step_id, idle_call=idle_call, n_items=len(params))
 
         all_results = []
         for r in results:
@@ -142,10 +276,84 @@ class MultiProcessControl:
 
         return all_results
 
-    def mp_issue_commands(self, command_list: list, step_id=None, idle_call: Optional[Callable] = None):
+    def __enter__(self):
+        self.pool_start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.pool_shutdown()
+
+    def pool_start(self):
+        # long lived worker processes, each opens the project once and then serves commands until shutdown
+        if self.mp_processes is not None or debug_local_process:
+            return
+
+        self.mp_db_writer = DbWriter(self.project_file, self.working_dir, self.logger, db_profile=self.db_profile)
+        self.mp_db_writer.start()
+
+        self.mp_q_results = multiprocessing.Queue()
+        self.mp_processes = {}
+        for i in range(self.mp_n_processes):
+            name = 'process_{}'.format(i)
+
+            self.logger.debug('Process Create: {}'.format(name))
+            q_command = multiprocessing.Queue()
+            p = multiprocessing.Process(
+                target=run_mp_vfs_base,
+                args=(
+                    name, self.project_file, self.working_dir, q_command, self.mp_q_results,
+                    self.max_uncompressed_cache_size // self.mp_n_processes, self.db_profile, self.logger.level))
+            self.mp_processes[name] = (name, p, q_command)
+
+            self.logger.debug('Process Start: {}'.format(p))
+
+            p.start()
+
+        self.mp_processes_available = set(self.mp_processes.keys())
+
+    def pool_shutdown(self):
+        if self.mp_processes is None:
+            return
+
+        # shutdown processes
+        for k in self.mp_processes_available:
+            v = self.mp_processes[k]
+            v[2].put(('exit', []))
+            self.logger.debug('Manager: Issued Exit to {}'.format(k))
+
+        # drain messages so processes blocked on a full result queue can exit
+        while any(v[1].is_alive() for v in self.mp_processes.values()):
+            try:
+                msg = self.mp_q_results.get(block=True, timeout=self.mp_result_wait_time_sec)
+                if msg[1] in {'exception', 'error'}:
+                    self.logger.error('{}: {}'.format(msg[0], msg[2]))
+                elif msg[1] == 'db_batch':
+                    self.mp_db_writer.put(msg[2][0])
+            except queue.Empty:
+                pass
+
+        # join
+        for k, v in self.mp_processes.items():
+            self.logger.debug('Manager: Joining {}'.format(k))
+            v[1].join()
+
+        self.mp_processes = None
+        self.mp_processes_available = set()
+        self.mp_q_results = None
+
+        self.mp_db_writer.shutdown()
+        self.mp_db_writer = None
+
+        self.logger.flush()
+
+    def mp_issue_commands(
+            self, command_list: list, step_id=None, idle_call: Optional[Callable] = None,
+            n_items: Optional[int] = None):
         command_todo = [(i, cmd) for i, cmd in enumerate(command_list)]
         command_active = {}
         command_complete = []
+        command_times = []
+        n_items_done = 0
 
         command_results = [None] * len(command_list)
 
@@ -161,7 +369,7 @@ class MultiProcessControl:
         start_time = time.time()
 
         if debug_local_process:
-            vfs = VfsDatabase(self.project_file, self.working_dir, self.logger)
+            vfs = VfsDatabase(self.project_file, self.working_dir, self.logger, db_profile=self.db_profile)
             processor = Processor(vfs, LogWrapper(self.logger))
             for i, command in command_todo:
                 command_results[i] = processor.process_command(command[0], command[1])
@@ -169,113 +377,126 @@ class MultiProcessControl:
 
             return command_results
         else:
-            mp_q_results = multiprocessing.Queue()
-
-            mp_processes = {}
-            for i in range(self.mp_n_processes):
-                name = 'process_{}'.format(i)
-
-                self.logger.debug('Process Create: {}'.format(name))
-                q_command = multiprocessing.Queue()
-                p = multiprocessing.Process(
-                    target=run_mp_vfs_base, args=(name, self.project_file, self.working_dir, q_command, mp_q_results))
-                mp_processes[name] = (name, p, q_command)
-
-                self.logger.debug('Process Start: {}'.format(p))
-
-                p.start()
-
-            processes_available = set(mp_processes.keys())
-
-            while len(processes_available) > 0 and (len(command_todo) + len(command_active)) > 0:
-                if idle_call is not None:
-                    idle_call()
-
-                ctime = time.time()
-                if last_update is None or (last_update + self.progress_update_time_sec) < ctime:
-                    n_done = 0
-                    n_total = 0
-                    for k, v in status.items():
-                        n_done += v[0]
-                        n_total += v[1]
-                    if n_total > 0:
-                        last_update = ctime
-                        self.logger.log('Processing{}: {} of {} done ({:3.1f}%) elapsed {:5.1f} seconds'.format(
-                            step_id, n_done, n_total, n_done / n_total * 100.0, ctime - start_time))
-
-                if len(command_active) < self.mp_n_processes and len(command_todo) > 0:
-                    # add commands
-                    available_procs = processes_available - set(command_active.keys())
-                    proc = available_procs.pop()
-                    proc = mp_processes[proc]
-                    name = proc[0]
-                    q_command: queue.Queue = proc[2]
-                    command = command_todo.pop(0)
-                    command_active[name] = command
-                    q_command.put(command[1])
-                else:
-                    try:
-                        msg = mp_q_results.get(block=False, timeout=1)
-                        proc_name = msg[0]
-                        proc_cmd = msg[1]
-                        proc_params = msg[2]
-
-                        if proc_cmd not in {'trace', 'debug', 'log', 'status', 'exception', 'process_done'}:
-                            self.logger.debug('Manager: received msg {}:{}'.format(proc_name, proc_cmd))
-
-                        if proc_cmd == 'log':
-                            self.logger.log('{}: {}'.format(proc_name, proc_params[0]))
-                        elif proc_cmd == 'debug':
-                            self.logger.debug('{}: {}'.format(proc_name, proc_params[0]))
-                        elif proc_cmd == 'trace':
-                            self.logger.trace('{}: {}'.format(proc_name, proc_params[0]))
-                        elif proc_cmd == 'error':
-                            self.logger.error('{}: {}'.format(proc_name, proc_params[0]))
-                        elif proc_cmd == 'warning':
-                            self.logger.warning('{}: {}'.format(proc_name, proc_params[0]))
-                        elif proc_cmd == 'exception':
-                            exception_list.append(proc_params)
-                            self.logger.error('{}: EXCEPTION: {}'.format(proc_name, proc_params))
-                        elif proc_cmd == 'status':
-                            status[proc_name] = proc_params
-                        elif proc_cmd == 'cmd_done':
-                            command = command_active.pop(proc_name)
-                            command_complete.append([proc_name, proc_params[0]])
-                            command_results[command[0]] = proc_params[1]
-                            self.logger.debug(
-                                'Manager: {} completed {} {}'.format(proc_name, proc_params[0], len(proc_params[1])))
-                        elif proc_cmd == 'process_done':
-                            self.logger.debug('Manager: {} DONE'.format(proc_name))
-                            command_active.pop(proc_name)
-                            processes_available.discard(proc_name)
-                        else:
-                            print(msg)
-                    except queue.Empty:
-                        pass
+            # without a pool started by the caller the processes only live for this call
+            pool_owned = self.mp_processes is None
+            self.pool_start()
+
+            mp_q_results = self.mp_q_results
+            mp_processes = self.mp_processes
+            processes_available = self.mp_processes_available
 
-            # shutdown processes
+            # cached per phase state in the processes, like the ADF type map, is reloaded
             for k in processes_available:
-                v = mp_processes[k]
-                v[2].put(('exit', []))
-                self.logger.debug('Manager: Issued Exit to {}'.format(k))
+                mp_processes[k][2].put(('phase_begin', []))
 
-            # join
-            for k, v in mp_processes.items():
-                self.logger.debug('Manager: Joining {}'.format(k))
-                v[1].join()
+            try:
+                while len(processes_available) > 0 and (len(command_todo) + len(command_active)) > 0:
+                    if idle_call is not None:
+                        idle_call()
+
+                    ctime = time.time()
+                    if last_update is None or (last_update + self.progress_update_time_sec) < ctime:
+                        n_done = n_items_done
+                        n_total = n_items_done
+                        for k, v in status.items():
+                            n_done += v[0]
+                            n_total += v[1]
+                        if n_items is not None:
+                            n_total = n_items
+                        if n_total > 0:
+                            last_update = ctime
+                            self.logger.log('Processing{}: {} of {} done ({:3.1f}%) elapsed {:5.1f} seconds'.format(
+                                step_id, n_done, n_total, n_done / n_total * 100.0, ctime - start_time))
+
+                    if len(command_active) < len(processes_available) and len(command_todo) > 0:
+                        # add commands
+                        available_procs = processes_available - set(command_active.keys())
+                        proc = available_procs.pop()
+                        proc = mp_processes[proc]
+                        name = proc[0]
+                        q_command: queue.Queue = proc[2]
+                        command = command_todo.pop(0)
+                        command_active[name] = (command, time.time())
+                        q_command.put(command[1])
+                    else:
+                        try:
+                            msg = mp_q_results.get(block=True, timeout=self.mp_result_wait_time_sec)
+                            proc_name = msg[0]
+                            proc_cmd = msg[1]
+                            proc_params = msg[2]
+
+                            if proc_cmd not in {
+                                    'trace', 'debug', 'log', 'status', 'exception', 'process_done', 'db_batch'}:
+                                self.logger.debug('Manager: received msg {}:{}'.format(proc_name, proc_cmd))
+
+                            if proc_cmd == 'log':
+                                self.logger.log('{}: {}'.format(proc_name, proc_params[0]))
+                            elif proc_cmd == 'debug':
+                                self.logger.debug('{}: {}'.format(proc_name, proc_params[0]))
+                            elif proc_cmd == 'trace':
+                                self.logger.trace('{}: {}'.format(proc_name, proc_params[0]))
+                            elif proc_cmd == 'error':
+                                self.logger.error('{}: {}'.format(proc_name, proc_params[0]))
+                            elif proc_cmd == 'warning':
+                                self.logger.warning('{}: {}'.format(proc_name, proc_params[0]))
+                            elif proc_cmd == 'exception':
+                                exception_list.append(proc_params)
+                                self.logger.error('{}: EXCEPTION: {}'.format(proc_name, proc_params))
+                            elif proc_cmd == 'status':
+                                status[proc_name] = proc_params
+                            elif proc_cmd == 'db_batch':
+                                self.mp_db_writer.put(proc_params[0])
+                            elif proc_cmd == 'cmd_done':
+                                command, command_start = command_active.pop(proc_name)
+                                command_time = time.time() - command_start
+                                command_complete.append([proc_name, proc_params[0]])
+                                command_results[command[0]] = proc_params[1]
+                                command_times.append((command_time, command[0], len(proc_params[1])))
+                                n_items_done += len(proc_params[1])
+                                status.pop(proc_name, None)
+                                self.logger.debug('Manager: {} completed {} chunk {} with {} items in {:0.3f} seconds'.format(
+                                    proc_name, proc_params[0], command[0], len(proc_params[1]), command_time))
+                            elif proc_cmd == 'process_done':
+                                self.logger.debug('Manager: {} DONE'.format(proc_name))
+                                command_active.pop(proc_name, None)
+                                processes_available.discard(proc_name)
+                            else:
+                                print(msg)
+                        except queue.Empty:
+                            pass
+
+                # results of this map have to be in the database before the caller looks at it
+                self.mp_db_writer.flush()
+                if self.mp_db_writer.exception is not None:
+                    exception_list.append(self.mp_db_writer.exception)
+            finally:
+                if pool_owned:
+                    self.pool_shutdown()
 
             if exception_list:
                 raise Exception('Manager: PROCESSING FAILED')
 
-            self.logger.log('Manager: Done')
+            if command_times:
+                # slowest chunks, stragglers show up as chunks far above the median
+                command_times.sort(reverse=True)
+                times = [v[0] for v in command_times]
+                self.logger.log('Manager: {} chunks: min {:0.3f}, median {:0.3f}, max {:0.3f} seconds'.format(
+                    len(times), times[-1], times[len(times) // 2], times[0]))
+                for command_time, command_index, command_items in command_times[:3]:
+                    self.logger.debug('Manager: slowest chunk {} with {} items in {:0.3f} seconds'.format(
+                        command_index, command_items, command_time))
+
+            self.logger.log('Manager: Done elapsed {:5.1f} seconds'.format(time.time() - start_time))
 
             return command_results
 
 
 class Processor:
-    def __init__(self, vfs: VfsDatabase, comm):
+    def __init__(self, vfs: VfsDatabase, comm, db_batch_sink: Optional[Callable] = None):
         self._vfs = vfs
         self._comm = comm
+        self._db_batch_sink = db_batch_sink
+        self._adf_db = None
 
         self.commands = {
             'process_hash_file_contents': lambda idxs: self.loop_over_uid_wrapper(idxs,
@@ -298,17 +519,27 @@ class Processor:
             'process_rtpc_initial': lambda idxs: self.loop_over_uid_wrapper(idxs, self.process_rtpc_initial),
             'process_gfx_initial': lambda idxs: self.loop_over_uid_wrapper(idxs, self.process_gfx_initial),
             'process_txt_initial': lambda idxs: self.loop_over_uid_wrapper(idxs, self.process_txt_initial),
-            'process_vhash_final': lambda idxs: self.loop_over_vhash_wrapper(idxs, self.process_vhash_final),
+            'process_vhash_final': lambda idxs: self.loop_over_vhashes_wrapper(idxs, self.process_vhash_final),
         }
 
         nhf = []
         for prefix in self._vfs.game_info.world_navheightfields:
             for v0 in range(64):
                 for v1 in range(64):
-                    fn = prefix + '{:02d}_{:02d}.nhf'.format(v0, v1)
-                    nhf.append((fn, self._vfs.file_hash(fn)))
+                    nhf.append(prefix + '{:02d}_{:02d}.nhf'.format(v0, v1))
+
+        self.nav_height_field_possible_names = list(zip(nhf, self._vfs.file_hash_batch(nhf)))
+
+    def phase_begin(self):
+        # the ADF type map and the strings may have been extended by other processes, reload on first use
+        self._adf_db = None
+        self._vfs.hash_string_resolver_changed()
 
-        self.nav_height_field_possible_names = nhf
+    def adf_db(self):
+        if self._adf_db is None:
+            self._adf_db = AdfDatabase()
+            self._adf_db.load_from_database(self._vfs)
+        return self._adf_db
 
     def process_command(self, cmd, params):
         command = self.commands.get(cmd, None)
@@ -321,39 +552,38 @@ class Processor:
         n_indexes = len(indexes)
         results: List[Optional[tuple]]
         results = [None] * n_indexes
-        with DbWrap(self._vfs, logger=self._comm, index_offset=n_indexes) as db:
-            for i, index in enumerate(indexes):
+        with DbWrap(
+                self._vfs, logger=self._comm, index_offset=n_indexes, adf_db=self.adf_db(),
+                batch_sink=self._db_batch_sink) as db:
+            # changes are written when the DbWrap exits, the nodes can be read up front
+            nodes = db.db().nodes_where_uids(indexes)
+            for i, (index, node) in enumerate(zip(indexes, nodes)):
                 self._comm.status(i, n_indexes)
-                node = db.db().node_where_uid(index)
                 try:
                     results[i] = (index, func(node, db))
                 except:
-                    cn = node
-                    while cn is not None:
-                        try:
-                            self._comm.error(
-                                f'loop_over_uid_wrapper: failed for: id: {cn.uid}, pid:{cn.pid}, v: {cn.v_path}, p: {cn.p_path}')
-
-                            if cn.pid is None:
-                                break
-
-                            cn = db.db().node_where_uid(cn.pid)
-                        except:
-                            cn = None
+                    try:
+                        chain = db.db().node_ancestors_where_uid(index)
+                    except:
+                        chain = []
+                    for cn in chain:
+                        self._comm.error(
+                            f'loop_over_uid_wrapper: failed for: id: {cn.uid}, pid:{cn.pid}, v: {cn.v_path}, p: {cn.p_path}')
                     raise
             self._comm.status(n_indexes, n_indexes)
 
+        self._comm.trace('Uncompressed cache: {}'.format(self._vfs.uncompressed_cache_stats()))
+
         return results
 
-    def loop_over_vhash_wrapper(self, vhashes, func):
-        n_indexes = len(vhashes)
-        results: List[Optional[tuple]]
-        results = [None] * n_indexes
-        with DbWrap(self._vfs, logger=self._comm, index_offset=n_indexes) as db:
-            for i, v_hash in enumerate(vhashes):
-                self._comm.status(i, n_indexes)
-                results[i] = (v_hash, func(v_hash, db))
-            self._comm.status(n_indexes, n_indexes)
+    def loop_over_vhashes_wrapper(self, vhashes, func):
+        # func handles the whole list of v_hashes in one call, for set based processing
+        with DbWrap(
+                self._vfs, logger=self._comm, index_offset=len(vhashes), adf_db=self.adf_db(),
+                batch_sink=self._db_batch_sink) as db:
+            self._comm.status(0, len(vhashes))
+            results = func(vhashes, db)
+            self._comm.status(len(vhashes), len(vhashes))
 
         return results
 
@@ -900,109 +1130,135 @@ class Processor:
 
         return False
 
-    def process_vhash_final(self, v_hash_in, db: DbWrap):
-        nodes = db.db().nodes_where_match(v_hash=v_hash_in)
-
+    def process_vhash_final(self, v_hashes, db: DbWrap):
+        # all v_hashes of a work unit at once, the nodes, strings and references come from two joins
         if db.file_hash_type == node_flag_v_hash_type_4:
-            hash_strings = db.db().hash_string_match(hash32=v_hash_in)
+            hash_column = 'hash32'
         elif db.file_hash_type == node_flag_v_hash_type_8:
-            hash_strings = db.db().hash_string_match(hash64=v_hash_in)
+            hash_column = 'hash64'
         else:
             raise NotImplementedError('Unhandled Hash Type {}'.format(db.file_hash_type))
 
-        missed_vpaths = set()
-        h4ref_map = {}
-        for rowid, v_path, _, _, _, _ in hash_strings:
-            missed_vpaths.add(v_path)
-            h4ref_map[rowid] = db.db().hash_string_references_match(hash_row_id=rowid)
+        nodes, string_rows = db.db().v_hashes_nodes_strings(v_hashes, hash_column)
 
-        # h4rowid, src_node, is_adf_field_name, used_at_runtime, possible_ftypes in h4ref
-
-        if len(nodes) > 0:
-            node: VfsNode
-            for node in nodes:
-                if node.is_valid():
-                    updated = False
+        # v_hash -> list of (v_path, h4ref), h4ref is a list of (src_node, used_at_runtime, possible_ftypes)
+        hash_strings = {}
+        h4ref_map = {}
+        for v_hash, rowid, v_path, ref_rowid, src_node, used_at_runtime, possible_ftypes in string_rows:
+            h4ref = h4ref_map.get(rowid)
+            if h4ref is None:
+                h4ref = []
+                h4ref_map[rowid] = h4ref
+                hash_strings.setdefault(v_hash, []).append((v_path, h4ref))
+            if ref_rowid is not None:
+                h4ref.append((src_node, used_at_runtime, possible_ftypes))
+
+        missed_vpaths = {v_hash: set(v_path for v_path, _ in strings) for v_hash, strings in hash_strings.items()}
+
+        node: VfsNode
+        for node in nodes:
+            if node.is_valid():
+                updated = False
+
+                if node.file_type is None:
+                    ftype_int = ftype_list[FTYPE_NO_TYPE]
+                else:
+                    ftype_int = ftype_list[node.file_type]
+
+                for v_path, h4ref in hash_strings.get(node.v_hash, []):
+                    if node.v_path is None:
+                        for src_node, _, possible_ftypes in h4ref:
+                            if possible_ftypes is None or possible_ftypes == 0:
+                                possible_ftypes = ftype_list[FTYPE_ANY_TYPE]
+
+                            if (ftype_int & possible_ftypes) != 0:
+                                # TODO this is disabled because it can cause a lot of traffic back to the
+                                #  main thread RAGE2 has 1.7 million nodes
+                                # self._comm.trace('v_path:add  {} {} {} {} {}'.format(
+                                #     node.v_hash_to_str(), v_path, node.file_type, possible_ftypes, src_node))
+                                node.v_path = v_path
+                                updated = True
+                                break
+                            else:
+                                self._comm.log('v_path:skip {} {} {} {} {}'.format(
+                                    node.v_hash_to_str(), v_path, node.file_type, possible_ftypes, src_node))
+
+                    if node.v_path == v_path:
+                        for _, used_at_runtime, _ in h4ref:
+                            if used_at_runtime:
+                                node.used_at_runtime_depth = 0
+                                updated = True
+                                break
 
-                    if node.file_type is None:
-                        ftype_int = ftype_list[FTYPE_NO_TYPE]
-                    else:
-                        ftype_int = ftype_list[node.file_type]
+                if node.file_type is None and node.v_path is not None:
+                    file, ext = os.path.splitext(node.v_path)
+                    if ext[0:4] == b'.atx':
+                        node.file_type = FTYPE_ATX
+                        updated = True
+                    elif ext == b'.hmddsc':
+                        node.file_type = FTYPE_HMDDSC
+                        updated = True
 
-                    for rowid, v_path, _, _, _, _ in hash_strings:
-                        h4ref = h4ref_map[rowid]
+                if node.v_hash in missed_vpaths:
+                    missed_vpaths[node.v_hash].discard(node.v_path)
 
-                        if node.v_path is None:
-                            for _, src_node, _, _, possible_ftypes in h4ref:
-                                if possible_ftypes is None or possible_ftypes == 0:
-                                    possible_ftypes = ftype_list[FTYPE_ANY_TYPE]
-
-                                if (ftype_int & possible_ftypes) != 0:
-                                    # TODO this is disabled because it can cause a lot of traffic back to the
-                                    #  main thread RAGE2 has 1.7 million nodes
-                                    # self._comm.trace('v_path:add  {} {} {} {} {}'.format(
-                                    #     node.v_hash_to_str(), v_path, node.file_type, possible_ftypes, src_node))
-                                    node.v_path = v_path
-                                    updated = True
-                                    break
-                                else:
-                                    self._comm.log('v_path:skip {} {} {} {} {}'.format(
-                                        node.v_hash_to_str(), v_path, node.file_type, possible_ftypes, src_node))
-
-                        if node.v_path == v_path:
-                            for _, _, _, used_at_runtime, _ in h4ref:
-                                if used_at_runtime:
-                                    node.used_at_runtime_depth = 0
-                                    updated = True
-                                    break
-
-                    if node.file_type is None and node.v_path is not None:
-                        file, ext = os.path.splitext(node.v_path)
-                        if ext[0:4] == b'.atx':
-                            node.file_type = FTYPE_ATX
-                            updated = True
-                        elif ext == b'.hmddsc':
-                            node.file_type = FTYPE_HMDDSC
-                            updated = True
-
-                    missed_vpaths.discard(node.v_path)
-
-                    if node.ext_hash is None and node.v_path is not None:
-                        file, ext = os.path.splitext(node.v_path)
-                        node.ext_hash = self._vfs.ext_hash(ext)
-                        updated = True
+                if node.ext_hash is None and node.v_path is not None:
+                    file, ext = os.path.splitext(node.v_path)
+                    node.ext_hash = self._vfs.ext_hash(ext)
+                    updated = True
 
-                    if updated:
-                        db.node_update(node)
+                if updated:
+                    db.node_update(node)
 
-        for v_path in missed_vpaths:
-            v_hash = db.file_hash(v_path)
-            self._comm.trace('v_path:miss {} {:016X}'.format(v_path, np.uint64(v_hash)))
+        for v_paths in missed_vpaths.values():
+            for v_path in v_paths:
+                v_hash = db.file_hash(v_path)
+                self._comm.trace('v_path:miss {} {:016X}'.format(v_path, np.uint64(v_hash)))
 
-        return True
+        return [(v_hash, True) for v_hash in v_hashes]
 
 
 class MultiProcessVfsBase:
-    def __init__(self, name, q_in: multiprocessing.Queue, q_out: multiprocessing.Queue):
+    def __init__(self, name, q_in: multiprocessing.Queue, q_out: multiprocessing.Queue, log_level=log_level_trace):
         self.name = name
         self.q_in = q_in
         self.q_out = q_out
 
+        # messages the manager logger drops are not sent, status at most every status_interval_sec
+        self.log_level = log_level
+        self.status_interval_sec = 0.5
+        self._status_last = None
+
     def send(self, cmd, *params):
         self.q_out.put((self.name, cmd, params,))
 
+    def error(self, msg):
+        self.send('error', msg)
+
+    def warning(self, msg):
+        if self.log_level >= log_level_warning:
+            self.send('warning', msg)
+
     def log(self, msg):
-        self.send('log', msg)
+        if self.log_level >= log_level_log:
+            self.send('log', msg)
 
     def trace(self, msg):
-        self.send('debug', msg)
+        if self.log_level >= log_level_trace:
+            self.send('debug', msg)
 
     def status(self, i, n):
-        self.send('status', i, n)
+        curr_time = time.time()
+        if i >= n or self._status_last is None or self._status_last + self.status_interval_sec < curr_time:
+            self._status_last = curr_time
+            self.send('status', i, n)
 
     def exception(self, exc):
         self.send('exception', exc)
 
+    def db_batch(self, batch: DbWrapBatch):
+        self.send('db_batch', batch)
+
     def run(self, processor: Processor):
         keep_running = True
         while keep_running:
@@ -1016,6 +1272,8 @@ class MultiProcessVfsBase:
 
                     if cmd == 'exit':
                         keep_running = False
+                    elif cmd == 'phase_begin':
+                        processor.phase_begin()
                     else:
                         result = processor.process_command(cmd, params)
                         self.send('cmd_done', cmd, result)
@@ -1023,11 +1281,15 @@ class MultiProcessVfsBase:
                 pass
 
 
-def run_mp_vfs_base(name, project_file, working_dir, q_in, q_out):
+def run_mp_vfs_base(
+        name, project_file, working_dir, q_in, q_out, max_uncompressed_cache_size=(2 * 1024**3), db_profile=None,
+        log_level=log_level_trace):
     try:
-        p = MultiProcessVfsBase(name, q_in, q_out)
-        vfs = VfsDatabase(project_file, working_dir, p)
-        processor = Processor(vfs, p)
+        p = MultiProcessVfsBase(name, q_in, q_out, log_level=log_level)
+        vfs = VfsDatabase(
+            project_file, working_dir, p, max_uncompressed_cache_size=max_uncompressed_cache_size,
+            db_profile=db_profile)
+        processor = Processor(vfs, p, db_batch_sink=p.db_batch)
         p.run(processor)
         vfs.shutdown()
     except:
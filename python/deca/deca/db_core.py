@@ -3,24 +3,27 @@ import io
 import sqlite3
 import pickle
 import re
-import zstandard as zstd
-import zlib
 import numpy as np
+import concurrent.futures
 from typing import List
 
-from deca.util import common_prefix
 from deca.errors import *
-from deca.file import ArchiveFile, SubsetFile
+from deca.file import ArchiveFile, SubsetFile, BufferFile
 from deca.ff_types import *
 from deca.ff_aaf import extract_aaf
-from deca.decompress import DecompressorOodleLZ
+from deca.decompress import DecompressorOodleLZ, blocks_decompress, blocks_decompress_parallel
+from deca.decompress_cache import decompress_cache_create, BufferLruCache, DECOMPRESS_CACHE_PACK
 from deca.game_info import game_info_load
-from deca.hashes import hash32_func, hash48_func, hash64_func, hash_all_func
+from deca.hashes import hash32_func, hash48_func, hash64_func, hash_all_func, hash32_batch, hash64_batch
 from deca.ff_gtoc import GtocArchiveEntry, GtocFileEntry
 from deca.db_types import *
 from deca.db_cross_game import DbCrossGame
+from deca.db_search import like_literals, regexp_literals, fts_match_expr
+from deca.db_snapshot import VfsNodeSnapshot
+from deca.db_hash_strings import HashStringResolver
 
-dumped_cache_dir = False
+# keep core_v_path_search up to date with core_nodes
+v_path_search_triggers = ['core_nodes_v_path_insert', 'core_nodes_v_path_update', 'core_nodes_v_path_delete']
 
 language_codes = [
     'bra',  # Brazil
@@ -332,11 +335,16 @@ class VfsDatabase(DbBase):
     def __init__(
             self, project_file, working_dir, logger,
             init_display=False,
-            max_uncompressed_cache_size=(2 * 1024**3)
+            max_uncompressed_cache_size=(2 * 1024**3),
+            decompress_cache=DECOMPRESS_CACHE_PACK,
+            decompress_cache_params=None,
+            decompress_threads=0,
+            decompress_threads_min_blocks=8,
+            db_profile=None,
     ):
-        super().__init__(os.path.join(working_dir, 'db', 'core.db'), logger)
+        super().__init__(os.path.join(working_dir, 'db', 'core.db'), logger, db_profile)
 
-        self.db_cg = DbCrossGame(os.path.abspath(os.path.join(working_dir, "..")), logger)
+        self.db_cg = DbCrossGame(os.path.abspath(os.path.join(working_dir, "..")), logger, db_profile)
 
         self.project_file = project_file
         self.working_dir = working_dir
@@ -345,12 +353,14 @@ class VfsDatabase(DbBase):
         if 4 == self.game_info.file_hash_size:
             self.file_hash_db_id = 'hash32'
             self.file_hash = hash32_func
+            self.file_hash_batch = hash32_batch
             self.file_hash_format = format_hash32
             self.file_hash_type = node_flag_v_hash_type_4
             self.ext_hash = hash32_func
         elif 8 == self.game_info.file_hash_size:
             self.file_hash_db_id = 'hash64'
             self.file_hash = hash64_func
+            self.file_hash_batch = hash64_batch
             self.file_hash_format = format_hash64
             self.file_hash_type = node_flag_v_hash_type_8
             self.ext_hash = hash32_func
@@ -367,20 +377,51 @@ class VfsDatabase(DbBase):
         self._lookup_translation_from_name = None
         self._lookup_note_from_file_path = None
 
+        # v_path search table is refreshed on the first search after a change
+        self._v_path_search_checked = False
+        self.db_changed_signal.connect(self, lambda x: x.v_path_search_changed())
+
+        # columnar copy of core_nodes is built on first use after a change
+        self._nodes_snapshot = None
+        self._nodes_snapshot_data_version = None
+        self.db_changed_signal.connect(self, lambda x: x.nodes_snapshot_changed())
+
+        # hash -> string lookup is checked against core_strings on first use after a change
+        self._hash_string_resolver = None
+        self._hash_string_resolver_checked = False
+        self.db_changed_signal.connect(self, lambda x: x.hash_string_resolver_changed())
+
         self.db_setup()
 
-        # setup in memory uncompressed cache
-        # self.uncompressed_cache_max_size = max_uncompressed_cache_size
-        # self.uncompressed_cache_map = {}
-        # self.uncompressed_cache_lru = []
+        # setup on disk cache of decompressed nodes
+        if decompress_cache_params is None:
+            decompress_cache_params = {}
+        self.decompress_cache = decompress_cache_create(self, decompress_cache, **decompress_cache_params)
+
+        # opt in, decompress the blocks of large v4 nodes on a thread pool
+        self.decompress_threads = decompress_threads
+        self.decompress_threads_min_blocks = decompress_threads_min_blocks
+        self._decompress_executor = None
+
+        # setup in memory uncompressed cache, shared by all file_obj_from callers in this process
+        self.uncompressed_cache = BufferLruCache(max_uncompressed_cache_size)
+
+    def uncompressed_cache_stats(self):
+        return self.uncompressed_cache.stats()
 
     def shutdown(self):
+        if self._decompress_executor is not None:
+            self._decompress_executor.shutdown()
+            self._decompress_executor = None
+        self.uncompressed_cache.clear()
+        self.decompress_cache.shutdown()
         self.decompress_oodle_lz.shutdown()
 
     def db_reset(self):
         self.db_execute_one('DROP INDEX IF EXISTS index_core_node_blocks_node_id;')
         self.db_execute_one('DROP INDEX IF EXISTS index_core_nodes_v_path_to_vnode;')
         self.db_execute_one('DROP INDEX IF EXISTS index_core_nodes_v_hash_to_vnode;')
+        self.db_execute_one('DROP INDEX IF EXISTS index_core_nodes_parent_id_parent_index;')
 
         self.db_execute_one('DROP INDEX IF EXISTS core_strings_hash32_asc;')
         self.db_execute_one('DROP INDEX IF EXISTS core_strings_hash48_asc;')
@@ -405,22 +446,26 @@ class VfsDatabase(DbBase):
         self.db_execute_one('DROP TABLE IF EXISTS core_event_id_ref;')
         self.db_execute_one('DROP TABLE IF EXISTS core_gtoc_archive_def;')
         self.db_execute_one('DROP TABLE IF EXISTS core_gtoc_file_entry;')
+        self.db_execute_one('DROP TABLE IF EXISTS core_archive_fingerprints;')
+        self.db_execute_one('DROP TABLE IF EXISTS core_hash_reverse_jobs;')
+        self.db_execute_one('DROP TABLE IF EXISTS core_v_path_search;')
+        self.db_execute_one('DROP TABLE IF EXISTS core_v_path_search_state;')
+        self.db_execute_one('DROP TABLE IF EXISTS core_v_path_search_generation;')
 
         self.db_execute_one('VACUUM;')
 
         self.db_conn.commit()
 
+        # cache keys use node ids, which are not stable across a reset
+        self.decompress_cache.clear()
+        self.uncompressed_cache.clear()
+
         self.db_changed_signal.call()
 
         self.db_setup()
 
     def db_setup(self):
         self.db_execute_one(core_nodes_definition)
-        self.db_execute_one(
-            '''
-            CREATE INDEX IF NOT EXISTS "index_core_nodes_v_path_to_vnode" ON "core_nodes" ("v_path"	ASC);
-            '''
-        )
         self.db_execute_one(
             '''
             CREATE INDEX IF NOT EXISTS "index_core_nodes_v_hash_to_vnode" ON "core_nodes" ("v_hash"	ASC);
@@ -428,7 +473,7 @@ class VfsDatabase(DbBase):
         )
         self.db_execute_one(
             '''
-            CREATE INDEX IF NOT EXISTS "index_core_nodes_content_hash_to_vnode" ON "core_nodes" ("content_hash" ASC);
+            CREATE INDEX IF NOT EXISTS "index_core_nodes_parent_id_parent_index" ON "core_nodes" ("parent_id" ASC, "parent_index" ASC);
             '''
         )
 
@@ -462,19 +507,10 @@ class VfsDatabase(DbBase):
             );
             '''
         )
+        # file hash lookups happen while processing, the other hashes are in db_indexes_deferred
         self.db_execute_one(
-            '''
-            CREATE INDEX IF NOT EXISTS "core_strings_hash32_asc" ON "core_strings" ("hash32"	ASC);
-            '''
-        )
-        self.db_execute_one(
-            '''
-            CREATE INDEX IF NOT EXISTS "core_strings_hash48_asc" ON "core_strings" ("hash48"	ASC);
-            '''
-        )
-        self.db_execute_one(
-            '''
-            CREATE INDEX IF NOT EXISTS "core_strings_hash64_asc" ON "core_strings" ("hash64"	ASC);
+            f'''
+            CREATE INDEX IF NOT EXISTS "core_strings_{self.file_hash_db_id}_asc" ON "core_strings" ("{self.file_hash_db_id}"	ASC);
             '''
         )
 
@@ -514,10 +550,6 @@ class VfsDatabase(DbBase):
             );
             '''
         )
-        self.db_execute_one(
-            'CREATE INDEX IF NOT EXISTS "core_object_id_ref_id_asc" ON "core_object_id_ref" ("id" ASC);')
-        self.db_execute_one(
-            'CREATE INDEX IF NOT EXISTS "core_object_id_ref_ori_asc" ON "core_object_id_ref" ("object_rowid" ASC);')
 
         self.db_execute_one(
             '''
@@ -529,10 +561,6 @@ class VfsDatabase(DbBase):
             );
             '''
         )
-        self.db_execute_one(
-            'CREATE INDEX IF NOT EXISTS "core_event_id_ref_id_asc" ON "core_event_id_ref" ("id" ASC);')
-        self.db_execute_one(
-            'CREATE INDEX IF NOT EXISTS "core_event_id_ref_ori_asc" ON "core_event_id_ref" ("object_rowid" ASC);')
 
         self.db_execute_one(
             '''
@@ -576,13 +604,204 @@ class VfsDatabase(DbBase):
         self.db_execute_one(
             'CREATE INDEX IF NOT EXISTS "core_gtoc_file_entry_row_id_asc" ON "core_gtoc_file_entry" ("def_rowid" ASC)')
 
+        # game files that the node tree is built from (EXE, unarchived files, ARC/TAB), used to detect patches
         self.db_execute_one(
-            'CREATE INDEX IF NOT EXISTS "core_gtoc_file_entry_index_asc" ON "core_gtoc_file_entry" ("def_index" ASC)')
+            '''
+            CREATE TABLE IF NOT EXISTS "core_archive_fingerprints" (
+                "p_path" TEXT NOT NULL,
+                "node_id" INTEGER NOT NULL,
+                "file_size" INTEGER,
+                "mtime_ns" INTEGER,
+                "fingerprint" TEXT,
+                PRIMARY KEY ("p_path")
+            );
+            '''
+        )
+
+        # hash reversal work queue, tokens are frozen when a job is created so a job can be resumed
+        self.db_execute_one(
+            '''
+            CREATE TABLE IF NOT EXISTS "core_hash_reverse_jobs" (
+                "template" TEXT NOT NULL,
+                "tokens" BLOB,
+                "n_candidates" INTEGER NOT NULL,
+                "n_done" INTEGER NOT NULL,
+                "n_hits" INTEGER NOT NULL,
+                PRIMARY KEY ("template")
+            );
+            '''
+        )
+
+        if not self.db_bulk_load_pending():
+            self.db_indexes_deferred_create()
 
         self.db_conn.commit()
 
         self.db_changed_signal.call()
 
+    def db_indexes_deferred(self):
+        # secondary indexes that the processing phases do not query, (name, table, column)
+        indexes = [
+            ('index_core_nodes_v_path_to_vnode', 'core_nodes', 'v_path'),
+            ('index_core_nodes_content_hash_to_vnode', 'core_nodes', 'content_hash'),
+            ('core_strings_hash48_asc', 'core_strings', 'hash48'),
+            ('core_object_id_ref_id_asc', 'core_object_id_ref', 'id'),
+            ('core_object_id_ref_ori_asc', 'core_object_id_ref', 'object_rowid'),
+            ('core_event_id_ref_id_asc', 'core_event_id_ref', 'id'),
+            ('core_event_id_ref_ori_asc', 'core_event_id_ref', 'object_rowid'),
+            ('core_gtoc_file_entry_index_asc', 'core_gtoc_file_entry', 'def_index'),
+        ]
+        for hash_id in ['hash32', 'hash64']:
+            if hash_id != self.file_hash_db_id:
+                indexes.append((f'core_strings_{hash_id}_asc', 'core_strings', hash_id))
+        return indexes
+
+    def db_bulk_load_pending(self):
+        # the deferred indexes are built when the first processing completes, see VfsProcessor.process
+        version = self.db_query_one("PRAGMA user_version")[0]
+        return self.db_profile.get('bulk_load', False) and version < 2
+
+    def db_indexes_deferred_create(self):
+        for name, table, column in self.db_indexes_deferred():
+            self.db_execute_one(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ("{column}" ASC);')
+        self.db_conn.commit()
+
+    def v_path_search_changed(self):
+        self._v_path_search_checked = False
+
+    def v_path_search_suspend(self):
+        """
+        Stop keeping the v_path search table up to date, for bulk loads of core_nodes, the next
+        v_path_search_update fills it again once
+        """
+        for name in v_path_search_triggers:
+            self.db_execute_one(f'DROP TRIGGER IF EXISTS "{name}";', dbg='v_path_search_suspend')
+        self.db_conn.commit()
+        self._v_path_search_checked = False
+
+    def v_path_search_update(self):
+        """
+        Fill the v_path search table if it is not kept up to date, an FTS5 trigram table of the v_paths of core_nodes
+        with the node_id as rowid. Triggers on core_nodes keep it up to date after the fill, whichever connection
+        changes a v_path, they are only missing after v_path_search_suspend
+        :return: True if the search table can be used, the trigram tokenizer needs SQLite 3.34
+        """
+        if sqlite3.sqlite_version_info < (3, 34, 0):
+            return False
+
+        if self._v_path_search_checked:
+            return True
+
+        n_legacy = self.db_query_one(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' "
+            "AND name IN ('core_v_path_search_state', 'core_v_path_search_generation')",
+            dbg='v_path_search_update')[0]
+        if n_legacy > 0:
+            # distinct v_paths of older versions, refilled by triggers that bumped a generation
+            self.v_path_search_suspend()
+            self.db_execute_one('DROP TABLE IF EXISTS "core_v_path_search_state";', dbg='v_path_search_update')
+            self.db_execute_one('DROP TABLE IF EXISTS "core_v_path_search_generation";', dbg='v_path_search_update')
+
+        n_triggers = self.db_query_one(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (?,?,?)",
+            v_path_search_triggers, dbg='v_path_search_update')[0]
+
+        if n_triggers != len(v_path_search_triggers):
+            # filled and the triggers created in one transaction, no change of a v_path is missed in between
+            self.logger.log('DATABASE: Filling v_path search table')
+            self.db_execute_one('DROP TABLE IF EXISTS "core_v_path_search";', dbg='v_path_search_update')
+            self.db_execute_one(
+                'CREATE VIRTUAL TABLE "core_v_path_search" USING fts5("v_path", tokenize="trigram");',
+                dbg='v_path_search_update')
+            # in rowid order, out of order rowids make the FTS5 inserts several times slower
+            self.db_execute_one(
+                "INSERT INTO core_v_path_search (rowid, v_path) "
+                "SELECT node_id, v_path FROM core_nodes WHERE v_path IS NOT NULL ORDER BY node_id",
+                dbg='v_path_search_update')
+            v_path_delete = "DELETE FROM core_v_path_search WHERE rowid = OLD.node_id;"
+            v_path_insert = "INSERT INTO core_v_path_search (rowid, v_path) " \
+                            "SELECT NEW.node_id, NEW.v_path WHERE NEW.v_path IS NOT NULL;"
+            for name, event, when, body in [
+                ('core_nodes_v_path_insert', 'INSERT', 'NEW.v_path IS NOT NULL', v_path_insert),
+                ('core_nodes_v_path_update', 'UPDATE OF v_path', 'OLD.v_path IS NOT NEW.v_path',
+                 v_path_delete + ' ' + v_path_insert),
+                ('core_nodes_v_path_delete', 'DELETE', 'OLD.v_path IS NOT NULL', v_path_delete),
+            ]:
+                self.db_execute_one(
+                    f'CREATE TRIGGER IF NOT EXISTS "{name}" AFTER {event} ON core_nodes WHEN {when} '
+                    f'BEGIN {body} END;',
+                    dbg='v_path_search_update')
+        self.db_conn.commit()
+
+        self._v_path_search_checked = True
+        return True
+
+    def v_path_search_where(self, v_path_like=None, v_path_regexp=None):
+        # where clause over core_v_path_search, the trigram index narrows the candidates with the literal runs of
+        # the patterns, the candidates are then checked with the patterns themselves
+        params = []
+        wheres = []
+        literals = []
+
+        if v_path_like is not None:
+            literals += like_literals(v_path_like)
+        if v_path_regexp is not None:
+            literals += regexp_literals(v_path_regexp)
+
+        match = fts_match_expr(literals)
+        if match is not None:
+            params.append(match)
+            wheres.append('(core_v_path_search MATCH (?))')
+
+        if v_path_like is not None:
+            params.append(v_path_like)
+            wheres.append('(v_path LIKE (?))')
+
+        if v_path_regexp is not None:
+            params.append(v_path_regexp)
+            wheres.append('(v_path REGEXP (?))')
+
+        return ' AND '.join(wheres), params
+
+    def v_paths_where_match(self, v_path_like=None, v_path_regexp=None):
+        """
+        Distinct v_paths matching a LIKE pattern and/or a regular expression (searched, not anchored)
+        :return: list of v_paths (str)
+        """
+        if isinstance(v_path_like, bytes):
+            v_path_like = v_path_like.decode('utf-8')
+        if isinstance(v_path_regexp, bytes):
+            v_path_regexp = v_path_regexp.decode('utf-8')
+
+        if self.v_path_search_update():
+            where_str, params = self.v_path_search_where(v_path_like, v_path_regexp)
+            table = 'core_v_path_search'
+        else:
+            where_str, params = self.nodes_v_path_where(v_path_like, v_path_regexp)
+            table = 'core_nodes'
+
+        if len(where_str) > 0:
+            where_str = ' WHERE ' + where_str
+
+        result = self.db_query_all(
+            f"SELECT DISTINCT v_path FROM {table}{where_str}", params, dbg='v_paths_where_match')
+        return [r[0] for r in result if r[0] is not None]
+
+    @staticmethod
+    def nodes_v_path_where(v_path_like=None, v_path_regexp=None):
+        params = []
+        wheres = []
+
+        if v_path_like is not None:
+            params.append(v_path_like)
+            wheres.append('(v_path LIKE (?))')
+
+        if v_path_regexp is not None:
+            params.append(v_path_regexp)
+            wheres.append('(v_path REGEXP (?))')
+
+        return ' AND '.join(wheres), params
+
     def blocks_where_node_id(self, node_id):
         blocks = self.db_query_all(
             "SELECT block_offset, block_length_compressed, block_length_uncompressed "
@@ -605,14 +824,133 @@ class VfsDatabase(DbBase):
         r1 = db_to_vfs_node(r1)
         return r1
 
-    # def nodes_where_uid(self, uids):
-    #     nodes = self.db_query_one(
-    #         "select * from core_nodes where node_id in (?)",
-    #         [uids],
-    #         dbg='nodes_where_uid')
-    #
-    #     nodes = [db_to_vfs_node(node) for node in nodes]
-    #     return nodes
+    def nodes_snapshot_changed(self):
+        self._nodes_snapshot = None
+
+    def nodes_snapshot(self) -> VfsNodeSnapshot:
+        """
+        Columnar copy of core_nodes, built on first use, for batch consumers that look up a large share of the nodes
+        more than once, building it reads all of core_nodes. Single lookups and smaller batches are cheaper with
+        node_where_uid and nodes_where_uids
+        """
+        # data_version changes when another connection commits, changes of this one call db_changed_signal
+        data_version = self.db_query_one("PRAGMA data_version", dbg='nodes_snapshot')[0]
+        if self._nodes_snapshot is not None and self._nodes_snapshot_data_version != data_version:
+            self._nodes_snapshot = None
+        if self._nodes_snapshot is None:
+            self._nodes_snapshot = VfsNodeSnapshot(self)
+            self._nodes_snapshot_data_version = data_version
+            self.logger.log('DATABASE: Node snapshot: {} nodes, {:0.1f} MiB'.format(
+                self._nodes_snapshot.count, self._nodes_snapshot.nbytes() / 1024**2))
+        return self._nodes_snapshot
+
+    def hash_string_resolver_changed(self):
+        self._hash_string_resolver_checked = False
+
+    def hash_string_resolver_state(self):
+        # core_strings is only appended to, the row count and last rowid tell if it changed
+        return tuple(self.db_query_one(
+            "SELECT COUNT(*), IFNULL(MAX(rowid), 0) FROM core_strings", dbg='hash_string_resolver_state'))
+
+    def hash_string_resolver(self) -> HashStringResolver:
+        """
+        Process wide hash -> string lookup of core_strings, no query per lookup
+        """
+        if not self._hash_string_resolver_checked:
+            if self._hash_string_resolver is None or \
+                    self._hash_string_resolver.state != self.hash_string_resolver_state():
+                self._hash_string_resolver = HashStringResolver(self)
+                self.logger.log('DATABASE: Hash string resolver: {} strings, {:0.1f} MiB'.format(
+                    self._hash_string_resolver.count, self._hash_string_resolver.nbytes() / 1024**2))
+            self._hash_string_resolver_checked = True
+        return self._hash_string_resolver
+
+    def nodes_snapshot_where_uids(self, uids):
+        """
+        Nodes from the snapshot, no query per node
+        :return: list of VfsNode in the order of uids, None for missing uids
+        """
+        snapshot = self.nodes_snapshot()
+        return [
+            None if v is None else db_to_vfs_node(v)
+            for v in snapshot.db_rows(snapshot.rows_where_uids(uids))
+        ]
+
+    def node_snapshot_where_uid(self, uid):
+        snapshot = self.nodes_snapshot()
+        v = snapshot.db_row(snapshot.row_where_uid(uid))
+        return None if v is None else db_to_vfs_node(v)
+
+    def nodes_where_uids(self, uids, chunk_size=512):
+        """
+        Batch version of node_where_uid, one query per chunk of uids
+        :return: list of VfsNode in the order of uids, None for missing uids
+        """
+        uids = list(uids)
+        nodes = {}
+        for i in range(0, len(uids), chunk_size):
+            uids_chunk = uids[i:i + chunk_size]
+            result = self.db_query_all(
+                "SELECT * FROM core_nodes WHERE node_id IN ({})".format(','.join(['?'] * len(uids_chunk))),
+                uids_chunk, dbg='nodes_where_uids')
+            for v in result:
+                nodes[v[0]] = db_to_vfs_node(v)
+        return [nodes.get(uid) for uid in uids]
+
+    def nodes_where_pids(self, pids, chunk_size=512):
+        """
+        Children of each parent, one query per chunk of pids
+        :return: dict of pid -> list of VfsNode ordered by parent_index
+        """
+        pids = list(pids)
+        children = {pid: [] for pid in pids}
+        for i in range(0, len(pids), chunk_size):
+            pids_chunk = pids[i:i + chunk_size]
+            result = self.db_query_all(
+                "SELECT * FROM core_nodes WHERE parent_id IN ({}) ORDER BY parent_id, parent_index".format(
+                    ','.join(['?'] * len(pids_chunk))),
+                pids_chunk, dbg='nodes_where_pids')
+            for v in result:
+                children[v[2]].append(db_to_vfs_node(v))
+        return children
+
+    def node_children(self, pid):
+        return self.nodes_where_pids([pid])[pid]
+
+    def nodes_ancestors_where_uids(self, uids, chunk_size=512):
+        """
+        Nodes and all their ancestors, one recursive query per chunk of uids
+        :return: dict of uid -> VfsNode, for the nodes of uids and every node up their parent chains
+        """
+        uids = list(uids)
+        nodes = {}
+        for i in range(0, len(uids), chunk_size):
+            uids_chunk = uids[i:i + chunk_size]
+            result = self.db_query_all(
+                "WITH RECURSIVE ancestors(node_id) AS ("
+                "SELECT node_id FROM core_nodes WHERE node_id IN ({}) "
+                "UNION "
+                "SELECT core_nodes.parent_id FROM core_nodes JOIN ancestors ON core_nodes.node_id = ancestors.node_id "
+                "WHERE core_nodes.parent_id IS NOT NULL"
+                ") "
+                "SELECT core_nodes.* FROM core_nodes JOIN ancestors ON core_nodes.node_id = ancestors.node_id".format(
+                    ','.join(['?'] * len(uids_chunk))),
+                uids_chunk, dbg='nodes_ancestors_where_uids')
+            for v in result:
+                nodes[v[0]] = db_to_vfs_node(v)
+        return nodes
+
+    def node_ancestors_where_uid(self, uid):
+        """
+        :return: list of VfsNode, the node of uid then its parent and so on up to the root
+        """
+        nodes = self.nodes_ancestors_where_uids([uid])
+        chain = []
+        node = nodes.get(uid)
+        while node is not None:
+            chain.append(node)
+            node = None if node.pid is None else nodes.get(node.pid)
+        return chain
 
     def nodes_where_match(
             self,
@@ -638,17 +976,21 @@ class VfsDatabase(DbBase):
             params.append(v_path)
             wheres.append('(v_path == (?))')
 
-        if v_path_like is not None:
-            if isinstance(v_path_like, bytes):
-                v_path_like = v_path_like.decode('utf-8')
-            params.append(v_path_like)
-            wheres.append('(v_path LIKE (?))')
+        if isinstance(v_path_like, bytes):
+            v_path_like = v_path_like.decode('utf-8')
 
-        if v_path_regexp is not None:
-            if isinstance(v_path_regexp, bytes):
-                v_path_regexp = v_path_regexp.decode('utf-8')
-            params.append(v_path_regexp)
-            wheres.append('(v_path REGEXP (?))')
+        if isinstance(v_path_regexp, bytes):
+            v_path_regexp = v_path_regexp.decode('utf-8')
+
+        if v_path_like is not None or v_path_regexp is not None:
+            if self.v_path_search_update():
+                search_where, search_params = self.v_path_search_where(v_path_like, v_path_regexp)
+                params += search_params
+                wheres.append('(node_id IN (SELECT rowid FROM core_v_path_search WHERE ' + search_where + '))')
+            else:
+                search_where, search_params = self.nodes_v_path_where(v_path_like, v_path_regexp)
+                params += search_params
+                wheres.append(search_where)
 
         if file_type is not None:
             if isinstance(file_type, bytes):
@@ -785,6 +1127,19 @@ class VfsDatabase(DbBase):
             dbg='nodes_where_match_select_uid_v_hash_processed')
         return results
 
+    def nodes_select_size_where_uids(self, uids, chunk_size=512):
+        # processing cost estimate for scheduling, the uncompressed size, or compressed size if it is unknown
+        sizes = {}
+        for i in range(0, len(uids), chunk_size):
+            uids_chunk = uids[i:i + chunk_size]
+            result = self.db_query_all(
+                "SELECT node_id, size_u, size_c FROM core_nodes WHERE node_id IN ({})".format(
+                    ','.join(['?'] * len(uids_chunk))),
+                uids_chunk, dbg='nodes_select_size_where_uids')
+            for uid, size_u, size_c in result:
+                sizes[uid] = size_u if size_u is not None else (size_c or 0)
+        return [sizes.get(uid, 0) for uid in uids]
+
     def nodes_select_distinct_vhash(self):
         result = self.db_query_all(
             "SELECT DISTINCT v_hash FROM core_nodes", dbg='nodes_select_distinct_vhash')
@@ -903,6 +1258,43 @@ class VfsDatabase(DbBase):
 
         return result
 
+    def v_hashes_nodes_strings(self, v_hashes, hash_column):
+        """
+        Nodes of a set of v_hashes and the hash strings matching them with their references, two joins instead of
+        a node, string and reference query per v_hash
+        :param v_hashes: list of v_hash
+        :param hash_column: column of core_strings the v_hashes are matched against, hash32 or hash64
+        :return: list of VfsNode ordered by uid, list of (hash, string rowid, string, reference rowid, node_id_src,
+            used_at_runtime, possible_file_types) ordered by string rowid then reference, the reference fields are None
+            for strings without references
+        """
+        if hash_column not in ('hash32', 'hash48', 'hash64'):
+            raise NotImplementedError(f'Unhandled hash column {hash_column}')
+
+        self.db_temp_table_fill(
+            'v_hash_keys', ['"v_hash" INTEGER'], [(v_hash,) for v_hash in v_hashes], dbg='v_hashes_nodes_strings:stage')
+        self.db_execute_one(
+            'CREATE INDEX temp.v_hash_keys_v_hash ON v_hash_keys(v_hash);', dbg='v_hashes_nodes_strings:stage')
+
+        nodes = self.db_query_all(
+            "SELECT core_nodes.* FROM temp.v_hash_keys t JOIN core_nodes ON core_nodes.v_hash == t.v_hash "
+            "ORDER BY core_nodes.node_id",
+            dbg='v_hashes_nodes_strings:nodes')
+        nodes = [db_to_vfs_node(node) for node in nodes]
+
+        strings = self.db_query_all(
+            f"SELECT s.{hash_column}, s.rowid, s.string, "
+            f"r.rowid, r.node_id_src, r.used_at_runtime, r.possible_file_types "
+            f"FROM temp.v_hash_keys t JOIN core_strings s ON s.{hash_column} == t.v_hash "
+            f"LEFT JOIN core_string_references r ON r.string_rowid == s.rowid "
+            f"ORDER BY s.rowid, r.node_id_src, r.is_adf_field_name, r.used_at_runtime, r.possible_file_types",
+            dbg='v_hashes_nodes_strings:strings')
+        strings = [(r[0], r[1], to_bytes(r[2]), *r[3:]) for r in strings]
+
+        self.db_execute_one('DROP TABLE temp.v_hash_keys;', dbg='v_hashes_nodes_strings:drop')
+
+        return nodes, strings
+
     def nodes_delete_where_uid(self, uids):
         self.db_execute_many(
             "DELETE FROM core_nodes WHERE node_id=(?)", uids, dbg='nodes_delete_where_uid'
@@ -911,6 +1303,54 @@ class VfsDatabase(DbBase):
 
         self.db_changed_signal.call()
 
+    def nodes_delete_subtree_where_uid(self, uids, include_roots=True):
+        # delete everything below the given nodes, and everything derived from them, optionally keeping the nodes
+        self.db_execute_one('DROP TABLE IF EXISTS temp.subtree_nodes;')
+        self.db_execute_one(
+            'CREATE TEMP TABLE subtree_nodes ("node_id" INTEGER NOT NULL, "is_root" INTEGER, PRIMARY KEY ("node_id"));')
+        self.db_execute_many(
+            "INSERT OR IGNORE INTO temp.subtree_nodes VALUES (?, 1)", [(uid, ) for uid in uids],
+            dbg='nodes_delete_subtree_where_uid:roots')
+        self.db_execute_one(
+            '''
+            WITH RECURSIVE sub(node_id) AS (
+                SELECT node_id FROM core_nodes WHERE parent_id IN (SELECT node_id FROM temp.subtree_nodes)
+                UNION
+                SELECT c.node_id FROM core_nodes c JOIN sub s ON c.parent_id == s.node_id
+            )
+            INSERT OR IGNORE INTO temp.subtree_nodes SELECT node_id, 0 FROM sub
+            ''', dbg='nodes_delete_subtree_where_uid:subtree')
+
+        n_nodes = self.db_query_one(
+            "SELECT COUNT(*) FROM temp.subtree_nodes WHERE is_root == 0", dbg='nodes_delete_subtree_where_uid:count')[0]
+
+        sub = 'SELECT node_id FROM temp.subtree_nodes'
+        if include_roots:
+            sub_nodes = sub
+        else:
+            sub_nodes = sub + ' WHERE is_root == 0'
+
+        stmts = [
+            f'DELETE FROM core_string_references WHERE node_id_src IN ({sub})',
+            f'DELETE FROM core_object_id_ref WHERE object_rowid IN (SELECT rowid FROM core_objects WHERE node_id_src IN ({sub}))',
+            f'DELETE FROM core_event_id_ref WHERE object_rowid IN (SELECT rowid FROM core_objects WHERE node_id_src IN ({sub}))',
+            f'DELETE FROM core_objects WHERE node_id_src IN ({sub})',
+            f'DELETE FROM core_gtoc_file_entry WHERE def_rowid IN (SELECT rowid FROM core_gtoc_archive_def WHERE node_id_src IN ({sub}))',
+            f'DELETE FROM core_gtoc_archive_def WHERE node_id_src IN ({sub})',
+            f'DELETE FROM core_adf_types WHERE missing_in IN ({sub})',
+            f'DELETE FROM core_node_blocks WHERE node_id IN ({sub_nodes})',
+            f'DELETE FROM core_nodes WHERE node_id IN ({sub_nodes})',
+        ]
+        for stmt in stmts:
+            self.db_execute_one(stmt, dbg='nodes_delete_subtree_where_uid:delete')
+
+        self.db_execute_one('DROP TABLE IF EXISTS temp.subtree_nodes;')
+        self.db_conn.commit()
+
+        self.db_changed_signal.call()
+
+        return n_nodes
+
     def nodes_add_many(self, nodes):
         db_nodes = [db_from_vfs_node(node) for node in nodes]
 
@@ -923,16 +1363,24 @@ class VfsDatabase(DbBase):
 
         blocks = []
         node: VfsNode
-        for node in nodes:
-            if node.blocks_raw():
-                result = self.db_query_all(
-                    "SELECT node_id FROM core_nodes WHERE parent_id=(?) and parent_index=(?)",
-                    [node.pid, node.index],
-                    dbg='nodes_add_many:select_nodes'
-                )
+        nodes_with_blocks = [node for node in nodes if node.blocks_raw()]
+        if nodes_with_blocks:
+            # resolve the node ids with one join instead of a query per node
+            self.db_temp_table_fill(
+                'node_keys', ['"parent_id" INTEGER', '"parent_index" INTEGER'],
+                [(node.pid, node.index) for node in nodes_with_blocks],
+                dbg='nodes_add_many:stage_nodes')
+            result = self.db_query_all(
+                "SELECT t.key_index, n.node_id FROM temp.node_keys t JOIN core_nodes n "
+                "ON n.parent_id == t.parent_id AND n.parent_index == t.parent_index",
+                dbg='nodes_add_many:select_nodes'
+            )
+            self.db_execute_one('DROP TABLE temp.node_keys;', dbg='nodes_add_many:drop')
 
-                node.uid = result[0][0]
+            for key_index, node_id in result:
+                nodes_with_blocks[key_index].uid = node_id
 
+            for node in nodes_with_blocks:
                 for bi, block in enumerate(node.blocks_raw()):
                     blocks.append((node.uid, bi, block[0], block[1], block[2]))
 
@@ -956,7 +1404,8 @@ class VfsDatabase(DbBase):
     def hash_string_add_many_basic(self, hash_list):
         # (string, h4, h6, h8, ext_hash32)
         hash_list_str = [(to_str(h[0]), h[1], h[2], h[3], h[4]) for h in hash_list]
-        hash_list_str_unique = list(set(hash_list_str))
+        # sorted, inserts and the join below then walk the primary key index in order
+        hash_list_str_unique = sorted(set(hash_list_str))
         self.db_execute_many(
             "INSERT OR IGNORE INTO core_strings VALUES (?,?,?,?,?)",
             hash_list_str_unique,
@@ -965,17 +1414,29 @@ class VfsDatabase(DbBase):
         self.db_conn.commit()
         self.db_changed_signal.call()
 
+        # resolve all rowids with one join instead of a query per string
+        self.db_temp_table_fill(
+            'string_keys',
+            ['"string" TEXT', '"hash32" INTEGER', '"hash48" INTEGER', '"hash64" INTEGER', '"ext_hash32" INTEGER'],
+            hash_list_str_unique,
+            dbg='hash_string_add_many_basic:1:stage')
+        result = self.db_query_all(
+            """
+            SELECT t.key_index, s.rowid FROM temp.string_keys t JOIN core_strings s ON
+            s.string == t.string AND s.hash32 == t.hash32 AND s.hash48 == t.hash48 AND s.hash64 == t.hash64 AND
+            s.ext_hash32 == t.ext_hash32
+            """,
+            dbg='hash_string_add_many_basic:1:select')
+        self.db_execute_one('DROP TABLE temp.string_keys;', dbg='hash_string_add_many_basic:1:drop')
+        self.db_conn.commit()
+
+        # we expect one and only one match for a hash+string
+        assert len(result) == len(hash_list_str_unique)
+
         hash_list_map = {}
         str_to_row_map = {}
-        for rec in hash_list_str_unique:
-            result = self.db_query_all(
-                "SELECT rowid FROM core_strings WHERE string=(?) and hash32=(?) and hash48=(?) and hash64=(?) and ext_hash32=(?)",
-                rec,
-                dbg='hash_string_add_many_basic:1:select')
-
-            # we expect one and only one match for a hash+string
-            assert len(result) == 1
-            row_id = result[0][0]
+        for key_index, row_id in result:
+            rec = hash_list_str_unique[key_index]
             hash_list_map[rec] = row_id
             str_to_row_map[to_bytes(rec[0])] = row_id
 
@@ -1091,7 +1552,7 @@ class VfsDatabase(DbBase):
             for fe in a.file_entries:
                 file_entry_strings.add(fe.path)
 
-        hash_list = [make_hash_string_tuple(s) for s in file_entry_strings]
+        hash_list = make_hash_string_tuples(file_entry_strings)
         _, _, str_to_row_map = self.hash_string_add_many_basic(hash_list)
 
         # insert file entries into db
@@ -1227,13 +1688,51 @@ class VfsDatabase(DbBase):
         '''
         return archives
 
-    def adf_type_map_save(self, adf_map, adf_missing):
-        adf_list = []
+    def archive_fingerprints_select(self):
+        result = self.db_query_all(
+            "SELECT p_path, node_id, file_size, mtime_ns, fingerprint FROM core_archive_fingerprints",
+            dbg='archive_fingerprints_select')
+        return {r[0]: r[1:] for r in result}
 
-        for k, v in adf_map.items():
-            with io.BytesIO() as f:
-                pickle.dump(v, f)
-                adf_list.append((k, 0, bytes(f.getbuffer())))
+    def archive_fingerprints_set(self, records):
+        # (p_path, node_id, file_size, mtime_ns, fingerprint)
+        self.db_execute_many(
+            "INSERT OR REPLACE INTO core_archive_fingerprints VALUES (?,?,?,?,?)", records,
+            dbg='archive_fingerprints_set')
+        self.db_conn.commit()
+
+    def archive_fingerprints_delete_where_p_path(self, p_paths):
+        self.db_execute_many(
+            "DELETE FROM core_archive_fingerprints WHERE p_path=(?)", [(p, ) for p in p_paths],
+            dbg='archive_fingerprints_delete_where_p_path')
+        self.db_conn.commit()
+
+    def hash_reverse_jobs_select(self):
+        result = self.db_query_all(
+            "SELECT template, tokens, n_candidates, n_done, n_hits FROM core_hash_reverse_jobs ORDER BY ROWID",
+            dbg='hash_reverse_jobs_select')
+        return [(r[0], pickle.loads(r[1]), r[2], r[3], r[4]) for r in result]
+
+    def hash_reverse_job_set(self, template, tokens, n_candidates, n_done, n_hits):
+        self.db_execute_one(
+            "INSERT OR REPLACE INTO core_hash_reverse_jobs VALUES (?,?,?,?,?)",
+            [template, pickle.dumps(tokens), n_candidates, n_done, n_hits],
+            dbg='hash_reverse_job_set')
+        self.db_conn.commit()
+
+    def hash_reverse_job_progress(self, template, n_done, n_hits):
+        self.db_execute_one(
+            "UPDATE core_hash_reverse_jobs SET n_done=(?), n_hits=(?) WHERE template=(?)",
+            [n_done, n_hits, template],
+            dbg='hash_reverse_job_progress')
+        self.db_conn.commit()
+
+    def adf_type_map_save(self, adf_map, adf_missing):
+        """
+        :param adf_map: dict of type_hash -> packed TypeDef, see ff_adf.typedef_pack
+        :param adf_missing: set of (type_hash, uid of the node missing it)
+        """
+        adf_list = [(k, 0, v) for k, v in adf_map.items()]
 
         for type_id, missing_in in adf_missing:
             adf_list.append((type_id, missing_in, bytes()))
@@ -1243,50 +1742,31 @@ class VfsDatabase(DbBase):
         self.db_conn.commit()
         self.db_changed_signal.call()
 
-    def adf_type_map_load(self):
-        result = self.db_query_all("SELECT * FROM core_adf_types", dbg='adf_type_map_load')
-
-        adf_map = {}
-        adf_missing = set()
-        for k, miss, b in result:
-            if len(b) > 0:
-                with io.BytesIO(b) as f:
-                    v = pickle.load(f)
-                adf_map[k] = v
-            elif miss is not None and miss != 0:
-                adf_missing.add((k, miss))
-            else:
-                raise NotImplemented(f'Unknown type record: {k}, {miss}, {b}')
-
-        return adf_map, adf_missing
-
-    def generate_cache_file_name(self, node: VfsNode):
-        pid = node.pid
-        parent_nodes = []
-        parent_paths = []
-        while pid is not None:
-            parent_node = self.node_where_uid(pid)
-            pid = parent_node.pid
-            parent_nodes.append(parent_node)
-            pp = None
-            if parent_node.p_path is not None:
-                prefix, end0, end1 = common_prefix(parent_node.p_path, self.game_info.game_dir)
-                f, e = os.path.splitext(end0)
-                if e != '.tab':
-                    pp = end0
-            else:
-                pp = parent_node.v_hash_to_str() + '.dat'
-            if pp is not None:
-                parent_paths.append(pp)
-        cache_dir = os.path.join(self.working_dir, '__CACHE__/', *parent_paths[::-1])
-        file_name = os.path.join(cache_dir, node.v_hash_to_str() + '.dat')
-
-        global dumped_cache_dir
-        if not dumped_cache_dir:
-            dumped_cache_dir = True
-            self.logger.log(f'CACHE DIRECTORY -> {cache_dir}')
+    def adf_type_map_version(self):
+        # changes whenever types are added or removed, names the shared registry file, see ff_adf.adf_type_registry_load
+        result = self.db_query_one(
+            "SELECT COUNT(*), IFNULL(MAX(rowid), 0), IFNULL(SUM(type_hash), 0) FROM core_adf_types "
+            "WHERE LENGTH(pickle) > 0",
+            dbg='adf_type_map_version')
+        return tuple(result)
+
+    def adf_type_map_load_packed(self):
+        """
+        :return: adf_type_map_version of the rows read, list of (type_hash, packed or pickled TypeDef), pickled by
+        older versions
+        """
+        # the version is taken from the rows themselves, a separate query could see types added in between
+        result = self.db_query_all(
+            "SELECT rowid, type_hash, pickle FROM core_adf_types WHERE LENGTH(pickle) > 0 ORDER BY rowid",
+            dbg='adf_type_map_load_packed')
+        version = (len(result), result[-1][0] if result else 0, sum([r[1] for r in result]))
+        return version, [(type_hash, blob) for _, type_hash, blob in result]
 
-        return file_name
+    def adf_type_missing_load(self):
+        result = self.db_query_all(
+            "SELECT type_hash, missing_in FROM core_adf_types WHERE LENGTH(pickle) == 0 AND missing_in != 0",
+            dbg='adf_type_missing_load')
+        return set((k, miss) for k, miss in result)
 
     def file_obj_from(self, node: VfsNode):
         compression_type = node.compression_type_get()
@@ -1296,8 +1776,12 @@ class VfsDatabase(DbBase):
         elif node.file_type == FTYPE_TAB:
             return self.file_obj_from(self.node_where_uid(node.pid))
         elif compression_type in {compression_v3_zlib}:
-            file_name = self.generate_cache_file_name(node)
-            if not os.path.isfile(file_name):
+            buffer_out = self.uncompressed_cache.get(node.uid)
+            if buffer_out is not None:
+                return BufferFile(buffer_out)
+
+            buffer_out = self.decompress_cache.get(node)
+            if buffer_out is None:
                 parent_node = self.node_where_uid(node.pid)
                 with ArchiveFile(self.file_obj_from(parent_node)) as pf:
                     pf.seek(node.offset)
@@ -1307,60 +1791,33 @@ class VfsDatabase(DbBase):
                 buffer_out = extract_aaf(ArchiveFile(io.BytesIO(buffer_in)))
                 self.logger.log(f'E: id:{node.uid}, pid:{node.pid}, v:{node.v_path}, p:{node.p_path}, cs:{node.size_c}, us:{node.size_u}')
 
-                make_dir_for_file(file_name)
-                with open(file_name, 'wb') as fo:
-                    fo.write(buffer_out)
+                self.decompress_cache.put(node, buffer_out)
 
-                return io.BytesIO(buffer_out)
-            else:
-                return open(file_name, 'rb')
+            buffer_out = self.uncompressed_cache.put(node.uid, buffer_out)
+            return BufferFile(buffer_out)
 
         elif compression_type in {compression_v4_01_zlib, compression_v4_03_zstd, compression_v4_04_oo}:
-            file_name = self.generate_cache_file_name(node)
+            buffer_out = self.uncompressed_cache.get(node.uid)
+            if buffer_out is not None:
+                return BufferFile(buffer_out)
 
-            if not os.path.isfile(file_name):
-                parent_node = self.node_where_uid(node.pid)
-                make_dir_for_file(file_name)
-                good_blocks = []
-                bad_blocks = []
-                buffer_out = b''
-
-                blocks = node.blocks_get(self)
+            blocks = node.blocks_get(self)
+            buffer_out = self.decompress_cache.get(node, blocks)
 
+            if buffer_out is None:
+                parent_node = self.node_where_uid(node.pid)
                 with self.file_obj_from(parent_node) as f_in:
-                    for bi, (block_offset, compressed_len, uncompressed_len) in enumerate(blocks):
-                        f_in.seek(block_offset)
-                        in_buffer = f_in.read(compressed_len)
-
-                        if compression_type in {compression_v4_01_zlib}:
-                            buffer_ret = zlib.decompress(in_buffer)
-                            ret = len(buffer_ret)
-                            # buffer_ret = in_buffer
-                            # ret = compressed_len
-                        elif compression_type in {compression_v4_03_zstd}:
-                            if compressed_len == uncompressed_len:
-                                buffer_ret, ret = in_buffer, len(in_buffer)
-                            else:
-                                dc = zstd.ZstdDecompressor()
-                                buffer_ret = dc.decompress(in_buffer)
-                                ret = len(buffer_ret)
-                        else:
-                            if compressed_len == uncompressed_len:
-                                buffer_ret, ret = in_buffer, len(in_buffer)
-                            else:
-                                buffer_ret, ret = self.decompress_oodle_lz.decompress(
-                                    in_buffer, compressed_len, uncompressed_len)
-
-                        bb = (bi, ret, block_offset, compressed_len, uncompressed_len)
-                        if ret == uncompressed_len:
-                            good_blocks.append(bb)
-                            buffer_out = buffer_out + buffer_ret
-                        else:
-                            bad_blocks.append(bb)
-                            buffer_out = buffer_out + in_buffer
-
-                with open(file_name, 'wb') as f_out:
-                    f_out.write(buffer_out)
+                    if self.decompress_threads > 1 and len(blocks) >= self.decompress_threads_min_blocks:
+                        if self._decompress_executor is None:
+                            self._decompress_executor = concurrent.futures.ThreadPoolExecutor(
+                                max_workers=self.decompress_threads, thread_name_prefix='decompress')
+                        buffer_out, good_blocks, bad_blocks = blocks_decompress_parallel(
+                            f_in, blocks, compression_type, self._decompress_executor, self.decompress_oodle_lz)
+                    else:
+                        buffer_out, good_blocks, bad_blocks = blocks_decompress(
+                            f_in, blocks, compression_type, self.decompress_oodle_lz)
+
+                self.decompress_cache.put(node, buffer_out, blocks)
 
                 all_blocks = good_blocks + bad_blocks
                 all_blocks.sort()
@@ -1370,14 +1827,13 @@ class VfsDatabase(DbBase):
                     label = 'GOOD'
 
                 if bad_blocks:
-                    self.logger.trace('{}: ct:{}, cf:{}, sc:{}, su:{}, bnn:{}, bl:{}, f:{}'.format(
+                    self.logger.trace('{}: ct:{}, cf:{}, sc:{}, su:{}, bnn:{}, bl:{}, id:{}'.format(
                         label, node.compression_type_get(), node.compression_flag_get(), node.size_c, node.size_u,
-                        len(blocks) > 0, all_blocks, file_name,
+                        len(blocks) > 0, all_blocks, node.uid,
                     ))
 
-                return io.BytesIO(buffer_out)
-            else:
-                return open(file_name, 'rb')
+            buffer_out = self.uncompressed_cache.put(node.uid, buffer_out)
+            return BufferFile(buffer_out)
 
         elif compression_type != compression_00_none:
             self.logger.log(f'NOT IMPLEMENTED: COMPRESSION TYPE {compression_type}: B: id:{node.uid}, pid:{node.pid}, v:{node.v_path}, p:{node.p_path}, cs:{node.size_c}, us:{node.size_u}')
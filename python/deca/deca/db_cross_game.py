@@ -21,8 +21,8 @@ from deca.db_types import *
 
 
 class DbCrossGame(DbBase):
-    def __init__(self,  working_dir, logger):
-        super().__init__(os.path.join(working_dir, 'cross_game.db'), logger)
+    def __init__(self,  working_dir, logger, db_profile=None):
+        super().__init__(os.path.join(working_dir, 'cross_game.db'), logger, db_profile)
 
         self.db_execute_one(
             '''
@@ -40,7 +40,8 @@ class DbCrossGame(DbBase):
     def hash_string_add_many_basic(self, hash_list):
         # (string, h4, h6, h8, ext_hash32)
         hash_list_str = [(to_str(h[0]), h[1], h[2], h[3], h[4]) for h in hash_list]
-        hash_list_str_unique = list(set(hash_list_str))
+        # sorted, inserts and the join below then walk the primary key index in order
+        hash_list_str_unique = sorted(set(hash_list_str))
         self.db_execute_many(
             "INSERT OR IGNORE INTO field_strings VALUES (?,?,?,?,?)",
             hash_list_str_unique,
@@ -49,17 +50,29 @@ class DbCrossGame(DbBase):
         self.db_conn.commit()
         self.db_changed_signal.call()
 
+        # resolve all rowids with one join instead of a query per string
+        self.db_temp_table_fill(
+            'string_keys',
+            ['"string" TEXT', '"hash32" INTEGER', '"hash48" INTEGER', '"hash64" INTEGER', '"ext_hash32" INTEGER'],
+            hash_list_str_unique,
+            dbg='hash_string_add_many_basic:1:stage')
+        result = self.db_query_all(
+            """
+            SELECT t.key_index, s.rowid FROM temp.string_keys t JOIN field_strings s ON
+            s.string == t.string AND s.hash32 == t.hash32 AND s.hash48 == t.hash48 AND s.hash64 == t.hash64 AND
+            s.ext_hash32 == t.ext_hash32
+            """,
+            dbg='hash_string_add_many_basic:1:select')
+        self.db_execute_one('DROP TABLE temp.string_keys;', dbg='hash_string_add_many_basic:1:drop')
+        self.db_conn.commit()
+
+        # we expect one and only one match for a hash+string
+        assert len(result) == len(hash_list_str_unique)
+
         hash_list_map = {}
         str_to_row_map = {}
-        for rec in hash_list_str_unique:
-            result = self.db_query_all(
-                "SELECT rowid FROM field_strings WHERE string=(?) and hash32=(?) and hash48=(?) and hash64=(?) and ext_hash32=(?)",
-                rec,
-                dbg='hash_string_add_many_basic:1:select')
-
-            # we expect one and only one match for a hash+string
-            assert len(result) == 1
-            row_id = result[0][0]
+        for key_index, row_id in result:
+            rec = hash_list_str_unique[key_index]
             hash_list_map[rec] = row_id
             str_to_row_map[to_bytes(rec[0])] = row_id
 
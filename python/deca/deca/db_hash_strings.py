@@ -0,0 +1,94 @@
+import bisect
+import itertools
+import numpy as np
+from deca.db_snapshot import int_array_compact, strings_pack_utf8
+
+'''
+Read only hash -> string lookup over all of core_strings, for consumers that resolve many hashes one at a time, like
+the RTPC and ADF text dumps
+
+Per hash column the hashes are sorted, with the row of each hash into a packed utf-8 buffer of the strings. Among
+strings with the same hash the first in rowid order is returned, like the first row of hash_string_match.
+'''
+
+hash_string_columns = ['hash32', 'hash48', 'hash64']
+
+
+class HashStringResolver:
+    def __init__(self, vfs):
+        """
+        Read all of core_strings
+        :param vfs: VfsDatabase
+        """
+        self.state = vfs.hash_string_resolver_state()
+        self.count = self.state[0]
+
+        strings = vfs.db_query_all("SELECT string FROM core_strings ORDER BY rowid", dbg='hash_string_resolver')
+        self.strings, offsets = strings_pack_utf8([v[0] for v in strings])
+        del strings
+        self._offsets = memoryview(offsets)
+
+        hash_fields = ', '.join([f'IFNULL({column}, 0)' for column in hash_string_columns])
+        null_fields = ' | '.join([f'(({column} IS NULL) << {i})' for i, column in enumerate(hash_string_columns)])
+        n_fields = len(hash_string_columns) + 1
+        cursor = vfs.db_query_iter(
+            f"SELECT {hash_fields}, {null_fields} FROM core_strings ORDER BY rowid", dbg='hash_string_resolver')
+        values = np.fromiter(
+            itertools.chain.from_iterable(cursor), dtype=np.int64, count=self.count * n_fields)
+        values = values.reshape(self.count, n_fields)
+
+        # sorted hashes and the string row of each, stable so equal hashes keep rowid order
+        self._sorted = {}
+        self._order = {}
+        for i, column in enumerate(hash_string_columns):
+            rows = np.nonzero((values[:, -1] & (1 << i)) == 0)[0]
+            order = rows[np.argsort(values[rows, i], kind='stable')]
+            self._sorted[column] = memoryview(int_array_compact(values[order, i]))
+            self._order[column] = memoryview(int_array_compact(order))
+
+    def nbytes(self):
+        views = list(self._sorted.values()) + list(self._order.values()) + [self._offsets]
+        return sum([v.nbytes for v in views]) + len(self.strings)
+
+    def string_where_hash(self, column, hash_value):
+        """
+        :param column: hash32, hash48 or hash64
+        :return: str of the first string with the hash, None if there is none
+        """
+        hashes = self._sorted[column]
+        i = bisect.bisect_left(hashes, hash_value)
+        if i < len(hashes) and hashes[i] == hash_value:
+            row = self._order[column][i]
+            return self.strings[self._offsets[row]:self._offsets[row + 1]].decode('utf-8')
+        return None
+
+    def strings_where_hashes(self, column, hash_values):
+        """
+        string_where_hash of many hashes with one search
+        :return: {hash: str} of the hashes that have a string
+        """
+        hashes = np.asarray(self._sorted[column])
+        values = np.unique(np.asarray([v for v in hash_values if -2**63 <= v < 2**63], dtype=np.int64))
+        if len(hashes) == 0 or len(values) == 0:
+            return {}
+        # search in the dtype of the column, values outside of it have no string
+        info = np.iinfo(hashes.dtype)
+        lo = max(int(info.min), -2**63)
+        hi = min(int(info.max), 2**63 - 1)
+        values = values[(values >= lo) & (values <= hi)].astype(hashes.dtype)
+        index = np.minimum(np.searchsorted(hashes, values), len(hashes) - 1)
+        found = hashes[index] == values
+        rows = np.asarray(self._order[column])[index[found]]
+        return {
+            v: self.strings[self._offsets[row]:self._offsets[row + 1]].decode('utf-8')
+            for v, row in zip(values[found].tolist(), rows.tolist())
+        }
+
+    def string_where_hash32(self, hash_value):
+        return self.string_where_hash('hash32', hash_value)
+
+    def string_where_hash48(self, hash_value):
+        return self.string_where_hash('hash48', hash_value)
+
+    def string_where_hash64(self, hash_value):
+        return self.string_where_hash('hash64', hash_value)
@@ -3,6 +3,8 @@ import re
 import csv
 import time
 import sys
+import itertools
+import numpy as np
 
 from .file import ArchiveFile
 from .db_types import *
@@ -81,11 +83,12 @@ def game_file_to_sortable_string(v):
 
 
 class VfsProcessor(VfsDatabase):
-    def __init__(self, project_file, working_dir, logger):
-        VfsDatabase.__init__(self, project_file, working_dir, logger, init_display=True)
+    def __init__(self, project_file, working_dir, logger, db_profile=None):
+        VfsDatabase.__init__(self, project_file, working_dir, logger, init_display=True, db_profile=db_profile)
         self.last_status_update = None
         self.process_time_start = None
         self.process_time_last = None
+        self._commander = None
 
     def log(self, msg):
         self.logger.log(msg)
@@ -99,7 +102,18 @@ class VfsProcessor(VfsDatabase):
             self.last_status_update = curr_time
             self.log('Completed {} of {}'.format(i, n))
 
+    def commander(self):
+        # the worker pool of process(), or processes only for a single call when used outside of process()
+        if self._commander is not None:
+            return self._commander
+        return MultiProcessControl(self.project_file, self.working_dir, self.logger, db_profile=self.db_profile)
+
     def find_initial_files(self, debug=False):
+        initial_nodes = self.initial_nodes_find()
+        self.nodes_add_many(initial_nodes)
+        self.archive_fingerprints_record(initial_nodes)
+
+    def initial_nodes_find(self):
         self.logger.log('Add EXE files')
 
         initial_nodes = []
@@ -123,7 +137,7 @@ class VfsProcessor(VfsDatabase):
 
         self.logger.log('Add TAB / ARC files')
         input_files = []
-        dir_in = self.game_info.archive_paths()
+        dir_in = list(self.game_info.archive_paths())
         dir_found = []
 
         while len(dir_in) > 0:
@@ -157,7 +171,121 @@ class VfsProcessor(VfsDatabase):
                 file_type=FTYPE_ARC, p_path=file_arc, size_u=f_size, size_c=f_size, offset=0)
             initial_nodes.append(node)
 
-        self.nodes_add_many(initial_nodes)
+        return initial_nodes
+
+    @staticmethod
+    def initial_node_files(node: VfsNode):
+        # game files a top level node is built from, an ARC node also depends on its TAB file
+        if node.file_type == FTYPE_ARC:
+            return [node.p_path, os.path.splitext(node.p_path)[0] + '.tab']
+        return [node.p_path]
+
+    def archive_fingerprints_record(self, initial_nodes):
+        records = []
+        for node in initial_nodes:
+            if node.uid is None:
+                uids = self.db_query_all(
+                    "SELECT node_id FROM core_nodes WHERE p_path=(?) AND parent_id IS NULL", [node.p_path],
+                    dbg='archive_fingerprints_record')
+                if not uids:
+                    continue
+                node.uid = uids[0][0]
+            for fn in self.initial_node_files(node):
+                if os.path.isfile(fn):
+                    st = os.stat(fn)
+                    records.append((fn, node.uid, st.st_size, st.st_mtime_ns, None))
+        self.archive_fingerprints_set(records)
+
+    def process_archive_changes(self):
+        """
+        Compare the game files against the fingerprints recorded when they were added. Nodes of removed files are
+        deleted, nodes of changed files lose everything below them and are reset so the phase loop processes them
+        again, new files are added. Returns True if anything changed.
+        """
+        self.logger.log('PROCESS: Checking game files for changes')
+
+        recorded = self.archive_fingerprints_select()
+        initial_nodes = self.initial_nodes_find()
+
+        if not recorded:
+            # project processed before fingerprints were recorded, what is on disk now becomes the baseline
+            self.logger.log('PROCESS: Recording game file fingerprints')
+            self.archive_fingerprints_record(initial_nodes)
+            return False
+
+        nodes_added = []
+        uids_changed = set()
+        files_current = set()
+        for node in initial_nodes:
+            files = self.initial_node_files(node)
+            files_current.update(files)
+            uid = None
+            files_unrecorded = False
+            for fn in files:
+                rec = recorded.get(fn)
+                if rec is None:
+                    files_unrecorded = True
+                    continue
+                uid, file_size, mtime_ns, _ = rec
+                if not os.path.isfile(fn):
+                    uids_changed.add(uid)
+                    continue
+                st = os.stat(fn)
+                if st.st_size == file_size and st.st_mtime_ns == mtime_ns:
+                    continue
+                # any new mtime is a change, samples of the content can not show that a patch of the same size
+                # left the file unchanged
+                self.logger.log(f'PROCESS: Changed: {fn}')
+                uids_changed.add(uid)
+            if uid is None:
+                self.logger.log(f'PROCESS: Added: {node.p_path}')
+                nodes_added.append(node)
+                continue
+            if files_unrecorded:
+                uids_changed.add(uid)
+            if uid in uids_changed:
+                node.uid = uid
+
+        files_removed = [fn for fn in recorded.keys() if fn not in files_current]
+        uids_removed = set()
+        for fn in files_removed:
+            self.logger.log(f'PROCESS: Removed: {fn}')
+            uids_removed.add(recorded[fn][0])
+        # an ARC whose TAB was removed (or the other way around) is removed completely
+        uids_changed = uids_changed - uids_removed
+
+        if not (nodes_added or uids_changed or uids_removed):
+            self.logger.log('PROCESS: Game files unchanged')
+            return False
+
+        if uids_removed:
+            n = self.nodes_delete_subtree_where_uid(list(uids_removed), include_roots=True)
+            self.archive_fingerprints_delete_where_p_path(
+                [fn for fn, rec in recorded.items() if rec[0] in uids_removed])
+            self.logger.log(f'PROCESS: Removed {len(uids_removed)} game files, {n} nodes')
+
+        if uids_changed:
+            n = self.nodes_delete_subtree_where_uid(list(uids_changed), include_roots=False)
+
+            # back to the state of a freshly added node
+            nodes_changed = [node for node in initial_nodes if node.uid in uids_changed]
+            for node in nodes_changed:
+                if node.file_type not in {FTYPE_EXE, FTYPE_ARC}:
+                    node.file_type = None
+            self.node_update_many(nodes_changed)
+            self.archive_fingerprints_record(nodes_changed)
+            self.logger.log(f'PROCESS: Changed {len(uids_changed)} game files, {n} nodes invalidated')
+
+        if nodes_added:
+            self.nodes_add_many(nodes_added)
+            self.archive_fingerprints_record(nodes_added)
+            self.logger.log(f'PROCESS: Added {len(nodes_added)} game files')
+
+        # cache keys are built from node ids and offsets, which may be reused by the new nodes
+        self.decompress_cache.clear()
+        self.uncompressed_cache.clear()
+
+        return True
 
     def load_equipment_info(self):
         if self.game_info.game_id == 'gz':
@@ -172,7 +300,7 @@ class VfsProcessor(VfsDatabase):
 
             if node:
                 node = node[0]
-                equip_info_0 = adf_db.read_node(self, node)
+                equip_info_0 = adf_db.read_node(self, node, lazy=True)
 
                 for equip in equip_info_0.table_instance_values[0]['Items']:
                     self._lookup_equipment_from_name[equip['EquipmentName'].decode('utf-8')] = equip
@@ -201,7 +329,7 @@ class VfsProcessor(VfsDatabase):
             node = self.nodes_where_match(v_path=b'settings/hp_settings/equipment.bin')
             if node:
                 node = node[0]
-                equip_info_0 = adf_db.read_node(self, node)
+                equip_info_0 = adf_db.read_node(self, node, lazy=True)
 
                 for equip in equip_info_0.table_instance_values[0]['Items']:
                     files = [
@@ -290,53 +418,47 @@ class VfsProcessor(VfsDatabase):
 
         self.process_remove_temporary_nodes()
 
-        if version < 2:
-            self.find_vpath_procmon_dir()
-            self.find_vpath_resources()
-            self.find_vpath_guess()
-
-            # success = [set() for _ in inner_loop]
-            # failed = [set() for _ in inner_loop]
-
-            outer_phase_id = 0
+        # already processed, only the nodes of game files changed by a patch need to be processed again
+        incremental = version >= 2 and self.process_archive_changes()
 
-            do_process_v_hashes = True
-            while True:
-                outer_phase_id = outer_phase_id + 1
-                self.logger.log('Phase {}: Begin'.format(outer_phase_id))
+        if version < 2 or incremental:
+            # bulk load, the v_path search table is filled once at the end instead of by triggers for every node
+            self.v_path_search_suspend()
 
-                inner_phase_id = 0
-                changed = True
-                while changed:
-                    changed = False
-                    inner_phase_id = inner_phase_id + 1
+            if not incremental:
+                self.find_vpath_procmon_dir()
+                self.find_vpath_resources()
+                self.find_vpath_guess()
 
-                    self.logger.log('Phase {}.{}: File Process Begin'.format(outer_phase_id, inner_phase_id))
-
-                    for iop, ops in enumerate(inner_loop):
-                        idx_processed, idx_success, idx_failed = ops[0](*(ops[1]))
-                        if idx_success:  # new successes
-                            changed = True
-                            do_process_v_hashes = True
-                        # success[iop] = success[iop].union(idx_success)
-                        # failed[iop] = set(idx_failed)
-
-                    self.logger.log('Phase {}.{}: File Process End'.format(outer_phase_id, inner_phase_id))
+            # success = [set() for _ in inner_loop]
+            # failed = [set() for _ in inner_loop]
 
-                if do_process_v_hashes:
-                    do_process_v_hashes = False
-                    self.find_vpath_by_assoc()
-                    self.process_all_vhashes('process_vhash_final')
-                    self.logger.log('Phase {}: End'.format(outer_phase_id))
-                else:
-                    self.logger.log('Phase {}: End'.format(outer_phase_id))
-                    break
+            # one worker pool for all phases, workers open the project once
+            with MultiProcessControl(
+                    self.project_file, self.working_dir, self.logger, db_profile=self.db_profile) as commander:
+                self._commander = commander
+                try:
+                    self.process_phases(inner_loop)
+                finally:
+                    self._commander = None
 
             self.update_used_depths()
             self.db_execute_one("PRAGMA user_version = 2;")
 
+            # bulk load, the secondary indexes left out while processing are built once here
+            t0 = time.time()
+            self.db_indexes_deferred_create()
+            self.logger.log('DATABASE: Deferred indexes built in {:0.1f} seconds'.format(time.time() - t0))
+
+            # the nodes were written by the worker processes, drop what was read of them before
+            self.db_changed_signal.call()
+
             self.dump_vpaths()
 
+            t0 = time.time()
+            self.v_path_search_update()
+            self.logger.log('DATABASE: v_path search table filled in {:0.1f} seconds'.format(time.time() - t0))
+
         self.load_equipment_info()
         self.load_translation_info()
         self.load_notes_info()
@@ -345,6 +467,41 @@ class VfsProcessor(VfsDatabase):
 
         self.logger.log('PROCESSING: COMPLETE')
 
+    def process_phases(self, inner_loop):
+        outer_phase_id = 0
+
+        do_process_v_hashes = True
+        while True:
+            outer_phase_id = outer_phase_id + 1
+            self.logger.log('Phase {}: Begin'.format(outer_phase_id))
+
+            inner_phase_id = 0
+            changed = True
+            while changed:
+                changed = False
+                inner_phase_id = inner_phase_id + 1
+
+                self.logger.log('Phase {}.{}: File Process Begin'.format(outer_phase_id, inner_phase_id))
+
+                for iop, ops in enumerate(inner_loop):
+                    idx_processed, idx_success, idx_failed = ops[0](*(ops[1]))
+                    if idx_success:  # new successes
+                        changed = True
+                        do_process_v_hashes = True
+                    # success[iop] = success[iop].union(idx_success)
+                    # failed[iop] = set(idx_failed)
+
+                self.logger.log('Phase {}.{}: File Process End'.format(outer_phase_id, inner_phase_id))
+
+            if do_process_v_hashes:
+                do_process_v_hashes = False
+                self.find_vpath_by_assoc()
+                self.process_all_vhashes('process_vhash_final')
+                self.logger.log('Phase {}: End'.format(outer_phase_id))
+            else:
+                self.logger.log('Phase {}: End'.format(outer_phase_id))
+                break
+
     def dump_vpaths(self):
         vpath_file = os.path.join(self.working_dir, 'vpaths.txt')
         vpaths = self.nodes_select_distinct_vpath_content_hash()
@@ -362,21 +519,31 @@ class VfsProcessor(VfsDatabase):
 
         db_id = self.file_hash_db_id
 
-        q = f"SELECT DISTINCT {db_id}, COUNT(*) c FROM core_strings GROUP BY {db_id} HAVING c > 1;"
-        dup_hash = self.db_query_all(q)
-        for v_hash, c in dup_hash:
-            q = f"SELECT DISTINCT {db_id}, string FROM core_strings WHERE {db_id} = (?)"
-            hashes = self.db_query_all(q, [v_hash])
+        # the strings of all duplicate hashes with their node counts in one query
+        q = f"""
+            SELECT s.{db_id}, s.string, COUNT(DISTINCT n.node_id)
+            FROM (
+                SELECT DISTINCT {db_id}, string FROM core_strings WHERE {db_id} IN (
+                    SELECT {db_id} FROM core_strings GROUP BY {db_id} HAVING COUNT(*) > 1)
+            ) s
+            LEFT JOIN core_nodes n ON n.v_path = s.string
+            GROUP BY s.{db_id}, s.string
+            ORDER BY s.{db_id}
+        """
+        dup_hash = {}
+        for h, s, fc in self.db_query_all(q, dbg='dump_status_dup_hash'):
+            dup_hash.setdefault(h, []).append((h, s, fc))
+
+        for v_hash, hash_strings in dup_hash.items():
+            hashes = []
             fcs = []
             gtz_count = 0
-            for h, s in hashes:
-                q = "SELECT DISTINCT node_id FROM core_nodes WHERE v_path = (?)"
-                nodes = self.db_query_all(q, [s])
-                fc = len(nodes)
+            for h, s, fc in hash_strings:
+                hashes.append((h, s))
                 self.logger.log('SUMMARY: Duplicate FileName Hashes: {} {}: {} nodes'.format(
                     self.file_hash_format(h), s, fc
                 ))
-                fcs.append(len(nodes))
+                fcs.append(fc)
                 if fc > 0:
                     gtz_count += 1
             if gtz_count > 1:
@@ -409,13 +576,14 @@ class VfsProcessor(VfsDatabase):
         adf_db.load_from_database(self)
 
         missing_types = set()
-        for t, uid in adf_db.type_missing:
+        type_missing = list(adf_db.type_missing)
+        type_missing_nodes = self.nodes_where_uids([uid for t, uid in type_missing])
+        for (t, uid), node in zip(type_missing, type_missing_nodes):
             missing_types.add(t)
-            node: VfsNode = self.node_where_uid(uid)
             self.logger.log('SUMMARY: Missing Type {:08x} in {} {}'.format(t, node.v_hash_to_str(), node.v_path))
 
         present_types = set()
-        for t, uid in adf_db.type_map_def.items():
+        for t in adf_db.type_map_def.keys():
             present_types.add(t)
 
         self.logger.log(f'SUMMARY: ADF Types Present: {len(present_types)}')
@@ -480,8 +648,10 @@ class VfsProcessor(VfsDatabase):
         indexes_success = []
         indexes_failed = []
         if indexes:
-            commander = MultiProcessControl(self.project_file, self.working_dir, self.logger)
-            results = commander.do_map(cmd, indexes, step_id='Determine content hash', idle_call=self.idle_call)
+            commander = self.commander()
+            results = commander.do_map(
+                cmd, indexes, step_id='Determine content hash', idle_call=self.idle_call,
+                costs=self.nodes_select_size_where_uids(indexes))
 
             indexes_processed = [k for k, v in results]
             indexes_success = [k for k, v in results if v]
@@ -508,8 +678,10 @@ class VfsProcessor(VfsDatabase):
         indexes_success = []
         indexes_failed = []
         if indexes:
-            commander = MultiProcessControl(self.project_file, self.working_dir, self.logger)
-            results = commander.do_map(cmd, indexes, step_id='Determine file type', idle_call=self.idle_call)
+            commander = self.commander()
+            results = commander.do_map(
+                cmd, indexes, step_id='Determine file type', idle_call=self.idle_call,
+                costs=self.nodes_select_size_where_uids(indexes))
 
             indexes_processed = [k for k, v in results]
             indexes_success = [k for k, v in results if v]
@@ -537,8 +709,10 @@ class VfsProcessor(VfsDatabase):
         indexes_success = []
         indexes_failed = []
         if indexes:
-            commander = MultiProcessControl(self.project_file, self.working_dir, self.logger)
-            results = commander.do_map(cmd, indexes, step_id='Determine file type with name', idle_call=self.idle_call)
+            commander = self.commander()
+            results = commander.do_map(
+                cmd, indexes, step_id='Determine file type with name', idle_call=self.idle_call,
+                costs=self.nodes_select_size_where_uids(indexes))
 
             indexes_processed = [k for k, v in results]
             indexes_success = [k for k, v in results if v]
@@ -562,8 +736,10 @@ class VfsProcessor(VfsDatabase):
         indexes_success = []
         indexes_failed = []
         if indexes:
-            commander = MultiProcessControl(self.project_file, self.working_dir, self.logger)
-            results = commander.do_map(cmd, indexes, step_id=f_type, idle_call=self.idle_call)
+            commander = self.commander()
+            results = commander.do_map(
+                cmd, indexes, step_id=f_type, idle_call=self.idle_call,
+                costs=self.nodes_select_size_where_uids(indexes))
 
             indexes_processed = [k for k, v in results]
             indexes_success = [k for k, v in results if v]
@@ -587,8 +763,10 @@ class VfsProcessor(VfsDatabase):
         indexes_success = []
         indexes_failed = []
         if indexes:
-            commander = MultiProcessControl(self.project_file, self.working_dir, self.logger)
-            results = commander.do_map(cmd, indexes, step_id=f'v_hash = {v_hash}', idle_call=self.idle_call)
+            commander = self.commander()
+            results = commander.do_map(
+                cmd, indexes, step_id=f'v_hash = {v_hash}', idle_call=self.idle_call,
+                costs=self.nodes_select_size_where_uids(indexes))
 
             indexes_processed = [k for k, v in results]
             indexes_success = [k for k, v in results if v]
@@ -612,8 +790,10 @@ class VfsProcessor(VfsDatabase):
         indexes_success = []
         indexes_failed = []
         if indexes:
-            commander = MultiProcessControl(self.project_file, self.working_dir, self.logger)
-            results = commander.do_map(cmd, indexes, step_id=f'ext_hash = {ext_hash}', idle_call=self.idle_call)
+            commander = self.commander()
+            results = commander.do_map(
+                cmd, indexes, step_id=f'ext_hash = {ext_hash}', idle_call=self.idle_call,
+                costs=self.nodes_select_size_where_uids(indexes))
 
             indexes_processed = [k for k, v in results]
             indexes_success = [k for k, v in results if v]
@@ -633,8 +813,10 @@ class VfsProcessor(VfsDatabase):
         indexes_success = []
         indexes_failed = []
         if indexes:
-            commander = MultiProcessControl(self.project_file, self.working_dir, self.logger)
-            results = commander.do_map(cmd, indexes, step_id=f'endswith = {suffix}', idle_call=self.idle_call)
+            commander = self.commander()
+            results = commander.do_map(
+                cmd, indexes, step_id=f'endswith = {suffix}', idle_call=self.idle_call,
+                costs=self.nodes_select_size_where_uids(indexes))
 
             indexes_processed = [k for k, v in results]
             indexes_success = [k for k, v in results if v]
@@ -649,7 +831,7 @@ class VfsProcessor(VfsDatabase):
         self.logger.log('PROCESS: VHASHes: Begin')
         vhashes = self.nodes_select_distinct_vhash()
         if len(vhashes) > 0:
-            commander = MultiProcessControl(self.project_file, self.working_dir, self.logger)
+            commander = self.commander()
             commander.do_map(cmd, vhashes, step_id='v_hash', idle_call=self.idle_call)
         self.logger.log('PROCESS: VHASHes: End: Total VHASHes {}'.format(len(vhashes)))
 
@@ -846,44 +1028,55 @@ class VfsProcessor(VfsDatabase):
 
         hash_present = set(self.nodes_select_distinct_vhash())
 
+        assoc_hashes = self.file_hash_batch(list(assoc_strings.keys()))
+
         with DbWrap(self, logger=self) as db:
-            for k, v in assoc_strings.items():
-                fn = k
-                fh = self.file_hash(fn)
+            for (fn, v), fh in zip(assoc_strings.items(), assoc_hashes):
                 if fh in hash_present:
                     db.propose_string(fn, None, possible_file_types=v)
 
         self.logger.log('STRINGS BY FILE NAME ASSOCIATION: Found {}'.format(len(assoc_strings)))
 
     def update_used_depths(self):
+        # minimum depth below a node used at runtime, relaxed over the whole parent array at once, one pass per level
+        # instead of a query and node updates per level
+        self.logger.log('UPDATING USE DEPTH: Begin')
+        n_nodes = self.db_query_one("SELECT COUNT(*) FROM core_nodes", dbg='update_used_depths:count')[0]
+        cursor = self.db_query_iter(
+            "SELECT node_id, IFNULL(parent_id, -1), IFNULL(used_at_runtime_depth, -1) FROM core_nodes ORDER BY node_id",
+            dbg='update_used_depths:select')
+        values = np.fromiter(itertools.chain.from_iterable(cursor), dtype=np.int64, count=n_nodes * 3)
+        values = values.reshape(n_nodes, 3)
+        uids = values[:, 0]
+        depths_db = values[:, 2]
+
+        parent_rows = np.searchsorted(uids, values[:, 1])
+        parent_rows[parent_rows >= n_nodes] = 0
+        has_parent = (values[:, 1] >= 0) & (uids[parent_rows] == values[:, 1]) if n_nodes > 0 else values[:, 1] >= 0
+        children = np.nonzero(has_parent)[0]
+        parent_rows = parent_rows[children]
+
+        depth_none = np.iinfo(np.int64).max - 1
+        depths = np.where(depths_db < 0, depth_none, depths_db)
         level = 0
-        keep_going = True
-        while keep_going:
-            keep_going = False
+        while True:
             self.logger.log('UPDATING USE DEPTH: {}'.format(level))
-            # puids = self.db_query_all("SELECT uid FROM core_nodes WHERE used_at_runtime_depth == (?)", [level])
-            # puids = [n[0] for n in puids]
-            #
-            # if len(puids) == 0:
-            #     break
-
-            child_nodes = self.db_query_all(
-                """
-                SELECT * FROM core_nodes WHERE 
-                    parent_id IN (SELECT node_id FROM core_nodes WHERE used_at_runtime_depth == (?))
-                """,
-                [level]
-            )
-            child_nodes = [db_to_vfs_node(n) for n in child_nodes]
-
+            depths_new = depths.copy()
+            depths_new[children] = np.minimum(depths[children], depths[parent_rows] + 1)
+            if np.array_equal(depths_new, depths):
+                break
+            depths = depths_new
             level = level + 1
 
-            with DbWrap(self, logger=self) as db:
-                for child_node in child_nodes:
-                    if child_node.used_at_runtime_depth is None or child_node.used_at_runtime_depth > level:
-                        keep_going = True
-                        child_node.used_at_runtime_depth = level
-                        db.node_update(child_node)
+        changed = np.nonzero((depths != depth_none) & (depths != depths_db))[0]
+        if len(changed) > 0:
+            self.db_execute_many(
+                "UPDATE core_nodes SET used_at_runtime_depth = (?) WHERE node_id == (?)",
+                zip(depths[changed].tolist(), uids[changed].tolist()),
+                dbg='update_used_depths:update')
+            self.db_conn.commit()
+            self.db_changed_signal.call()
+        self.logger.log('UPDATING USE DEPTH: End: {} nodes updated'.format(len(changed)))
 
     def process_remove_temporary_nodes(self):
         uids = self.nodes_where_temporary_select_uid(True)
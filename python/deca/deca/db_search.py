@@ -0,0 +1,96 @@
+'''
+Helpers for the v_path search index, an FTS5 trigram table of the distinct v_paths of core_nodes
+
+The trigram table can only narrow a search down with literal runs of at least 3 characters that every match must
+contain, these are pulled out of LIKE patterns and simple regular expressions. Candidates are then checked with the
+original LIKE or REGEXP, so a pattern that yields no literals is still correct, it just scans the table.
+'''
+
+fts_trigram_min_length = 3
+
+regexp_meta_break = set('.^$')
+regexp_quantifier_optional = set('*?{')
+
+
+def like_literals(pattern):
+    """
+    Literal runs of a LIKE pattern, LIKE is not given an ESCAPE so '%' and '_' are always wildcards
+    :param pattern: LIKE pattern (str)
+    :return: list of literal runs (str)
+    """
+    literals = []
+    for run in pattern.split('%'):
+        literals += [lit for lit in run.split('_') if len(lit) > 0]
+    return literals
+
+
+def regexp_literals(expr):
+    """
+    Literal runs that every match of a regular expression contains, conservative, alternations and groups give no
+    literals at all
+    :param expr: regular expression (str)
+    :return: list of literal runs (str)
+    """
+    if '|' in expr or '(' in expr:
+        return []
+
+    literals = []
+    run = []
+    i = 0
+    while i < len(expr):
+        c = expr[i]
+        if c == '\\':
+            if i + 1 >= len(expr) or expr[i + 1].isalnum():
+                # character class or back reference escape
+                literals.append(''.join(run))
+                run = []
+            else:
+                run.append(expr[i + 1])
+            i += 2
+        elif c == '[':
+            literals.append(''.join(run))
+            run = []
+            # a ']' right after '[' or '[^' is a member of the set
+            i += 1
+            if i < len(expr) and expr[i] == '^':
+                i += 1
+            i = expr.find(']', i + 1)
+            if i < 0:
+                return []
+            i += 1
+        elif c in regexp_quantifier_optional:
+            # the quantified character is optional, it and whatever follows are not part of this run
+            if len(run) > 0:
+                run.pop()
+            literals.append(''.join(run))
+            run = []
+            if c == '{':
+                i = expr.find('}', i)
+                if i < 0:
+                    return []
+            i += 1
+        elif c == '+':
+            literals.append(''.join(run))
+            run = []
+            i += 1
+        elif c in regexp_meta_break:
+            literals.append(''.join(run))
+            run = []
+            i += 1
+        else:
+            run.append(c)
+            i += 1
+    literals.append(''.join(run))
+
+    return [lit for lit in literals if len(lit) > 0]
+
+
+def fts_match_expr(literals):
+    """
+    FTS5 MATCH expression requiring all literals, trigram matching is case insensitive like LIKE
+    :return: MATCH expression or None if no literal is long enough for the trigram index
+    """
+    terms = ['"' + lit.replace('"', '""') + '"' for lit in literals if len(lit) >= fts_trigram_min_length]
+    if len(terms) == 0:
+        return None
+    return ' AND '.join(terms)
@@ -0,0 +1,230 @@
+import bisect
+import itertools
+import numpy as np
+
+'''
+Columnar read only copy of core_nodes for batch consumers that look up a large share of the nodes repeatedly
+
+Rows are sorted by uid. Integer columns are numpy arrays of the smallest dtype that holds their values, NULL is
+recorded in a bit mask. String columns are interned, each row holds an id into a packed utf-8 buffer of the distinct
+values. Rows are handed out as core_nodes tuples, see db_to_vfs_node.
+'''
+
+# (column, core_nodes field)
+snapshot_int_columns = [
+    ('uid', 'node_id'),
+    ('flags', 'flags'),
+    ('pid', 'parent_id'),
+    ('index', 'parent_index'),
+    ('offset', 'parent_offset'),
+    ('v_hash', 'v_hash'),
+    ('magic', 'magic'),
+    ('ext_hash', 'ext_hash'),
+    ('size_c', 'size_c'),
+    ('size_u', 'size_u'),
+    ('file_sub_type', 'file_sub_type'),
+    ('used_at_runtime_depth', 'used_at_runtime_depth'),
+]
+
+# (column, core_nodes field), a string id of -1 is NULL
+snapshot_str_columns = [
+    ('v_path', 'v_path'),
+    ('p_path', 'p_path'),
+    ('content_hash', 'content_hash'),
+    ('file_type', 'file_type'),
+]
+
+# columns in core_nodes order
+snapshot_db_columns = [
+    'uid', 'flags', 'pid', 'index', 'offset', 'v_hash', 'v_path', 'p_path', 'content_hash', 'magic', 'file_type',
+    'ext_hash', 'size_c', 'size_u', 'file_sub_type', 'used_at_runtime_depth',
+]
+
+snapshot_null_bit = {name: 1 << i for i, (name, _) in enumerate(snapshot_int_columns)}
+
+
+def int_array_compact(values):
+    # smallest dtype that holds all values
+    if len(values) == 0:
+        return values
+    dtype = np.result_type(np.min_scalar_type(values.min()), np.min_scalar_type(values.max()))
+    if dtype.kind not in 'iu':
+        # int64 with a large positive max promotes to float64 with the uint64 of the max, keep int64
+        return values
+    return values.astype(dtype)
+
+
+def strings_pack_utf8(values):
+    # packed buffer and offsets of a list of str
+    values = [v.encode('utf-8') for v in values]
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum([len(v) for v in values], out=offsets[1:])
+    return b''.join(values), int_array_compact(offsets)
+
+
+def keys_search(values, keys, side='left'):
+    """
+    searchsorted of int keys in a sorted compact array, without numpy casting the whole array to the key dtype
+    :return: positions, found mask of keys that fit the dtype of values
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    info = np.iinfo(values.dtype)
+    fits = (keys >= info.min) & (keys <= info.max) if len(values) > 0 else np.zeros(keys.shape, dtype=bool)
+    keys = np.where(fits, keys, 0).astype(values.dtype)
+    return np.searchsorted(values, keys, side=side), fits
+
+
+class VfsNodeSnapshot:
+    def __init__(self, vfs):
+        """
+        Read all of core_nodes
+        :param vfs: VfsDatabase
+        """
+        self.count = vfs.db_query_one("SELECT COUNT(*) FROM core_nodes", dbg='nodes_snapshot')[0]
+
+        # intern the strings in SQL, value i of a column is row i + 1 of its temp table
+        self.strings = {}
+        str_fields = []
+        str_joins = []
+        for name, field in snapshot_str_columns:
+            table = f'snapshot_{name}'
+            vfs.db_execute_one(f'DROP TABLE IF EXISTS temp.{table};', dbg='nodes_snapshot')
+            vfs.db_execute_one(f'CREATE TEMP TABLE {table} ("value" TEXT PRIMARY KEY);', dbg='nodes_snapshot')
+            vfs.db_execute_one(
+                f'INSERT INTO temp.{table} SELECT DISTINCT {field} FROM core_nodes WHERE {field} IS NOT NULL',
+                dbg='nodes_snapshot')
+            table_values = vfs.db_query_all(f'SELECT value FROM temp.{table} ORDER BY rowid', dbg='nodes_snapshot')
+            self.strings[name] = strings_pack_utf8([v[0] for v in table_values])
+            str_fields.append(f'IFNULL({table}.rowid - 1, -1)')
+            str_joins.append(f'LEFT JOIN temp.{table} ON {table}.value = core_nodes.{field}')
+
+        # stream the rows into one flat array, no list of row tuples
+        int_fields = ', '.join([f'IFNULL(core_nodes.{field}, 0)' for _, field in snapshot_int_columns])
+        null_fields = ' | '.join(
+            [f'((core_nodes.{field} IS NULL) << {i})' for i, (_, field) in enumerate(snapshot_int_columns)])
+        n_fields = len(snapshot_int_columns) + 1 + len(snapshot_str_columns)
+        cursor = vfs.db_query_iter(
+            f"SELECT {int_fields}, {null_fields}, {', '.join(str_fields)} FROM core_nodes {' '.join(str_joins)} "
+            f"ORDER BY core_nodes.node_id", dbg='nodes_snapshot')
+        values = np.fromiter(
+            itertools.chain.from_iterable(cursor), dtype=np.int64, count=self.count * n_fields)
+        values = values.reshape(self.count, n_fields)
+
+        self.columns = {}
+        for i, (name, _) in enumerate(snapshot_int_columns):
+            self.columns[name] = int_array_compact(values[:, i])
+        self.nulls = values[:, len(snapshot_int_columns)].astype(np.uint16)
+        for i, (name, _) in enumerate(snapshot_str_columns):
+            self.columns[name] = int_array_compact(values[:, len(snapshot_int_columns) + 1 + i])
+        del values
+
+        for name, _ in snapshot_str_columns:
+            vfs.db_execute_one(f'DROP TABLE IF EXISTS temp.snapshot_{name};', dbg='nodes_snapshot')
+        # end the transaction of the temp table inserts, it would keep this connection on the rows read here
+        vfs.db_conn.commit()
+
+        # secondary orders for the children and hash lookups
+        self._order_pid = int_array_compact(np.argsort(self.columns['pid'], kind='stable'))
+        self._sorted_pid = self.columns['pid'][self._order_pid]
+        self._order_v_hash = int_array_compact(np.argsort(self.columns['v_hash'], kind='stable'))
+        self._sorted_v_hash = self.columns['v_hash'][self._order_v_hash]
+
+        # memoryviews index to python values much faster than numpy scalars, for single row lookups
+        self._views = {name: memoryview(values) for name, values in self.columns.items()}
+        self._views_nulls = memoryview(self.nulls)
+        self._views_strings = {
+            name: (buffer, memoryview(offsets)) for name, (buffer, offsets) in self.strings.items()}
+
+    def nbytes(self):
+        arrays = list(self.columns.values()) + [
+            self.nulls, self._order_pid, self._sorted_pid, self._order_v_hash, self._sorted_v_hash]
+        arrays += [offsets for _, offsets in self.strings.values()]
+        return sum([a.nbytes for a in arrays]) + sum([len(buffer) for buffer, _ in self.strings.values()])
+
+    def rows_where_uids(self, uids):
+        """
+        :param uids: array like of uids
+        :return: rows of the uids, -1 for missing uids
+        """
+        rows, fits = keys_search(self.columns['uid'], uids)
+        rows[rows >= self.count] = 0
+        found = fits & (self.columns['uid'][rows] == np.asarray(uids, dtype=np.int64)) if self.count > 0 else fits
+        return np.where(found, rows, -1)
+
+    def row_where_uid(self, uid):
+        uids = self._views['uid']
+        row = bisect.bisect_left(uids, uid)
+        if row < self.count and uids[row] == uid:
+            return row
+        return -1
+
+    def rows_where_key(self, sorted_values, order, key, null_bit):
+        (begin, end), fits = keys_search(sorted_values, [key, key], side='left')
+        if not fits[0]:
+            return order[0:0]
+        end = np.searchsorted(sorted_values, sorted_values.dtype.type(key), side='right')
+        rows = order[begin:end]
+        return rows[(self.nulls[rows] & null_bit) == 0]
+
+    def rows_where_pid(self, pid):
+        return self.rows_where_key(self._sorted_pid, self._order_pid, pid, snapshot_null_bit['pid'])
+
+    def rows_where_v_hash(self, v_hash):
+        return self.rows_where_key(self._sorted_v_hash, self._order_v_hash, v_hash, snapshot_null_bit['v_hash'])
+
+    def uids_where_pid(self, pid):
+        return self.columns['uid'][np.sort(self.rows_where_pid(pid))]
+
+    def uids_where_v_hash(self, v_hash):
+        return self.columns['uid'][np.sort(self.rows_where_v_hash(v_hash))]
+
+    def string(self, name, sid):
+        if sid < 0:
+            return None
+        buffer, offsets = self._views_strings[name]
+        return buffer[offsets[sid]:offsets[sid + 1]]
+
+    def column(self, name, rows):
+        """
+        Values of a column as a list, None for NULL, strings as utf-8 bytes
+        """
+        values = self.columns[name][rows]
+        if name in self.strings:
+            return [self.string(name, sid) for sid in values.tolist()]
+        else:
+            nulls = (self.nulls[rows] & snapshot_null_bit[name]) != 0
+            return [None if n else v for v, n in zip(values.tolist(), nulls.tolist())]
+
+    def db_row(self, row):
+        # single row through the memoryviews, without the array overhead of db_rows
+        if row < 0:
+            return None
+        nulls = self._views_nulls[row]
+        v = []
+        for name in snapshot_db_columns:
+            value = self._views[name][row]
+            if name in self._views_strings:
+                if value < 0:
+                    v.append(None)
+                else:
+                    buffer, offsets = self._views_strings[name]
+                    v.append(buffer[offsets[value]:offsets[value + 1]])
+            elif nulls & snapshot_null_bit[name]:
+                v.append(None)
+            else:
+                v.append(value)
+        return tuple(v)
+
+    def db_rows(self, rows):
+        """
+        :param rows: array like of rows, -1 for missing
+        :return: list of core_nodes tuples, None for missing rows
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        valid = rows >= 0
+        values = [self.column(name, rows[valid]) for name in snapshot_db_columns]
+
+        db_rows = [None] * len(rows)
+        for k, v in zip(np.nonzero(valid)[0].tolist(), zip(*values)):
+            db_rows[k] = v
+        return db_rows
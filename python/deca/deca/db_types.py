@@ -1,7 +1,8 @@
 import sqlite3
 import re
+import functools
 from deca.util import make_dir_for_file, DecaSignal
-from deca.hashes import hash32_func, hash_all_func
+from deca.hashes import hash32_func, hash_all_func, hash_all_batch
 
 
 node_flag_compression_type_mask = 0xFF
@@ -48,19 +49,55 @@ def make_hash_string_tuple(string):
     return string, hash32, hash48, hash64, ext_hash32
 
 
+def make_hash_string_tuples(strings):
+    # batch version of make_hash_string_tuple
+    strings = [to_bytes(string) for string in strings]
+    hash32, hash48, hash64, ext_hash32 = hash_all_batch(strings)
+    return list(zip(strings, hash32.tolist(), hash48.tolist(), hash64.tolist(), ext_hash32.tolist()))
+
+
+@functools.lru_cache(maxsize=256)
+def regexp_compile(expr):
+    return re.compile(expr)
+
+
 def regexp(expr, item):
+    # called by SQLite for every row, v_path comes in as str so the pattern is matched as str
     if item is None or expr is None:
         return False
-    if isinstance(expr, str):
-        expr = expr.encode('ascii')
-    if isinstance(item, str):
-        item = item.encode('ascii')
-    reg = re.compile(expr)
-    return reg.search(item) is not None
+    if isinstance(expr, bytes):
+        expr = expr.decode('utf-8')
+    if isinstance(item, bytes):
+        item = item.decode('utf-8')
+    return regexp_compile(expr).search(item) is not None
+
+
+# connection settings, a negative cache_size is in KiB. bulk_load defers the secondary indexes that processing does
+# not query until the first processing of a project completes
+db_profile_default = {
+    'journal_mode': 'WAL',  # the processing workers read while the results are written
+    'synchronous': 'NORMAL',
+    'cache_size': -64 * 1024,
+    'mmap_size': 1024**3,
+    'temp_store': 'MEMORY',
+    'bulk_load': True,
+}
+
+# SQLite defaults, for comparison
+db_profile_sqlite = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+    'cache_size': -2000,
+    'mmap_size': 0,
+    'temp_store': 'DEFAULT',
+    'bulk_load': False,
+}
+
+db_profile_pragmas = ['journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store']
 
 
 class DbBase:
-    def __init__(self, db_filename, logger):
+    def __init__(self, db_filename, logger, db_profile=None):
         self.logger = logger
 
         self.db_changed_signal = DecaSignal()
@@ -74,6 +111,16 @@ class DbBase:
         self.db_conn.create_function("REGEXP", 2, regexp)
         self.db_cur = self.db_conn.cursor()
 
+        # statements run through db_execute_*/db_query_*, for measuring query counts
+        self.db_query_count = 0
+
+        if db_profile is None:
+            db_profile = db_profile_default
+        self.db_profile = db_profile
+        for pragma in db_profile_pragmas:
+            if pragma in db_profile:
+                self.db_execute_one(f'PRAGMA {pragma}={db_profile[pragma]};')
+
     def logger_set(self, logger):
         self.logger = logger
 
@@ -88,6 +135,8 @@ class DbBase:
         if params is None:
             params = []
 
+        self.db_query_count += 1
+
         while True:
             try:
                 result = self.db_cur.execute(stmt, params)
@@ -101,6 +150,8 @@ class DbBase:
         if params is None:
             params = []
 
+        self.db_query_count += 1
+
         while True:
             try:
                 result = self.db_cur.executemany(stmt, params)
@@ -114,6 +165,8 @@ class DbBase:
         if params is None:
             params = []
 
+        self.db_query_count += 1
+
         while True:
             try:
                 result = self.db_cur.execute(stmt, params)
@@ -128,6 +181,8 @@ class DbBase:
         if params is None:
             params = []
 
+        self.db_query_count += 1
+
         while True:
             try:
                 result = self.db_cur.execute(stmt, params)
@@ -137,3 +192,30 @@ class DbBase:
                 self.handle_exception(dbg, exc)
 
         return result
+
+    def db_query_iter(self, stmt, params=None, dbg='db_query_iter'):
+        # rows streamed from a cursor of their own, db_* calls while iterating use db_cur and would reset it
+        if params is None:
+            params = []
+
+        self.db_query_count += 1
+
+        while True:
+            try:
+                result = self.db_conn.execute(stmt, params)
+                break
+            except sqlite3.OperationalError as exc:
+                self.handle_exception(dbg, exc)
+
+        return result
+
+    def db_temp_table_fill(self, name, columns, rows, dbg='db_temp_table_fill'):
+        # stage rows in a temp table for set based queries, row i gets key_index i so joins map back to the rows
+        self.db_execute_one(f'DROP TABLE IF EXISTS temp.{name};', dbg=dbg)
+        self.db_execute_one(
+            f'CREATE TEMP TABLE {name} ("key_index" INTEGER NOT NULL, {", ".join(columns)}, PRIMARY KEY ("key_index"));',
+            dbg=dbg)
+        self.db_execute_many(
+            f'INSERT INTO temp.{name} VALUES ({", ".join(["?"] * (len(columns) + 1))})',
+            [(i, *row) for i, row in enumerate(rows)],
+            dbg=dbg)
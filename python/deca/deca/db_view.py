@@ -1,13 +1,17 @@
-import re
 from typing import TypeVar, Optional
 
 from .util import DecaSignal, to_unicode, common_prefix
 from .ff_types import *
+from .db_types import regexp_compile
 from .db_core import VfsDatabase, VfsNode
+from .db_search import regexp_literals, fts_match_expr
 from .ff_adf import AdfDatabase
 
 NodeListElement = TypeVar('NodeListElement', str, bytes, VfsNode)
 
+# masks of smaller node maps are checked directly, without the v_path search index
+nodes_map_mask_search_min = 4096
+
 
 class VfsView:
     def __init__(self, *params, **kwargs):
@@ -17,6 +21,8 @@ class VfsView:
         self.paths = None
         self.mask = None
         self.parent_id = None
+        self._nodes_visible_all_dirty = True
+        self._nodes_visible_all = {}
         self._nodes_visible_dirty = True
         self._nodes_visible = []
         self._nodes_visible_uids = set()
@@ -132,16 +138,31 @@ class VfsView:
                 if lst0 is None:
                     nodes_map[v_path] = lst
 
-        mask_expr = re.compile(to_unicode(mask))
-        to_erase = [vp for vp in nodes_map.keys() if mask_expr.match(vp) is None]
-        for vp in to_erase:
-            nodes_map.pop(vp)
+        if mask is not None:
+            nodes_map_masked = self.nodes_map_mask(nodes_map, mask)
+            nodes_map.clear()
+            nodes_map.update(nodes_map_masked)
+
+    def nodes_map_mask(self, nodes_map, mask):
+        # keep the v_paths that match the mask, the v_path search index finds the candidates when the mask has
+        # literal runs long enough for it, otherwise every v_path is checked
+        mask = to_unicode(mask)
+        mask_expr = regexp_compile(mask)
+
+        if fts_match_expr(regexp_literals(mask)) is not None and len(nodes_map) >= nodes_map_mask_search_min:
+            v_paths = self.vfs().v_paths_where_match(v_path_regexp=mask)
+            v_paths = [vp for vp in v_paths if vp in nodes_map and mask_expr.match(vp) is not None]
+        else:
+            v_paths = [vp for vp in nodes_map.keys() if mask_expr.match(vp) is not None]
+
+        return {vp: nodes_map[vp] for vp in v_paths}
 
     def node_update(self):
         selection_changed = False
         if self.source_changed:
             self._adf_db.load_from_database(self._vfs)
             self.source_changed = False
+            self._nodes_visible_all_dirty = True
             self._nodes_visible_dirty = True
             self._nodes_selected_dirty = True
             selection_changed = True
@@ -149,14 +170,18 @@ class VfsView:
         if self._nodes_visible_dirty:
             self.vfs().logger.log(f'Nodes Visible Begin')
 
-            # visible nodes
-            self._nodes_visible = {}
-            self._nodes_visible_uids = set()
-            self._nodes_visible_uids_no_vpaths = set()
+            # visible nodes, the nodes are only fetched again when the database changed, a new mask only filters them
+            if self._nodes_visible_all_dirty:
+                self._nodes_visible_all = {}
+                self._nodes_visible_uids = set()
+                self._nodes_visible_uids_no_vpaths = set()
+
+                self.node_accumulate(
+                    self._nodes_visible_all, self._nodes_visible_uids, self._nodes_visible_uids_no_vpaths,
+                    pid_in=self.parent_id)
+                self._nodes_visible_all_dirty = False
 
-            self.node_accumulate(
-                self._nodes_visible, self._nodes_visible_uids, self._nodes_visible_uids_no_vpaths,
-                mask=self.mask, pid_in=self.parent_id)
+            self._nodes_visible = self.nodes_map_mask(self._nodes_visible_all, self.mask)
 
             self._nodes_visible_dirty = False
             self._nodes_selected_dirty = True
@@ -233,6 +258,9 @@ class VfsView:
     def node_where_uid(self, uid):
         return self.vfs().node_where_uid(uid)
 
+    def nodes_where_uids(self, uids):
+        return self.vfs().nodes_where_uids(uids)
+
     def lookup_note_from_file_path(self, path):
         return self.vfs().lookup_note_from_file_path(path)
 
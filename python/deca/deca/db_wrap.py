@@ -1,4 +1,5 @@
 import os
+from typing import Optional, Callable
 from .db_core import VfsDatabase, VfsNode, GtocArchiveEntry
 from .db_cross_game import DbCrossGame
 from .ff_adf import AdfDatabase
@@ -85,22 +86,107 @@ def determine_file_type(vfs: VfsDatabase, node: VfsNode):
         node.file_sub_type = adf_type
 
 
+class DbWrapBatch:
+    # database changes gathered by a DbWrap, plain picklable data so it can be applied by another process
+    def __init__(self):
+        self.nodes_to_add = []
+        self.nodes_to_update = []
+        self.string_hash_to_add = []
+        self.gtoc_archive_defs = []
+        self.adf_type_map = None  # (packed new types, type_missing) when changed
+        self.objects = []  # uid(ROWID), src_node_id, offset, class_str(_rowid), name_str(_rowid), object_id
+        self.object_id_refs = []  # object_rowid((src_node_id,offset)), id, flags
+        self.event_id_refs = []  # object_rowid((src_node_id,offset)), id, flags
+
+    def __len__(self):
+        return \
+            len(self.nodes_to_add) + len(self.nodes_to_update) + len(self.string_hash_to_add) + \
+            len(self.gtoc_archive_defs) + len(self.objects) + len(self.object_id_refs) + len(self.event_id_refs)
+
+    def merge(self, other):
+        self.nodes_to_add += other.nodes_to_add
+        self.nodes_to_update += other.nodes_to_update
+        self.string_hash_to_add += other.string_hash_to_add
+        self.gtoc_archive_defs += other.gtoc_archive_defs
+
+        if other.adf_type_map is not None:
+            if self.adf_type_map is None:
+                self.adf_type_map = ({}, set())
+            self.adf_type_map[0].update(other.adf_type_map[0])
+            self.adf_type_map[1].update(other.adf_type_map[1])
+
+        # object uids are indexes into the object list of a batch, shift them past the current objects
+        obj_uid_offset = len(self.objects)
+        self.objects += [[obj[0] + obj_uid_offset] + obj[1:] for obj in other.objects]
+        self.object_id_refs += [[ref[0] + obj_uid_offset] + ref[1:] for ref in other.object_id_refs]
+        self.event_id_refs += [[ref[0] + obj_uid_offset] + ref[1:] for ref in other.event_id_refs]
+
+    def apply(self, db: VfsDatabase, logger=None):
+        def log(msg):
+            if logger is not None:
+                logger.log(msg)
+
+        if len(self.nodes_to_add) > 0:
+            log('DATABASE: Inserting {} nodes'.format(len(self.nodes_to_add)))
+            db.nodes_add_many(self.nodes_to_add)
+
+        if len(self.nodes_to_update) > 0:
+            log('DATABASE: Updating {} nodes'.format(len(self.nodes_to_update)))
+            db.node_update_many(self.nodes_to_update)
+
+        hash_strings_to_add = list(set(self.string_hash_to_add))
+        if len(hash_strings_to_add) > 0:
+            log('DATABASE: Inserting {} hash strings'.format(len(hash_strings_to_add)))
+            db.hash_string_add_many(hash_strings_to_add)
+
+        hash_field_strings_to_add = [hs for hs in hash_strings_to_add if hs[-3]]
+        if len(hash_field_strings_to_add) > 0:
+            log('DATABASE: Inserting {} hash field strings'.format(len(hash_field_strings_to_add)))
+            db.db_cg.hash_string_add_many(hash_field_strings_to_add)
+
+        if len(self.gtoc_archive_defs) > 0:
+            log('DATABASE: Inserting {} gt0c archive definitions'.format(len(self.gtoc_archive_defs)))
+            db.gtoc_archive_add_many(self.gtoc_archive_defs)
+
+        if self.adf_type_map is not None:
+            log('DATABASE: Saving ADF Types: {} Types'.format(len(self.adf_type_map[0])))
+            db.adf_type_map_save(*self.adf_type_map)
+
+        if len(self.objects) > 0:
+            log('DATABASE: Inserting {} objects'.format(len(self.objects)))
+            obj_rowids = db.object_info_add_many(self.objects)
+
+            if len(self.object_id_refs) > 0:
+                log('DATABASE: Inserting {} object id ref'.format(len(self.object_id_refs)))
+                db.object_id_refs_add_many(self.object_id_refs, obj_rowids)
+
+            if len(self.event_id_refs) > 0:
+                log('DATABASE: Inserting {} event id refs'.format(len(self.event_id_refs)))
+                db.event_id_refs_add_many(self.event_id_refs, obj_rowids)
+
+
 class DbWrap:
-    def __init__(self, db: VfsDatabase, logger=None, index_offset=0):
+    def __init__(
+            self, db: VfsDatabase, logger=None, index_offset=0, adf_db: AdfDatabase = None,
+            batch_sink: Optional[Callable] = None):
         self._db = db
-        self._adf_db = AdfDatabase()
+        self._adf_db = adf_db
+        self._batch_sink = batch_sink  # when set, changes are handed over as a DbWrapBatch instead of written
         self._logger = logger
         self._index_offset = index_offset
         self._drop_results = False
         self._nodes_to_add = []
         self._nodes_to_update = set()
+        self._string_to_add = []  # hashed in one batch on exit
         self._string_hash_to_add = []
         self._gtoc_archive_defs = []
         self._objects = []  # uid(ROWID), src_node_id, offset, class_str(_rowid), name_str(_rowid), object_id
         self._object_id_refs = []  # object_rowid((src_node_id,offset)), id, flags
         self._event_id_refs = []  # object_rowid((src_node_id,offset)), id, flags
 
-        self._adf_db.load_from_database(self._db)
+        if self._adf_db is None:
+            self._adf_db = AdfDatabase()
+            self._adf_db.load_from_database(self._db)
 
         self.file_hash_type = self._db.file_hash_type
         self.file_hash = self._db.file_hash
@@ -123,59 +209,31 @@ class DbWrap:
         return self._adf_db.read_node(self._db, node)
 
     def process_adf_in_exe(self, exe_path, node_uid):
-        return self._adf_db.process_adf_in_exe(exe_path, node_uid)
+        return self._adf_db.process_adf_in_exe(exe_path, node_uid, os.path.dirname(self._db.db_filename))
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         if exc_type is None and not self._drop_results:
-            n_nodes_to_add = len(self._nodes_to_add)
-            if n_nodes_to_add > 0:
-                # self.log('Determining file types: {} nodes'.format(len(self._nodes_to_add)))
-                # for ii, node in enumerate(self._nodes_to_add):
-                #     self.status(ii + self._index_offset, n_nodes_to_add + self._index_offset)
-                #     determine_file_type_by_name(self._db, node)
-                #     determine_file_type(self._db, node)
-
-                # self.status(n_nodes_to_add + self._index_offset, n_nodes_to_add + self._index_offset)
-
-                self.log('DATABASE: Inserting {} nodes'.format(len(self._nodes_to_add)))
-                self._db.nodes_add_many(self._nodes_to_add)
-
-            if len(self._nodes_to_update) > 0:
-                self.log('DATABASE: Updating {} nodes'.format(len(self._nodes_to_update)))
-                self._db.node_update_many(self._nodes_to_update)
-
-            hash_strings_to_add = list(set(self._string_hash_to_add))
-            if len(hash_strings_to_add) > 0:
-                self.log('DATABASE: Inserting {} hash strings'.format(len(hash_strings_to_add)))
-                self._db.hash_string_add_many(hash_strings_to_add)
-
-            hash_field_strings_to_add = [hs for hs in hash_strings_to_add if hs[-3]]
-            if len(hash_field_strings_to_add) > 0:
-                self.log('DATABASE: Inserting {} hash field strings'.format(len(hash_field_strings_to_add)))
-                self._db.db_cg.hash_string_add_many(hash_field_strings_to_add)
-
-            if len(self._gtoc_archive_defs) > 0:
-                self.log('DATABASE: Inserting {} gt0c archive definitions'.format(len(self._gtoc_archive_defs)))
-                self._db.gtoc_archive_add_many(self._gtoc_archive_defs)
+            self.strings_hash()
 
+            batch = DbWrapBatch()
+            batch.nodes_to_add = self._nodes_to_add
+            batch.nodes_to_update = list(self._nodes_to_update)
+            batch.string_hash_to_add = self._string_hash_to_add
+            batch.gtoc_archive_defs = self._gtoc_archive_defs
             if self._adf_db.has_type_map_changed():
-                self.log('DATABASE: Saving ADF Types: {} Types'.format(len(self._adf_db.type_map_def)))
-                self._adf_db.save_to_database(self._db)
-
-            if len(self._objects) > 0:
-                self.log('DATABASE: Inserting {} objects'.format(len(self._objects)))
-                obj_rowids = self._db.object_info_add_many(self._objects)
+                batch.adf_type_map = (self._adf_db.type_map_new_packed(), set(self._adf_db.type_missing))
+                self._adf_db.type_map_changed_clear()
+            batch.objects = self._objects
+            batch.object_id_refs = self._object_id_refs
+            batch.event_id_refs = self._event_id_refs
 
-                if len(self._object_id_refs) > 0:
-                    self.log('DATABASE: Inserting {} object id ref'.format(len(self._object_id_refs)))
-                    self._db.object_id_refs_add_many(self._object_id_refs, obj_rowids)
-
-                if len(self._event_id_refs) > 0:
-                    self.log('DATABASE: Inserting {} event id refs'.format(len(self._event_id_refs)))
-                    self._db.event_id_refs_add_many(self._event_id_refs, obj_rowids)
+            if self._batch_sink is None:
+                batch.apply(self._db, self._logger)
+            elif len(batch) > 0 or batch.adf_type_map is not None:
+                self._batch_sink(batch)
 
     def node_add(self, node):
         self._nodes_to_add.append(node)
@@ -217,11 +275,9 @@ class DbWrap:
         else:
             p_types = p_types | ftype_list[possible_file_types]
 
-        hash_string_tuple = make_hash_string_tuple(string)
-
-        rec = (*hash_string_tuple, parent_uid, is_field_name, used_at_runtime, p_types)
+        rec = (string, parent_uid, is_field_name, used_at_runtime, p_types)
 
-        self._string_hash_to_add.append(rec)
+        self._string_to_add.append(rec)
 
         # find substrings spliting on , and |
         substrings = [string]
@@ -240,6 +296,14 @@ class DbWrap:
 
         return rec
 
+    def strings_hash(self):
+        # hash all strings proposed so far
+        if self._string_to_add:
+            hash_string_tuples = make_hash_string_tuples([rec[0] for rec in self._string_to_add])
+            self._string_hash_to_add += [
+                (*hash_string_tuple, *rec[1:]) for hash_string_tuple, rec in zip(hash_string_tuples, self._string_to_add)]
+            self._string_to_add = []
+
     def gtoc_archive_add(self, archive):
         if isinstance(archive, GtocArchiveEntry):
             self._gtoc_archive_defs.append(archive)
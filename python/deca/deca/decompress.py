@@ -1,4 +1,8 @@
+import zlib
+import concurrent.futures
+import zstandard as zstd
 from sys import platform
+from deca.ff_types import compression_v4_01_zlib, compression_v4_03_zstd
 if any([platform.startswith(os_name) for os_name in ['linux', 'darwin', 'freebsd']]):
     import zugbruecke.ctypes as ctypes
     is_zug = True
@@ -80,6 +84,127 @@ class DecompressorOodleLZ:
         out_buffer = out_buffer.raw
         return out_buffer, ret
 
+
+def block_decompress_into(compression_type, in_buffer, out_view, decompress_oodle_lz=None):
+    """
+    Decompress one block of a v4 archive entry straight into out_view, which is sized to the expected
+    uncompressed length. Returns the decompressed length, which does not match len(out_view) for bad blocks.
+    """
+    compressed_len = len(in_buffer)
+    uncompressed_len = len(out_view)
+
+    if compression_type in {compression_v4_01_zlib}:
+        dc = zlib.decompressobj()
+        buffer_ret = dc.decompress(in_buffer, uncompressed_len)
+        ret = len(buffer_ret)
+        out_view[:ret] = buffer_ret
+        if dc.unconsumed_tail:
+            ret += len(dc.decompress(dc.unconsumed_tail))
+        return ret
+    elif compression_type in {compression_v4_03_zstd}:
+        if compressed_len == uncompressed_len:
+            out_view[:] = in_buffer
+            return compressed_len
+
+        ret = 0
+        with zstd.ZstdDecompressor().stream_reader(in_buffer) as reader:
+            while ret < uncompressed_len:
+                n = reader.readinto(out_view[ret:])
+                if n == 0:
+                    break
+                ret += n
+            if ret == uncompressed_len:
+                ret += len(reader.read())
+        return ret
+    else:
+        if compressed_len == uncompressed_len:
+            out_view[:] = in_buffer
+            return compressed_len
+
+        buffer_ret, ret = decompress_oodle_lz.decompress(in_buffer, compressed_len, uncompressed_len)
+        out_view[:] = buffer_ret[:uncompressed_len]
+        return ret
+
+
+def blocks_decompress(f_in, blocks, compression_type, decompress_oodle_lz=None):
+    """
+    Decompress the blocks of a v4 archive entry into one preallocated buffer.
+    blocks: [(block_offset, compressed_len, uncompressed_len), ...] in f_in
+    Returns (buffer_out, good_blocks, bad_blocks), bad blocks are stored as their raw input bytes.
+    """
+    size_u = sum([block[2] for block in blocks])
+    buffer_out = bytearray(size_u)
+    good_blocks = []
+    bad_blocks = []
+
+    pos = 0
+    for bi, (block_offset, compressed_len, uncompressed_len) in enumerate(blocks):
+        f_in.seek(block_offset)
+        in_buffer = f_in.read(compressed_len)
+
+        with memoryview(buffer_out) as out_view:
+            ret = block_decompress_into(
+                compression_type, in_buffer, out_view[pos:pos + uncompressed_len], decompress_oodle_lz)
+
+        bb = (bi, ret, block_offset, compressed_len, uncompressed_len)
+        if ret == uncompressed_len:
+            good_blocks.append(bb)
+            pos += uncompressed_len
+        else:
+            bad_blocks.append(bb)
+            # replaces the slice, resizing the buffer if the raw block is a different length
+            buffer_out[pos:pos + uncompressed_len] = in_buffer
+            pos += len(in_buffer)
+
+    return buffer_out, good_blocks, bad_blocks
+
+
+def blocks_decompress_parallel(f_in, blocks, compression_type, executor, decompress_oodle_lz=None):
+    """
+    Same as blocks_decompress, but the blocks are fanned out to a thread pool (zlib and zstd release the GIL).
+    Oodle goes through a single library session so it stays serial.
+    """
+    if compression_type not in {compression_v4_01_zlib, compression_v4_03_zstd}:
+        return blocks_decompress(f_in, blocks, compression_type, decompress_oodle_lz)
+
+    # reads stay serial, only the decompression is spread out
+    in_buffers = []
+    for block_offset, compressed_len, uncompressed_len in blocks:
+        f_in.seek(block_offset)
+        in_buffers.append(f_in.read(compressed_len))
+
+    size_u = sum([block[2] for block in blocks])
+    buffer_out = bytearray(size_u)
+    good_blocks = []
+    bad_blocks = []
+
+    with memoryview(buffer_out) as out_view:
+        futures = []
+        pos = 0
+        for in_buffer, (block_offset, compressed_len, uncompressed_len) in zip(in_buffers, blocks):
+            futures.append(executor.submit(
+                block_decompress_into, compression_type, in_buffer, out_view[pos:pos + uncompressed_len]))
+            pos += uncompressed_len
+        concurrent.futures.wait(futures)
+        rets = [future.result() for future in futures]
+
+    for bi, (ret, (block_offset, compressed_len, uncompressed_len)) in enumerate(zip(rets, blocks)):
+        bb = (bi, ret, block_offset, compressed_len, uncompressed_len)
+        if ret == uncompressed_len:
+            good_blocks.append(bb)
+        else:
+            bad_blocks.append(bb)
+
+    if bad_blocks:
+        # rare, splice in the raw bytes of the bad blocks back to front so earlier offsets stay valid
+        starts = [0]
+        for block in blocks:
+            starts.append(starts[-1] + block[2])
+        for bi, ret, block_offset, compressed_len, uncompressed_len in bad_blocks[::-1]:
+            buffer_out[starts[bi]:starts[bi] + uncompressed_len] = in_buffers[bi]
+
+    return buffer_out, good_blocks, bad_blocks
+
 '''
 OodleLZ_Decompress(
     param_2,param_3,param_4,*param_5,
@@ -0,0 +1,402 @@
+import os
+import mmap
+import time
+import hashlib
+import collections
+import zstandard as zstd
+from deca.db_types import DbBase
+from deca.util import make_dir_for_file, common_prefix
+
+
+# cache backend ids, selectable through VfsDatabase(..., decompress_cache=...)
+DECOMPRESS_CACHE_NONE = 'none'
+DECOMPRESS_CACHE_DIR = 'dir'
+DECOMPRESS_CACHE_PACK = 'pack'
+
+pack_compression_none = 0
+pack_compression_zstd = 1
+
+
+def decompress_cache_key(node, blocks=None):
+    # key on (parent, compression, block layout), which identifies the compressed source bytes without having to
+    #  walk up the ancestors of the node
+    if blocks is None:
+        blocks = [(node.offset, node.size_c, node.size_u)]
+    key = '{}:{}:{}'.format(node.pid, node.compression_type_get(), ';'.join(
+        ['{},{},{}'.format(*block) for block in blocks]))
+    return hashlib.sha1(key.encode('ascii')).hexdigest()
+
+
+class DecompressCacheBase:
+    def __init__(self, vfs):
+        self.vfs = vfs
+
+    def get(self, node, blocks=None):
+        return None
+
+    def put(self, node, buffer, blocks=None):
+        pass
+
+    def clear(self):
+        pass
+
+    def shutdown(self):
+        pass
+
+
+class DecompressCacheNone(DecompressCacheBase):
+    pass
+
+
+class DecompressCacheDir(DecompressCacheBase):
+    # original cache, one .dat file per decompressed node under working_dir/__CACHE__/...
+    def __init__(self, vfs):
+        super().__init__(vfs)
+        self._dumped_cache_dir = False
+
+    def file_name(self, node):
+        parent_paths = []
+        parent_nodes = [] if node.pid is None else self.vfs.node_ancestors_where_uid(node.pid)
+        for parent_node in parent_nodes:
+            pp = None
+            if parent_node.p_path is not None:
+                prefix, end0, end1 = common_prefix(parent_node.p_path, self.vfs.game_info.game_dir)
+                f, e = os.path.splitext(end0)
+                if e != '.tab':
+                    pp = end0
+            else:
+                pp = parent_node.v_hash_to_str() + '.dat'
+            if pp is not None:
+                parent_paths.append(pp)
+        cache_dir = os.path.join(self.vfs.working_dir, '__CACHE__/', *parent_paths[::-1])
+        file_name = os.path.join(cache_dir, node.v_hash_to_str() + '.dat')
+
+        if not self._dumped_cache_dir:
+            self._dumped_cache_dir = True
+            self.vfs.logger.log(f'CACHE DIRECTORY -> {cache_dir}')
+
+        return file_name
+
+    def get(self, node, blocks=None):
+        file_name = self.file_name(node)
+        if os.path.isfile(file_name):
+            with open(file_name, 'rb') as f:
+                return f.read()
+        return None
+
+    def put(self, node, buffer, blocks=None):
+        file_name = self.file_name(node)
+        make_dir_for_file(file_name)
+        with open(file_name, 'wb') as f:
+            f.write(buffer)
+
+
+class DecompressCachePackIndex(DbBase):
+    def __init__(self, db_filename, logger):
+        super().__init__(db_filename, logger)
+
+        self.db_execute_one(
+            '''
+            CREATE TABLE IF NOT EXISTS "cache_entries" (
+                "key" TEXT NOT NULL,
+                "pack" TEXT NOT NULL,
+                "offset" INTEGER NOT NULL,
+                "size_stored" INTEGER NOT NULL,
+                "size_u" INTEGER NOT NULL,
+                "compression" INTEGER NOT NULL,
+                "last_access" REAL NOT NULL,
+                PRIMARY KEY ("key")
+            );
+            '''
+        )
+        self.db_execute_one(
+            'CREATE INDEX IF NOT EXISTS "cache_entries_pack_asc" ON "cache_entries" ("pack" ASC);')
+        self.db_execute_one(
+            '''
+            CREATE TABLE IF NOT EXISTS "cache_packs" (
+                "pack" TEXT NOT NULL,
+                "sealed" INTEGER NOT NULL,
+                PRIMARY KEY ("pack")
+            );
+            '''
+        )
+        self.db_conn.commit()
+
+
+class DecompressCachePack(DecompressCacheBase):
+    """
+    Decompressed nodes are appended to a few large pack files, one open pack per writing process, with the
+    location of each entry kept in a SQLite index. Hits are served as memoryviews over an mmap of the pack file
+    unless the entry was stored zstd recompressed. When the total size goes over max_size, whole sealed packs
+    are evicted, least recently used first.
+    """
+
+    def __init__(
+            self, vfs, cache_dir=None,
+            max_size=(64 * 1024**3),
+            pack_max_size=(1 * 1024**3),
+            compress_level=None,
+            access_flush_count=1024,
+            evict_check_size=(256 * 1024**2),
+    ):
+        super().__init__(vfs)
+
+        if cache_dir is None:
+            cache_dir = os.path.join(vfs.working_dir, '__CACHE_PACK__')
+
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.pack_max_size = pack_max_size
+        self.compress_level = compress_level
+        self.access_flush_count = access_flush_count
+        self.evict_check_size = evict_check_size
+
+        self._index = DecompressCachePackIndex(os.path.join(cache_dir, 'index.db'), vfs.logger)
+        self._pack_counter = 0
+        self._pack_name = None
+        self._pack_file = None
+        self._pack_size = 0
+        self._mmaps = {}
+        self._accessed = {}
+        self._size_since_evict = 0
+
+    def _pack_path(self, pack):
+        return os.path.join(self.cache_dir, pack)
+
+    def _pack_open(self):
+        self._pack_counter += 1
+        self._pack_name = 'pack_{}_{:08x}_{:04d}.dat'.format(os.getpid(), int(time.time()), self._pack_counter)
+        self._pack_file = open(self._pack_path(self._pack_name), 'ab')
+        self._pack_size = self._pack_file.tell()
+        self._index.db_execute_one(
+            'INSERT OR IGNORE INTO cache_packs VALUES (?,?)', [self._pack_name, 0], dbg='cache_pack_open')
+        self._index.db_conn.commit()
+
+    def _pack_seal(self):
+        if self._pack_file is not None:
+            self._pack_file.close()
+            self._pack_file = None
+            self._index.db_execute_one(
+                'UPDATE cache_packs SET sealed=1 WHERE pack=(?)', [self._pack_name], dbg='cache_pack_seal')
+            self._index.db_conn.commit()
+            self._pack_name = None
+            self._pack_size = 0
+
+    def _mmap_get(self, pack, end):
+        mm = self._mmaps.get(pack, None)
+        if mm is None or len(mm) < end:
+            # packs are append only, an older mapping may be too short
+            self._mmap_release(pack)
+            with open(self._pack_path(pack), 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mmaps[pack] = mm
+        return mm
+
+    def _mmap_release(self, pack):
+        mm = self._mmaps.pop(pack, None)
+        if mm is not None:
+            try:
+                mm.close()
+            except BufferError:
+                # still referenced by a live memoryview, will be released when that goes away
+                pass
+
+    def _access_flush(self):
+        if self._accessed:
+            self._index.db_execute_many(
+                'UPDATE cache_entries SET last_access=(?) WHERE key=(?)',
+                [(t, k) for k, t in self._accessed.items()],
+                dbg='cache_access_flush')
+            self._index.db_conn.commit()
+            self._accessed = {}
+
+    def get(self, node, blocks=None):
+        key = decompress_cache_key(node, blocks)
+        rec = self._index.db_query_one(
+            'SELECT pack, offset, size_stored, size_u, compression FROM cache_entries WHERE key=(?)',
+            [key], dbg='cache_get')
+
+        if rec is None:
+            return None
+
+        pack, offset, size_stored, size_u, compression = rec
+        if self._pack_file is not None and pack == self._pack_name:
+            self._pack_file.flush()
+
+        try:
+            mm = self._mmap_get(pack, offset + size_stored)
+        except (OSError, ValueError):
+            # pack was evicted by another process
+            return None
+
+        buffer = memoryview(mm)[offset:offset + size_stored]
+        if compression == pack_compression_zstd:
+            buffer = zstd.ZstdDecompressor().decompress(buffer, max_output_size=size_u)
+
+        self._accessed[key] = time.time()
+        if len(self._accessed) >= self.access_flush_count:
+            self._access_flush()
+
+        return buffer
+
+    def put(self, node, buffer, blocks=None):
+        key = decompress_cache_key(node, blocks)
+
+        compression = pack_compression_none
+        size_u = len(buffer)
+        if self.compress_level is not None:
+            buffer = zstd.ZstdCompressor(level=self.compress_level).compress(buffer)
+            compression = pack_compression_zstd
+
+        if self._pack_file is not None and self._pack_size + len(buffer) > self.pack_max_size:
+            self._pack_seal()
+
+        if self._pack_file is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._pack_open()
+
+        offset = self._pack_size
+        self._pack_file.write(buffer)
+        self._pack_file.flush()
+        self._pack_size += len(buffer)
+
+        self._index.db_execute_one(
+            'INSERT OR REPLACE INTO cache_entries VALUES (?,?,?,?,?,?,?)',
+            [key, self._pack_name, offset, len(buffer), size_u, compression, time.time()],
+            dbg='cache_put')
+        self._index.db_conn.commit()
+
+        # checking the total size is a full scan of the index, so only do it every so often
+        self._size_since_evict += len(buffer)
+        if self._size_since_evict >= self.evict_check_size:
+            self._size_since_evict = 0
+            self.evict()
+
+    def total_size(self):
+        return self._index.db_query_one('SELECT TOTAL(size_stored) FROM cache_entries', dbg='cache_total_size')[0]
+
+    def evict(self):
+        if self.max_size is None:
+            return
+
+        total = self.total_size()
+        if total <= self.max_size:
+            return
+
+        self._access_flush()
+
+        # only sealed packs are evicted, open packs may still be written to by other processes
+        packs = self._index.db_query_all(
+            '''
+            SELECT cache_entries.pack, MAX(cache_entries.last_access), TOTAL(cache_entries.size_stored)
+            FROM cache_entries
+            INNER JOIN cache_packs ON cache_entries.pack=cache_packs.pack
+            WHERE cache_packs.sealed == 1
+            GROUP BY cache_entries.pack
+            ORDER BY MAX(cache_entries.last_access) ASC
+            ''',
+            dbg='cache_evict_select')
+
+        for pack, _, pack_size in packs:
+            if total <= self.max_size:
+                break
+            self.vfs.logger.log(f'CACHE: Evicting {pack}, {pack_size} bytes')
+            self._index.db_execute_one('DELETE FROM cache_entries WHERE pack=(?)', [pack], dbg='cache_evict_entries')
+            self._index.db_execute_one('DELETE FROM cache_packs WHERE pack=(?)', [pack], dbg='cache_evict_pack')
+            self._index.db_conn.commit()
+            self._mmap_release(pack)
+            try:
+                os.remove(self._pack_path(pack))
+            except OSError:
+                # mapped by another process on some platforms, entries are gone so it is no longer reachable
+                pass
+            total -= pack_size
+
+    def clear(self):
+        self._pack_seal()
+        for pack in list(self._mmaps.keys()):
+            self._mmap_release(pack)
+        self._accessed = {}
+
+        packs = self._index.db_query_all('SELECT pack FROM cache_packs', dbg='cache_clear_select')
+        self._index.db_execute_one('DELETE FROM cache_entries', dbg='cache_clear_entries')
+        self._index.db_execute_one('DELETE FROM cache_packs', dbg='cache_clear_packs')
+        self._index.db_conn.commit()
+        for pack, in packs:
+            try:
+                os.remove(self._pack_path(pack))
+            except OSError:
+                pass
+
+    def shutdown(self):
+        self._access_flush()
+        self._pack_seal()
+        for pack in list(self._mmaps.keys()):
+            self._mmap_release(pack)
+
+
+def decompress_cache_create(vfs, cache_type, **kwargs):
+    if cache_type == DECOMPRESS_CACHE_PACK:
+        return DecompressCachePack(vfs, **kwargs)
+    elif cache_type == DECOMPRESS_CACHE_DIR:
+        return DecompressCacheDir(vfs)
+    elif cache_type == DECOMPRESS_CACHE_NONE or cache_type is None:
+        return DecompressCacheNone(vfs)
+    else:
+        raise NotImplementedError(f'Unknown decompress cache type: {cache_type}')
+
+
+class BufferLruCache:
+    # in process, byte bounded LRU of decompressed node buffers, hands out read only views
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._map = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._map)
+
+    def get(self, key):
+        buffer = self._map.get(key, None)
+        if buffer is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._map.move_to_end(key)
+        return buffer
+
+    def put(self, key, buffer):
+        buffer = memoryview(buffer).toreadonly()
+        n = buffer.nbytes
+        if self.max_size is None or n > self.max_size:
+            return buffer
+
+        old = self._map.pop(key, None)
+        if old is not None:
+            self.size -= old.nbytes
+
+        while self._map and self.size + n > self.max_size:
+            _, evicted = self._map.popitem(last=False)
+            self.size -= evicted.nbytes
+            self.evictions += 1
+
+        self._map[key] = buffer
+        self.size += n
+        return buffer
+
+    def clear(self):
+        self._map.clear()
+        self.size = 0
+
+    def stats(self):
+        return {
+            'entries': len(self._map),
+            'size': self.size,
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -11,7 +11,7 @@ from .util import make_dir_for_file
 
 
 def process_translation_adf(vfs: VfsDatabase, adf_db: AdfDatabase, node: VfsNode):
-    adf = adf_db.read_node(vfs, node)
+    adf = adf_db.read_node(vfs, node, lazy=True)
 
     txt_buffer = adf.table_instance_values[0]['Text']
     txt_buffer = [(t + 256) % 256 for t in txt_buffer]
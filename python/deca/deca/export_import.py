@@ -9,7 +9,8 @@ from .db_view import VfsView
 from .ff_avtx import image_export
 from .ff_sarc import FileSarc
 from .util import make_dir_for_file
-from .export_import_adf import node_export_adf_processed, node_export_adf_gltf, node_export_adf_text
+from .export_import_adf import \
+    node_export_adf_processed, node_export_adf_gltf, node_export_adf_text, node_export_adf_columns
 from .export_import_rtpc import node_export_rtpc_gltf, node_export_rtpc_text
 from .export_import_audio import node_export_fsb5c_processed
 from .export_map import export_map
@@ -51,21 +52,32 @@ def extract_node_raw(
     return None
 
 
+def nodes_selected_real(vfs_view: VfsView, first_only=True):
+    """
+    Real nodes of the selected v_paths, looked up in one batch
+    :return: list with a list of nodes for each selected v_path, only the first node if first_only
+    """
+    uids_lists = []
+    for k, (nodes_real, nodes_sym) in vfs_view.nodes_selected_get().items():
+        if nodes_real and nodes_real[0] is not None:
+            uids_lists.append(nodes_real[:1] if first_only else nodes_real)
+
+    nodes = iter(vfs_view.nodes_where_uids([uid for uids in uids_lists for uid in uids]))
+    return [[next(nodes) for _ in uids] for uids in uids_lists]
+
+
 def nodes_export_raw(
         vfs: VfsDatabase,
         vfs_view: VfsView,
         extract_dir: str,
         allow_overwrite=False):
-    node_map = vfs_view.nodes_selected_get()
-    for k, (nodes_real, nodes_sym) in node_map.items():
-        if nodes_real and nodes_real[0] is not None:
-            uid = nodes_real[0]
-            node = vfs_view.node_where_uid(uid)
-            try:
-                extract_node_raw(vfs, node, extract_dir, allow_overwrite)
-            except EDecaFileExists as e:
-                vfs.logger.log(
-                    'WARNING: Extraction failed overwrite disabled and {} exists, skipping'.format(e.args[0]))
+    for nodes in nodes_selected_real(vfs_view):
+        node = nodes[0]
+        try:
+            extract_node_raw(vfs, node, extract_dir, allow_overwrite)
+        except EDecaFileExists as e:
+            vfs.logger.log(
+                'WARNING: Extraction failed overwrite disabled and {} exists, skipping'.format(e.args[0]))
 
 
 def nodes_export_map(
@@ -94,35 +106,32 @@ def nodes_export_contents(
         vfs_view: VfsView,
         extract_dir: str,
         allow_overwrite=False):
-    node_map = vfs_view.nodes_selected_get()
-    for k, (nodes_real, nodes_sym) in node_map.items():
-        if nodes_real and nodes_real[0] is not None:
-            uid = nodes_real[0]
-            node = vfs_view.node_where_uid(uid)
-            try:
-                if node.file_type == FTYPE_SARC:
-                    sarc = FileSarc()
-                    with vfs.file_obj_from(node) as f:
-                        sarc.header_deserialize(f)
-                        # extract_node_raw(vfs, vnode, extract_dir, allow_overwrite)
-                    entry_v_paths = [v.v_path for v in sarc.entries]
-                    entry_is_symlinks = [v.offset == 0 for v in sarc.entries]
-
-                    nodes_export_raw(vfs, vfs_view, extract_dir, allow_overwrite)
-
-                    file_list_name = os.path.join(extract_dir, node.v_path.decode('utf-8') + '.DECA.FILE_LIST.txt')
-
-                    with open(file_list_name, 'w') as f:
-                        f.write('sarc.clear();\n')
-                        for vp, is_sym in zip(entry_v_paths, entry_is_symlinks):
-                            op = 'sarc.add'
-                            if is_sym:
-                                op = 'sarc.symlink'
-                            f.write('{}("{}");\n'.format(op, vp.decode('utf-8')))
+    for nodes in nodes_selected_real(vfs_view):
+        node = nodes[0]
+        try:
+            if node.file_type == FTYPE_SARC:
+                sarc = FileSarc()
+                with vfs.file_obj_from(node) as f:
+                    sarc.header_deserialize(f)
+                    # extract_node_raw(vfs, vnode, extract_dir, allow_overwrite)
+                entry_v_paths = [v.v_path for v in sarc.entries]
+                entry_is_symlinks = [v.offset == 0 for v in sarc.entries]
+
+                nodes_export_raw(vfs, vfs_view, extract_dir, allow_overwrite)
+
+                file_list_name = os.path.join(extract_dir, node.v_path.decode('utf-8') + '.DECA.FILE_LIST.txt')
+
+                with open(file_list_name, 'w') as f:
+                    f.write('sarc.clear();\n')
+                    for vp, is_sym in zip(entry_v_paths, entry_is_symlinks):
+                        op = 'sarc.add'
+                        if is_sym:
+                            op = 'sarc.symlink'
+                        f.write('{}("{}");\n'.format(op, vp.decode('utf-8')))
 
-            except EDecaFileExists as e:
-                vfs.logger.log(
-                    'WARNING: Extraction failed overwrite disabled and {} exists, skipping'.format(e.args[0]))
+        except EDecaFileExists as e:
+            vfs.logger.log(
+                'WARNING: Extraction failed overwrite disabled and {} exists, skipping'.format(e.args[0]))
 
 
 def nodes_export_gltf(
@@ -137,24 +146,21 @@ def nodes_export_gltf(
     vs_adf = []
     vs_rtpc = []
 
-    node_map = vfs_view.nodes_selected_get()
-    for k, (nodes_real, nodes_sym) in node_map.items():
-        if nodes_real and nodes_real[0] is not None:
-            uid = nodes_real[0]
-            node = vfs_view.node_where_uid(uid)
-            if node.is_valid() and node.offset is not None:
-                try:
-                    if node.file_type in ftype_adf_family:
-                        vs_adf.append(node)
-                    elif node.file_type in {FTYPE_RTPC}:
-                        vs_rtpc.append(node)
-
-                except EDecaFileExists as e:
-                    vfs.logger.log(
-                        'WARNING: Extraction failed overwrite disabled and {} exists, skipping'.format(e.args[0]))
-                except EDecaFileMissing as e:
-                    vfs.logger.log(
-                        'ERROR: Extracting {} Failed: {}  '.format(node.v_path, e.args[0]))
+    for nodes in nodes_selected_real(vfs_view):
+        node = nodes[0]
+        if node.is_valid() and node.offset is not None:
+            try:
+                if node.file_type in ftype_adf_family:
+                    vs_adf.append(node)
+                elif node.file_type in {FTYPE_RTPC}:
+                    vs_rtpc.append(node)
+
+            except EDecaFileExists as e:
+                vfs.logger.log(
+                    'WARNING: Extraction failed overwrite disabled and {} exists, skipping'.format(e.args[0]))
+            except EDecaFileMissing as e:
+                vfs.logger.log(
+                    'ERROR: Extracting {} Failed: {}  '.format(node.v_path, e.args[0]))
 
     adf_db = AdfDatabase(vfs)
     for node in vs_adf:
@@ -203,50 +209,48 @@ def nodes_export_processed(
         extract_dir: str,
         allow_overwrite=False,
         save_to_processed=False,
-        save_to_text=False):
+        save_to_text=False,
+        save_to_columns=False):
     vs_adf = []
     vs_rtpc = []
     vs_images = []
     vs_fsb5cs = []
     vs_rename = []
     vs_other = []
-    node_map = vfs_view.nodes_selected_get()
-    for k, (nodes_real, nodes_sym) in node_map.items():
-        if nodes_real and nodes_real[0] is not None:
-            nodes = [vfs_view.node_where_uid(uid) for uid in nodes_real]
-            node = nodes[0]
-            if node.is_valid() and node.offset is not None:
-                try:
-                    if node.file_type in ftype_adf_family:
-                        # handle the case for GenZero where ADF files can be in the
-                        nodes_adf = []
-                        nodes_adfb = []
-
-                        for vnode in nodes:
-                            if vnode.file_type == FTYPE_ADF_BARE:
-                                nodes_adfb.append(vnode)
-                            else:
-                                nodes_adf.append(vnode)
-
-                        if len(nodes_adf) > 0:
-                            vs_adf.append(nodes_adf[0])
-                        if len(nodes_adfb) > 0:
-                            vs_adf.append(nodes_adfb[0])
-                    elif node.file_type in {FTYPE_RTPC}:
-                        vs_rtpc.append(node)
-                    elif node.file_type in {FTYPE_BMP, FTYPE_DDS, FTYPE_AVTX, FTYPE_ATX, FTYPE_HMDDSC}:
-                        vs_images.append(node)
-                    elif node.file_type in {FTYPE_FSB5C}:
-                        vs_fsb5cs.append(node)
-                    elif isinstance(node.v_path, bytes) and (
-                            node.v_path.endswith(b'.csvc') or node.v_path.endswith(b'.bmpc')):
-                        vs_rename.append(node)
-                    else:
-                        vs_other.append(node)
-
-                except EDecaFileExists as e:
-                    vfs.logger.log(
-                        'WARNING: Extraction failed overwrite disabled and {} exists, skipping'.format(e.args[0]))
+    for nodes in nodes_selected_real(vfs_view, first_only=False):
+        node = nodes[0]
+        if node.is_valid() and node.offset is not None:
+            try:
+                if node.file_type in ftype_adf_family:
+                    # handle the case for GenZero where ADF files can be in the
+                    nodes_adf = []
+                    nodes_adfb = []
+
+                    for vnode in nodes:
+                        if vnode.file_type == FTYPE_ADF_BARE:
+                            nodes_adfb.append(vnode)
+                        else:
+                            nodes_adf.append(vnode)
+
+                    if len(nodes_adf) > 0:
+                        vs_adf.append(nodes_adf[0])
+                    if len(nodes_adfb) > 0:
+                        vs_adf.append(nodes_adfb[0])
+                elif node.file_type in {FTYPE_RTPC}:
+                    vs_rtpc.append(node)
+                elif node.file_type in {FTYPE_BMP, FTYPE_DDS, FTYPE_AVTX, FTYPE_ATX, FTYPE_HMDDSC}:
+                    vs_images.append(node)
+                elif node.file_type in {FTYPE_FSB5C}:
+                    vs_fsb5cs.append(node)
+                elif isinstance(node.v_path, bytes) and (
+                        node.v_path.endswith(b'.csvc') or node.v_path.endswith(b'.bmpc')):
+                    vs_rename.append(node)
+                else:
+                    vs_other.append(node)
+
+            except EDecaFileExists as e:
+                vfs.logger.log(
+                    'WARNING: Extraction failed overwrite disabled and {} exists, skipping'.format(e.args[0]))
 
     if save_to_processed:
         for node in vs_fsb5cs:
@@ -287,6 +291,16 @@ def nodes_export_processed(
                 vfs.logger.log(
                     'WARNING: Extracting {} Failed: Missing ADF Type 0x{:08x}  '.format(node.v_path, e.type_id))
 
+        if save_to_columns:
+            try:
+                node_export_adf_columns(vfs, adf_db, node, extract_dir, allow_overwrite=allow_overwrite)
+            except EDecaFileExists as e:
+                vfs.logger.log(
+                    'WARNING: Extraction failed overwrite disabled and {} exists, skipping'.format(e.args[0]))
+            except EDecaMissingAdfType as e:
+                vfs.logger.log(
+                    'WARNING: Extracting {} Failed: Missing ADF Type 0x{:08x}  '.format(node.v_path, e.type_id))
+
     for node in vs_rtpc:
         try:
             if save_to_text:
@@ -1,4 +1,6 @@
+import numpy as np
 from .ff_adf import *
+from .ff_adf_columns import adf_columns, adf_struct_arrays, adf_columns_save_npz
 from .xlsxwriter_hack import DecaWorkBook
 from .ff_adf_amf import AABB
 from .ff_adf_amf_gltf import DecaGltf, DecaGltfNode, Deca3dMatrix
@@ -31,7 +33,7 @@ def adf_export_xlsx_0x0b73315d(
     ofile = generate_export_file_path(vfs, export_path, vnode, ' as XLSX')
     fn = ofile + '.xlsx'
 
-    adf = adf_db.read_node(vfs, vnode)
+    adf = adf_db.read_node(vfs, vnode, lazy=True)
 
     if not allow_overwrite and os.path.exists(fn):
         raise EDecaFileExists(fn)
@@ -39,10 +41,20 @@ def adf_export_xlsx_0x0b73315d(
     src = adf.table_instance_values[0]
     book = DecaWorkBook(fn)
 
+    bool_data = src['BoolData']
+    string_data = src['StringData']
+    value_data = src['ValueData']
+    cells = adf_columns(src['Cell'], hash_strings=False)
+    cell_type = cells['Type']
+    cell_data_index = cells['DataIndex']
+    cell_attribute_index = cells['AttributeIndex']
+
     cell_formats = []
-    for att in src['Attribute']:
-        fg_color = src['ColorData'][att['FGColorIndex'] - 1]
-        bg_color = src['ColorData'][att['BGColorIndex'] - 1]
+    attributes = adf_columns(src['Attribute'], hash_strings=False)
+    color_data = np.array(list(src['ColorData']))
+    fg_colors = color_data[attributes['FGColorIndex'].astype(np.int64) - 1]
+    bg_colors = color_data[attributes['BGColorIndex'].astype(np.int64) - 1]
+    for fg_color, bg_color in zip(fg_colors.tolist(), bg_colors.tolist()):
         fmt = book.add_format()
         # fmt.set_bg_color('#{:06X}'.format(bg_color))
         # fmt.set_font_color('#{:06X}'.format(fg_color))
@@ -52,35 +64,37 @@ def adf_export_xlsx_0x0b73315d(
         cols = srcw['Cols']
         rows = srcw['Rows']
         name = srcw['Name']
-        cellindex = srcw['CellIndex']
+        # cells of the sheet in row major order
+        cellindex = np.array(list(srcw['CellIndex'][:rows * cols]), dtype=np.int64)
+        ctypes = cell_type[cellindex].tolist()
+        didxs = cell_data_index[cellindex].tolist()
+        aidxs = cell_attribute_index[cellindex].tolist()
         worksheet = book.add_worksheet(name.decode('utf-8'))
         for i in range(rows):
             for j in range(cols):
                 r = i
                 c = j
 
-                cidx = cellindex[j + cols * i]
-                cdata = src['Cell'][cidx]
-
-                ctype = cdata['Type']
-                didx = cdata['DataIndex']
-                aidx = cdata['AttributeIndex']
+                k = j + cols * i
+                ctype = ctypes[k]
+                didx = didxs[k]
+                aidx = aidxs[k]
                 cell_format = cell_formats[aidx]
                 if ctype == 0:
-                    if didx < len(src['BoolData']):
-                        worksheet.write_boolean(r, c, src['BoolData'][didx], cell_format=cell_format)
+                    if didx < len(bool_data):
+                        worksheet.write_boolean(r, c, bool_data[didx], cell_format=cell_format)
                     else:
                         # worksheet.write_string(r, c, 'Missing BoolData {}'.format(didx), cell_format=cell_format)
                         pass
                 elif ctype == 1:
-                    if didx < len(src['StringData']):
-                        worksheet.write_string(r, c, src['StringData'][didx].decode('utf-8'), cell_format=cell_format)
+                    if didx < len(string_data):
+                        worksheet.write_string(r, c, string_data[didx].decode('utf-8'), cell_format=cell_format)
                     else:
                         # worksheet.write_string(r, c, 'Missing StringData {}'.format(didx), cell_format=cell_format)
                         pass
                 elif ctype == 2:
-                    if didx < len(src['ValueData']):
-                        worksheet.write_number(r, c, src['ValueData'][didx], cell_format=cell_format)
+                    if didx < len(value_data):
+                        worksheet.write_number(r, c, value_data[didx], cell_format=cell_format)
                     else:
                         # worksheet.write_string(r, c, 'Missing ValueData {}'.format(didx), cell_format=cell_format)
                         pass
@@ -232,6 +246,37 @@ def node_export_adf_gltf(
                     save_to_one_dir=save_to_one_dir, include_skeleton=include_skeleton, texture_format=texture_format)
 
 
+def adf_export_columns(
+        vfs: VfsDatabase,
+        vnode: VfsNode,
+        adf: Adf,
+        export_path,
+        allow_overwrite
+):
+    """
+    Export the arrays of structs of all instances as columns to one .npz, keys are '<instance>.<path>/<column>'
+    :param adf: the ADF of vnode, read with lazy=True
+    :return: file name, None if the ADF has no arrays of structs
+    """
+    tables = {}
+    for instance, value in zip(adf.table_instance, adf.table_instance_values):
+        if isinstance(value, AdfLazyStruct):
+            for path, array in adf_struct_arrays(value, instance.name.decode('utf-8')):
+                tables[path] = adf_columns(array)
+
+    if not tables:
+        return None
+
+    fn = generate_export_file_path(vfs, export_path, vnode, ' as Columns') + '.npz'
+
+    if not allow_overwrite and os.path.exists(fn):
+        raise EDecaFileExists(fn)
+
+    adf_columns_save_npz(fn, tables)
+
+    return fn
+
+
 def node_export_adf_processed(
         vfs: VfsDatabase,
         adf_db: AdfDatabase,
@@ -239,13 +284,25 @@ def node_export_adf_processed(
         export_path,
         allow_overwrite=False
 ):
-    adf = adf_db.read_node(vfs, vnode)
+    adf = adf_db.read_node(vfs, vnode, lazy=True)
     if adf is not None:
         if len(adf.table_instance) == 1:
             if adf.table_instance[0].type_hash == 0x0B73315D:
                 adf_export_xlsx_0x0b73315d(vfs, adf_db, vnode, export_path, allow_overwrite)
 
 
+def node_export_adf_columns(
+        vfs: VfsDatabase,
+        adf_db: AdfDatabase,
+        vnode: VfsNode,
+        export_path,
+        allow_overwrite=False
+):
+    adf = adf_db.read_node(vfs, vnode, lazy=True)
+    if adf is not None:
+        adf_export_columns(vfs, vnode, adf, export_path, allow_overwrite)
+
+
 def node_export_adf_text(
         vfs: VfsDatabase,
         adf_db: AdfDatabase,
@@ -260,11 +317,9 @@ def node_export_adf_text(
     if not allow_overwrite and os.path.exists(fn):
         raise EDecaFileExists(fn)
 
-    s = adf.dump_to_string(vfs)
-
     fn_dir = os.path.dirname(fn)
     os.makedirs(fn_dir, exist_ok=True)
 
     with open(fn, 'wt', encoding='utf-8') as f:
-        f.write(s)
+        adf.dump_to(f, vfs)
 
@@ -142,12 +142,9 @@ def node_export_rtpc_text(
     if not allow_overwrite and os.path.exists(fn):
         raise EDecaFileExists(fn)
 
-    dump = RtpcVisitorDumpToString(vfs)
-    dump.visit(buffer)
-    s = dump.result()
-
     ofiledir = os.path.dirname(fn)
     os.makedirs(ofiledir, exist_ok=True)
 
     with open(fn, 'wt') as f:
-        f.write(s)
+        dump = RtpcVisitorDumpToString(vfs, stream=f)
+        dump.visit(buffer)
@@ -33,7 +33,9 @@ def extract_aaf(src):
     section_size = f.read_u32()  # uncompress length, max any section?
     section_count = f.read_u32()  # section count? Normally 1 (2-5 found), number of 32MiB blocks?
 
-    buffer_out = b''
+    # preallocate from the header, sections are decompressed into their slice of the output
+    buffer_out = bytearray(uncompressed_length)
+    pos = 0
     for i in range(section_count):
         section_start = f.tell()
         section_compressed_length = f.read_u32()  # compressed length no including padding
@@ -42,7 +44,8 @@ def extract_aaf(src):
         magic_ewam = f.read(4)  # 'EWAM'
         buf_in = f.read(section_compressed_length)
         buf_out = zlib.decompress(buf_in, -15)
-        buffer_out = buffer_out + buf_out
+        buffer_out[pos:pos + len(buf_out)] = buf_out
+        pos += len(buf_out)
 
         if len(buf_out) != section_uncompressed_length:
             # raise Exception(
@@ -59,4 +62,7 @@ def extract_aaf(src):
         f.seek(section_length_with_header + section_start)
         # print(section_compressed_length, section_uncompressed_length, section_length_with_header, magic_ewam)
 
+    if pos != len(buffer_out):
+        del buffer_out[pos:]
+
     return buffer_out
@@ -1,11 +1,19 @@
+import gc
 import io
 import os
+import re
+import hashlib
 import enum
+import mmap
+import pickle
 import struct
+import numpy as np
+from collections import ChainMap
+from collections.abc import Mapping, Sequence
 from typing import List, Dict
 from io import BytesIO
 from deca.errors import *
-from deca.file import ArchiveFile
+from deca.file import ArchiveFile, BufferFile
 from deca.fast_file import *
 from deca.hashes import hash32_func
 from deca.ff_types import FTYPE_ADF_BARE, FTYPE_ADF0, FTYPE_ADF5
@@ -365,110 +373,230 @@ class AdfValue:
         return s
 
 
-def hash_lookup(vfs: VfsDatabase, hash_code, default=None, prefix=''):
-    if isinstance(hash_code, int):
-        ele = vfs.lookup_equipment_from_hash(hash_code)
+adf_type_def_unknown = TypeDef()
+
+
+class AdfHashNames:
+    """
+    Hash comments of a text dump. collect walks values before they are formatted so the strings of their hashes are
+    found with one search per hash size, hashes that were not collected are looked up one by one. Like hash_lookup
+    every int is tried as an equipment hash and then as a hash32 of a string.
+    """
+    def __init__(self, vfs: VfsDatabase):
+        self.vfs = vfs
+        self.resolver = vfs.hash_string_resolver()
+        self._strings = {'hash32': {}, 'hash48': {}}
+        self._comments = {}
+
+    def string_where_hash(self, column, hash_value):
+        strings = self._strings[column]
+        if hash_value not in strings:
+            strings[hash_value] = self.resolver.string_where_hash(column, hash_value)
+        return strings[hash_value]
+
+    def string_where_hash32(self, hash_value):
+        return self.string_where_hash('hash32', hash_value)
+
+    def string_where_hash48(self, hash_value):
+        return self.string_where_hash('hash48', hash_value)
+
+    def collect(self, v, type_map):
+        hashes = {'hash32': set(), 'hash48': set()}
+        ints = set()
+        stack = [v]
+        while stack:
+            v = stack.pop()
+            if isinstance(v, AdfValue):
+                type_def = type_map.get(v.type_id, adf_type_def_unknown)
+                if v.type_id == 0xdefe88ed:
+                    stack.append(v.value)
+                elif type_def.metatype == MetaType.Structure:
+                    for iv in v.value.values():
+                        stack.append(iv)
+                        if hasattr(iv, 'value') and isinstance(iv.value, int):
+                            ints.add(iv.value)
+                elif type_def.metatype in {MetaType.Array, MetaType.InlineArray}:
+                    stack.extend(v.value)
+                elif type_def.metatype == MetaType.StringHash and v.hash_string is None:
+                    if type_def.size == 4:
+                        hashes['hash32'].add(v.value)
+                    elif type_def.size == 6:
+                        hashes['hash48'].add(v.value & 0x0000FFFFFFFFFFFF)
+                    elif type_def.size == 8:
+                        hashes['hash48'].add(v.value & 0x0000FFFFFFFFFFFF)
+                        hashes['hash48'].add(v.value)
+            elif isinstance(v, int):
+                ints.add(v)
+
+        ints.difference_update(self._comments)
+        for hash_code in ints:
+            ele = self.vfs.lookup_equipment_from_hash(hash_code)
+            hashes['hash32'].add(hash_code if ele is None else ele["DisplayNameHash"])
+
+        for column, values in hashes.items():
+            strings = self._strings[column]
+            values.difference_update(strings)
+            found = self.resolver.strings_where_hashes(column, values)
+            for hash_value in values:
+                strings[hash_value] = found.get(hash_value)
+
+    def comment(self, hash_code, default=None, prefix=''):
+        if isinstance(hash_code, int):
+            if hash_code not in self._comments:
+                self._comments[hash_code] = self._comment(hash_code)
+            comment = self._comments[hash_code]
+            if comment is not None:
+                return f'{prefix}{comment}'
+
+        return default
+
+    def _comment(self, hash_code):
+        ele = self.vfs.lookup_equipment_from_hash(hash_code)
         if ele is not None:
             display_name_hash = ele["DisplayNameHash"]
-            display_name = vfs.hash_string_match(hash32=display_name_hash)
-            if display_name:
-                display_name = display_name[0][1].decode('utf-8')
-                display_translated = vfs.lookup_translation_from_name(display_name)
+            display_name = self.string_where_hash32(display_name_hash)
+            if display_name is not None:
+                display_translated = self.vfs.lookup_translation_from_name(display_name)
                 if display_translated is None:
                     display_translated = display_name
             else:
                 display_translated = display_name_hash
-            return f'{prefix}# {ele["EquipmentName"].decode("utf-8")} "{display_translated}"'
+            return f'# {ele["EquipmentName"].decode("utf-8")} "{display_translated}"'
         else:
-            hsm = vfs.hash_string_match(hash32=hash_code)
-            if hsm:
-                display_name = hsm[0][1].decode('utf-8')
-                return f'{prefix}# {display_name}'
-
-    return default
+            display_name = self.string_where_hash32(hash_code)
+            if display_name is not None:
+                return f'# {display_name}'
 
+        return None
 
-def adf_format(v, vfs: VfsDatabase, type_map, indent=0):
-    if isinstance(v, AdfValue):
-        type_def = type_map.get(v.type_id, TypeDef())
-
-        s = ''
-        s = s + '{}(0x{:08X}), Data Offset: {}(0x{:08x})'.format(
-            adf_type_id_to_str(v.type_id, type_map), v.type_id, v.data_offset, v.data_offset)
 
-        if v.bit_offset is not None:
-            s = s + '[{}]'.format(v.bit_offset)
+def hash_lookup(vfs: VfsDatabase, hash_code, default=None, prefix=''):
+    return AdfHashNames(vfs).comment(hash_code, default=default, prefix=prefix)
 
-        if v.data_offset != v.info_offset:
-            s = s + ', Info Offset: {}(0x{:08x})'.format(v.info_offset, v.info_offset)
 
-        value_info = s
-        s = ''
+def adf_format(v, vfs: VfsDatabase, type_map, indent=0):
+    names = AdfHashNames(vfs)
+    names.collect(v, type_map)
+    return ''.join(adf_format_lines(v, names, type_map, indent))
+
+
+def adf_format_lines(v, names: AdfHashNames, type_map, indent=0):
+    """
+    Text of adf_format in pieces, each up to and including a new line
+    """
+    line = adf_format_line(v, names, type_map, indent)
+    if line is not None:
+        if line:
+            yield line
+    elif isinstance(v, AdfValue):
+        type_def = type_map.get(v.type_id, adf_type_def_unknown)
+        value_info = adf_format_value_info(v, type_map)
         if v.type_id == 0xdefe88ed:
-            s = s + '  ' * indent + '# {}\n'.format(value_info)
-            s = s + adf_format(v.value, vfs, type_map, indent)
-        elif type_def.metatype is None or type_def.metatype == MetaType.Primative:
-            s = s + '  ' * indent + '{}  # {}\n'.format(v.value, value_info)
+            yield '  ' * indent + '# {}\n'.format(value_info)
+            yield from adf_format_lines(v.value, names, type_map, indent)
         elif type_def.metatype == MetaType.Structure:
-            s = s + '  ' * indent + '# ' + value_info + '\n'
-            s = s + '  ' * indent + '{\n'
+            yield '  ' * indent + '# ' + value_info + '\n'
+            yield '  ' * indent + '{\n'
             for k, iv in v.value.items():
-                s = s + '  ' * (indent + 1) + k + ':\n'
-                s = s + adf_format(iv, vfs, type_map, indent + 2)
+                yield '  ' * (indent + 1) + k + ':\n'
+                line = adf_format_line(iv, names, type_map, indent + 2)
+                if line is None:
+                    yield from adf_format_lines(iv, names, type_map, indent + 2)
+                elif line:
+                    yield line
                 # add details for equipment hashes
                 # if isinstance(iv.value, int) and k in adf_hash_fields:
                 if not hasattr(iv, 'value'):
                     pass
                 elif isinstance(iv.value, int):
-                    hs = hash_lookup(vfs, iv.value)
+                    hs = names.comment(iv.value)
                     if hs:
-                        s = s + '  ' * (indent + 2) + hs + '\n'
+                        yield '  ' * (indent + 2) + hs + '\n'
 
-            s = s + '  ' * indent + '}\n'
-        elif type_def.metatype == MetaType.Pointer:
-            s = s + '  ' * indent + '{}  # {}\n'.format(v.value, value_info)
+            yield '  ' * indent + '}\n'
         elif type_def.metatype in {MetaType.Array, MetaType.InlineArray}:
-            s = s + '  ' * indent + '# ' + value_info + '\n'
-            s = s + '  ' * indent + '[\n'
+            yield '  ' * indent + '# ' + value_info + '\n'
+            yield '  ' * indent + '[\n'
             for iv in v.value:
-                s = s + adf_format(iv, vfs, type_map, indent + 1)
-            s = s + '  ' * indent + ']\n'
+                line = adf_format_line(iv, names, type_map, indent + 1)
+                if line is None:
+                    yield from adf_format_lines(iv, names, type_map, indent + 1)
+                elif line:
+                    yield line
+            yield '  ' * indent + ']\n'
+    elif isinstance(v, list) and len(v) > 0 and isinstance(v[0], GdcArchiveEntry):
+        yield '  ' * indent + '[\n'
+        for ent in v:
+            comment = names.comment(ent, default='', prefix='  ')
+            yield '  ' * (indent + 1) + f'{ent}{comment}\n'
+        yield '  ' * indent + ']\n'
+
+
+def adf_format_value_info(v: AdfValue, type_map):
+    s = '{}(0x{:08X}), Data Offset: {}(0x{:08x})'.format(
+        adf_type_id_to_str(v.type_id, type_map), v.type_id, v.data_offset, v.data_offset)
+
+    if v.bit_offset is not None:
+        s = s + '[{}]'.format(v.bit_offset)
+
+    if v.data_offset != v.info_offset:
+        s = s + ', Info Offset: {}(0x{:08x})'.format(v.info_offset, v.info_offset)
+
+    return s
+
+
+def adf_format_line(v, names: AdfHashNames, type_map, indent):
+    """
+    The line of adf_format of values that take one line, '' for values that take none, None for structs, arrays,
+    deferred values and GDCC directories
+    """
+    if isinstance(v, AdfValue):
+        type_def = type_map.get(v.type_id, adf_type_def_unknown)
+        if v.type_id == 0xdefe88ed or \
+                type_def.metatype in {MetaType.Structure, MetaType.Array, MetaType.InlineArray}:
+            return None
+
+        value_info = adf_format_value_info(v, type_map)
+        if type_def.metatype is None or type_def.metatype == MetaType.Primative:
+            return '  ' * indent + '{}  # {}\n'.format(v.value, value_info)
+        elif type_def.metatype == MetaType.Pointer:
+            return '  ' * indent + '{}  # {}\n'.format(v.value, value_info)
         elif type_def.metatype == MetaType.String:
-            s = s + '  ' * indent + '{}  # {}\n'.format(v.value, value_info)
+            return '  ' * indent + '{}  # {}\n'.format(v.value, value_info)
         elif type_def.metatype == MetaType.Bitfield:
-            s = s + '  ' * indent + '{}  # {}\n'.format(v.value, value_info)
+            return '  ' * indent + '{}  # {}\n'.format(v.value, value_info)
         elif type_def.metatype == MetaType.Enumeration:
-            s = s + '  ' * indent + '{} ({})  # {}\n'.format(v.enum_string, v.value, value_info)
+            return '  ' * indent + '{} ({})  # {}\n'.format(v.enum_string, v.value, value_info)
         elif type_def.metatype == MetaType.StringHash:
             if type_def.size == 4:
                 vp = '0x{:08x}'.format(v.value)
                 hash_string = v.hash_string
                 if hash_string is None:
-                    name = vfs.hash_string_match(hash32=v.value)
-                    if len(name):
-                        hash_string = 'DB:"{}"'.format(name[0][1].decode('utf-8'))
+                    name = names.string_where_hash32(v.value)
+                    if name is not None:
+                        hash_string = 'DB:"{}"'.format(name)
                     else:
                         hash_string = 'Hash4:0x{:08x}'.format(v.value)
             elif type_def.size == 6:
                 vp = '0x{:012x}'.format(v.value)
                 hash_string = v.hash_string
                 if hash_string is None:
-                    name = vfs.hash_string_match(hash48=v.value & 0x0000FFFFFFFFFFFF)
-                    if len(name):
-                        hash_string = 'DB:"{}"'.format(name[0][1].decode('utf-8'))
+                    name = names.string_where_hash48(v.value & 0x0000FFFFFFFFFFFF)
+                    if name is not None:
+                        hash_string = 'DB:"{}"'.format(name)
                     else:
                         hash_string = 'Hash6:0x{:012x}'.format(v.value)
             elif type_def.size == 8:
                 vp = '0x{:016x}'.format(v.value)
                 hash_string = v.hash_string
                 if hash_string is None:
-                    name48 = vfs.hash_string_match(hash48=v.value & 0x0000FFFFFFFFFFFF)
-                    if len(name48):
-                        hash_string = 'DB:H6:"{}"'.format(name48[0][1].decode('utf-8'))
+                    name48 = names.string_where_hash48(v.value & 0x0000FFFFFFFFFFFF)
+                    if name48 is not None:
+                        hash_string = 'DB:H6:"{}"'.format(name48)
                     else:
-                        name64 = vfs.hash_string_match(hash48=v.value)
-                        if len(name64):
-                            hash_string = 'DB:H6:"{}"'.format(name64[0][1].decode('utf-8'))
+                        name64 = names.string_where_hash48(v.value)
+                        if name64 is not None:
+                            hash_string = 'DB:H6:"{}"'.format(name64)
                         else:
                             hash_string = 'Hash8:0x{:016x}'.format(v.value)
             else:
@@ -477,20 +605,13 @@ def adf_format(v, vfs: VfsDatabase, type_map, indent=0):
                 if hash_string is None:
                     hash_string = 'OTHER HASH {}'.format(type_def.size)
 
-            s = s + '  ' * indent + '{} ({})  # {}\n'.format(hash_string, vp, value_info)
+            return '  ' * indent + '{} ({})  # {}\n'.format(hash_string, vp, value_info)
 
-        return s
+        return ''
     elif isinstance(v, list) and len(v) > 0 and isinstance(v[0], GdcArchiveEntry):
-        s = ''
-        s = s + '  ' * indent + '[\n'
-        for ent in v:
-            comment = hash_lookup(vfs, ent, default='', prefix='  ')
-            s = s + '  ' * (indent + 1) + f'{ent}{comment}\n'
-        s = s + '  ' * indent + ']\n'
-
-        return s
+        return None
     else:
-        comment = hash_lookup(vfs, v, default='', prefix='  ')
+        comment = names.comment(v, default='', prefix='  ')
         return '  ' * indent + f'{v}{comment}\n'
 
 
@@ -508,6 +629,81 @@ def adf_value_extract(v):
         return v
 
 
+def read_gdcc_directory(buffer, buffer_pos):
+    try:
+        # TODO this should probably be it's own file type and the adf should be considered a wrapper
+        gdf_buffer = buffer[buffer_pos:]
+        gdf_n_buffer = len(gdf_buffer)
+        gdf_buffer_pos = 0
+
+        count, gdf_buffer_pos = ff_read_u32s(gdf_buffer, gdf_n_buffer, gdf_buffer_pos, 8)
+        assert count[0] == 32, f"{count[0]=}"
+        assert count[1] == 16, f"{count[1]=}"
+        assert count[2] == count[6], f"{count[2]=} {count[6]=}"
+        assert count[3] == 0, f"{count[3]=}"
+        # assert(count[4] == filesize +- k)
+        assert count[5] == 16, f"{count[5]=}"
+        assert count[6] == count[2], f"{count[2]=} {count[6]=}"
+        assert count[7] == 0, f"{count[7]=}"
+        dir_list = []
+        for i in range(count[2]):
+            d00_offset, gdf_buffer_pos = ff_read_u32(gdf_buffer, gdf_n_buffer, gdf_buffer_pos)
+            d04_unk, gdf_buffer_pos = ff_read_u32(gdf_buffer, gdf_n_buffer, gdf_buffer_pos)
+            d08_filetype_hash, gdf_buffer_pos = ff_read_u32(gdf_buffer, gdf_n_buffer, gdf_buffer_pos)
+            d12_unk, gdf_buffer_pos = ff_read_u32(gdf_buffer, gdf_n_buffer, gdf_buffer_pos)
+            d16_vpath_offset, gdf_buffer_pos = ff_read_u32(gdf_buffer, gdf_n_buffer, gdf_buffer_pos)
+            d20_unk, gdf_buffer_pos = ff_read_u32(gdf_buffer, gdf_n_buffer, gdf_buffer_pos)
+            d24_unk, gdf_buffer_pos = ff_read_u32(gdf_buffer, gdf_n_buffer, gdf_buffer_pos)
+            d28_unk, gdf_buffer_pos = ff_read_u32(gdf_buffer, gdf_n_buffer, gdf_buffer_pos)
+            assert (d04_unk == 16)
+            assert (d12_unk == 0)
+            assert (d20_unk == 16)
+            assert (d24_unk == 0)
+            assert (d28_unk == 0)
+            entry = [d00_offset, d16_vpath_offset, d08_filetype_hash, d04_unk, d12_unk, d20_unk, d24_unk, d28_unk]
+            dir_list.append(entry)
+
+        dir_contents = []
+        idx = 0
+        for e1 in dir_list:
+            # TODO something weird is going on with this second header, sometimes it makes sense, sometimes it may
+            # have floats? or indicate that is should be 24 byte long?
+            string_offset = e1[1]
+            ftype_hash = e1[2]
+
+            gdf_buffer_pos = string_offset
+            v_path, gdf_buffer_pos = ff_read_strz(gdf_buffer, gdf_n_buffer, gdf_buffer_pos)
+            v_hash = hash32_func(v_path)
+
+            if ftype_hash in {0xD74CC4CB}:  # RTPC read directly
+                # TODO this follows the data structure for an array of some type, 0xD74CC4CB is probably it's hash
+                gdf_buffer_pos = e1[0]
+                header2, gdf_buffer_pos = ff_read_u32s(gdf_buffer, gdf_n_buffer, gdf_buffer_pos, 4)
+                actual_offset = header2[0]
+                actual_size = header2[2]
+                adf_type_hash = None
+            else:  # TODO current guess is that it is a bare ADF instance
+                actual_offset = e1[0]
+                actual_size = None
+                adf_type_hash = ftype_hash
+
+            entry = GdcArchiveEntry(
+                index=idx,
+                offset=actual_offset,
+                size=actual_size,
+                v_hash=v_hash,
+                filetype_hash=ftype_hash,
+                adf_type_hash=adf_type_hash,
+                v_path=v_path)
+            dir_contents.append(entry)
+            idx += 1
+        return dir_contents
+    except:
+        print(f"ERROR: Failed to process gdc/global.gdcc")
+        return []
+
+
+# interpreter of the types, instances are read with the compiled plans of AdfTypePlans which give the same values
 def read_instance(
         buffer, n_buffer, buffer_pos, type_id, map_typedef, map_string_hash, abs_offset,
         bit_offset=None, found_strings=None):
@@ -579,77 +775,7 @@ def read_instance(
             v = AdfValue(v, type_id, dpos + abs_offset, v0[0] + abs_offset)
 
     elif type_id == 0x178842fe:  # gdc/global.gdcc
-        try:
-            # TODO this should probably be it's own file type and the adf should be considered a wrapper
-            gdf_buffer = buffer[buffer_pos:]
-            gdf_n_buffer = len(gdf_buffer)
-            gdf_buffer_pos = 0
-
-            count, gdf_buffer_pos = ff_read_u32s(gdf_buffer, gdf_n_buffer, gdf_buffer_pos, 8)
-            assert count[0] == 32, f"{count[0]=}"
-            assert count[1] == 16, f"{count[1]=}"
-            assert count[2] == count[6], f"{count[2]=} {count[6]=}"
-            assert count[3] == 0, f"{count[3]=}"
-            # assert(count[4] == filesize +- k)
-            assert count[5] == 16, f"{count[5]=}"
-            assert count[6] == count[2], f"{count[2]=} {count[6]=}"
-            assert count[7] == 0, f"{count[7]=}"
-            dir_list = []
-            for i in range(count[2]):
-                d00_offset, gdf_buffer_pos = ff_read_u32(gdf_buffer, gdf_n_buffer, gdf_buffer_pos)
-                d04_unk, gdf_buffer_pos = ff_read_u32(gdf_buffer, gdf_n_buffer, gdf_buffer_pos)
-                d08_filetype_hash, gdf_buffer_pos = ff_read_u32(gdf_buffer, gdf_n_buffer, gdf_buffer_pos)
-                d12_unk, gdf_buffer_pos = ff_read_u32(gdf_buffer, gdf_n_buffer, gdf_buffer_pos)
-                d16_vpath_offset, gdf_buffer_pos = ff_read_u32(gdf_buffer, gdf_n_buffer, gdf_buffer_pos)
-                d20_unk, gdf_buffer_pos = ff_read_u32(gdf_buffer, gdf_n_buffer, gdf_buffer_pos)
-                d24_unk, gdf_buffer_pos = ff_read_u32(gdf_buffer, gdf_n_buffer, gdf_buffer_pos)
-                d28_unk, gdf_buffer_pos = ff_read_u32(gdf_buffer, gdf_n_buffer, gdf_buffer_pos)
-                assert (d04_unk == 16)
-                assert (d12_unk == 0)
-                assert (d20_unk == 16)
-                assert (d24_unk == 0)
-                assert (d28_unk == 0)
-                entry = [d00_offset, d16_vpath_offset, d08_filetype_hash, d04_unk, d12_unk, d20_unk, d24_unk, d28_unk]
-                dir_list.append(entry)
-
-            dir_contents = []
-            idx = 0
-            for e1 in dir_list:
-                # TODO something weird is going on with this second header, sometimes it makes sense, sometimes it may
-                # have floats? or indicate that is should be 24 byte long?
-                string_offset = e1[1]
-                ftype_hash = e1[2]
-
-                gdf_buffer_pos = string_offset
-                v_path, gdf_buffer_pos = ff_read_strz(gdf_buffer, gdf_n_buffer, gdf_buffer_pos)
-                v_hash = hash32_func(v_path)
-
-                if ftype_hash in {0xD74CC4CB}:  # RTPC read directly
-                    # TODO this follows the data structure for an array of some type, 0xD74CC4CB is probably it's hash
-                    gdf_buffer_pos = e1[0]
-                    header2, gdf_buffer_pos = ff_read_u32s(gdf_buffer, gdf_n_buffer, gdf_buffer_pos, 4)
-                    actual_offset = header2[0]
-                    actual_size = header2[2]
-                    adf_type_hash = None
-                else:  # TODO current guess is that it is a bare ADF instance
-                    actual_offset = e1[0]
-                    actual_size = None
-                    adf_type_hash = ftype_hash
-
-                entry = GdcArchiveEntry(
-                    index=idx,
-                    offset=actual_offset,
-                    size=actual_size,
-                    v_hash=v_hash,
-                    filetype_hash=ftype_hash,
-                    adf_type_hash=adf_type_hash,
-                    v_path=v_path)
-                dir_contents.append(entry)
-                idx += 1
-            v = dir_contents
-        except:
-            print(f"ERROR: Failed to process gdc/global.gdcc")
-            v = []
+        v = read_gdcc_directory(buffer, buffer_pos)
 
     else:
         if type_id not in map_typedef:
@@ -803,6 +929,722 @@ def read_instance(
     return v, buffer_pos
 
 
+# compiled decoders, see AdfTypePlans
+
+# struct and numpy format of the primitive types
+adf_plan_primitives = {
+    typedef_s8: '<b',
+    typedef_u8: '<B',
+    typedef_s16: '<h',
+    typedef_u16: '<H',
+    typedef_s32: '<i',
+    typedef_u32: '<I',
+    typedef_s64: '<q',
+    typedef_u64: '<Q',
+    typedef_f32: '<f',
+    typedef_f64: '<d',
+}
+adf_plan_unsigned = {1: '<B', 2: '<H', 4: '<I', 8: '<Q'}
+
+# fixed layout types with more fields than this are decoded member by member
+adf_plan_layout_max_fields = 1024
+
+adf_plan_u4 = np.dtype('<u4')
+adf_plan_header_string = struct.Struct('<II')
+adf_plan_header_deferred = struct.Struct('<IIII')
+adf_plan_header_array = struct.Struct('<III')
+adf_plan_hash6 = struct.Struct('<HHH')
+
+
+def adf_plan_check(end, n_buffer):
+    if end > n_buffer:
+        raise FFError('ff_read: not enough data')
+
+
+class AdfPlan:
+    """
+    Decoder of one ADF type, compiled once from its TypeDef. Same values as read_instance and adf_value_extract.
+
+    decode reads one value at pos and returns (AdfValue tree, plain value, pos after the value). Types with a fixed
+    size header also have a layout, the numpy fields of that header relative to pos. build_columns makes the values
+    of many positions at once from the python values of those fields, one list per field in layout order, so arrays
+    of them are read with one frombuffer.
+    """
+    type_id = None
+    stride = None  # pos advance of one value, None if it depends on the data
+    layout = None  # [(numpy dtype, offset), ...]
+    dtype = None  # structured dtype of the layout with itemsize stride, for arrays
+
+    def finish(self):
+        if self.layout is not None and 0 < len(self.layout) <= adf_plan_layout_max_fields and self.stride > 0 and \
+                all(offset + dtype.itemsize <= self.stride for dtype, offset in self.layout):
+            self.dtype = np.dtype({
+                'names': ['f{}'.format(i) for i in range(len(self.layout))],
+                'formats': [dtype for dtype, _ in self.layout],
+                'offsets': [offset for _, offset in self.layout],
+                'itemsize': self.stride,
+            })
+        else:
+            self.layout = None
+            self.dtype = None
+
+    def decode(self, reader, buffer, n_buffer, pos, abs_offset):
+        raise NotImplementedError()
+
+    def build_columns(self, columns, reader, buffer, n_buffer, positions, abs_offset):
+        """
+        :param columns: iterator over the field value lists, the fields of this type are taken from it
+        :param positions: buffer positions of the values
+        :return: AdfValue trees, plain values
+        """
+        raise NotImplementedError()
+
+    def decode_array(self, reader, buffer, n_buffer, pos, count, abs_offset):
+        """
+        :return: AdfValue trees, plain values, pos after the last element
+        """
+        if count > 0 and self.dtype is not None and pos + count * self.stride <= n_buffer:
+            elements = np.frombuffer(buffer, self.dtype, count, pos)
+            columns = iter([elements[name].tolist() for name in self.dtype.names])
+            end = pos + count * self.stride
+            fulls, values = self.build_columns(
+                columns, reader, buffer, n_buffer, range(pos, end, self.stride), abs_offset)
+            return fulls, values, end
+
+        fulls = [None] * count
+        values = [None] * count
+        for i in range(count):
+            fulls[i], values[i], pos = self.decode(reader, buffer, n_buffer, pos, abs_offset)
+        return fulls, values, pos
+
+
+class AdfPlanRaise(AdfPlan):
+    # types read_instance fails on when it reaches them, like missing types
+    def __init__(self, type_id, make_exception):
+        self.type_id = type_id
+        self.make_exception = make_exception
+
+    def decode(self, reader, buffer, n_buffer, pos, abs_offset):
+        raise self.make_exception()
+
+
+class AdfPlanPrimitive(AdfPlan):
+    def __init__(self, type_id, fmt):
+        self.type_id = type_id
+        self.dtype_value = np.dtype(fmt)
+        self.unpack_from = struct.Struct(fmt).unpack_from
+        self.stride = self.dtype_value.itemsize
+        self.layout = [(self.dtype_value, 0)]
+        self.finish()
+
+    def decode(self, reader, buffer, n_buffer, pos, abs_offset):
+        end = pos + self.stride
+        adf_plan_check(end, n_buffer)
+        v = self.unpack_from(buffer, pos)[0]
+        return AdfValue(v, self.type_id, pos + abs_offset), v, end
+
+    def build_columns(self, columns, reader, buffer, n_buffer, positions, abs_offset):
+        values = next(columns)
+        type_id = self.type_id
+        return [AdfValue(v, type_id, p + abs_offset) for v, p in zip(values, positions)], values
+
+    def read_many(self, buffer, n_buffer, pos, count):
+        # elements of primitive arrays are plain values, 8 bit arrays are bytes
+        end = pos + count * self.stride
+        adf_plan_check(end, n_buffer)
+        if self.stride == 1:
+            return buffer[pos:end], end
+        return np.frombuffer(buffer, self.dtype_value, count, pos).tolist(), end
+
+
+class AdfPlanString(AdfPlan):
+    def __init__(self, type_id):
+        self.type_id = type_id
+        self.stride = adf_plan_header_string.size
+        self.layout = [(adf_plan_u4, 0), (adf_plan_u4, 4)]
+        self.finish()
+
+    def read(self, reader, buffer, n_buffer, pos, abs_offset, offset):
+        v, _ = ff_read_strz(buffer, n_buffer, offset)
+        if reader.found_strings is not None:
+            reader.found_strings.add(v)
+        return AdfValue(v, self.type_id, pos + abs_offset, offset + abs_offset), v
+
+    def decode(self, reader, buffer, n_buffer, pos, abs_offset):
+        adf_plan_check(pos + self.stride, n_buffer)
+        offset, length = adf_plan_header_string.unpack_from(buffer, pos)
+        return self.read(reader, buffer, n_buffer, pos, abs_offset, offset) + (pos + self.stride,)
+
+    def build_columns(self, columns, reader, buffer, n_buffer, positions, abs_offset):
+        offsets = next(columns)
+        next(columns)
+        results = [self.read(reader, buffer, n_buffer, p, abs_offset, o) for o, p in zip(offsets, positions)]
+        return [r[0] for r in results], [r[1] for r in results]
+
+
+class AdfPlanDeferred(AdfPlan):
+    def __init__(self, type_id):
+        self.type_id = type_id
+        self.stride = adf_plan_header_deferred.size
+        self.layout = [(adf_plan_u4, 0), (adf_plan_u4, 4), (adf_plan_u4, 8), (adf_plan_u4, 12)]
+        self.finish()
+
+    def read(self, reader, buffer, n_buffer, pos, abs_offset, offset, flags, type_id):
+        if offset == 0 or type_id == 0:
+            return None, None
+        try:
+            f, v, _ = reader.plan(type_id).decode(reader, buffer, n_buffer, offset, abs_offset)
+        except EDecaMissingAdfType as e:
+            f = v = f"!!!MISSING TYPE:  0x{e.type_id:08x} in 0x{type_id:08x}[{flags}]"
+        return AdfValue(f, self.type_id, pos + abs_offset, offset + abs_offset), v
+
+    def decode(self, reader, buffer, n_buffer, pos, abs_offset):
+        adf_plan_check(pos + self.stride, n_buffer)
+        offset, flags, type_id, _ = adf_plan_header_deferred.unpack_from(buffer, pos)
+        return self.read(reader, buffer, n_buffer, pos, abs_offset, offset, flags, type_id) + (pos + self.stride,)
+
+    def build_columns(self, columns, reader, buffer, n_buffer, positions, abs_offset):
+        offsets = next(columns)
+        flags = next(columns)
+        type_ids = next(columns)
+        next(columns)
+        results = [
+            self.read(reader, buffer, n_buffer, p, abs_offset, o, f, t)
+            for o, f, t, p in zip(offsets, flags, type_ids, positions)]
+        return [r[0] for r in results], [r[1] for r in results]
+
+
+class AdfPlanGdcc(AdfPlan):
+    def __init__(self, type_id):
+        self.type_id = type_id
+
+    def decode(self, reader, buffer, n_buffer, pos, abs_offset):
+        v = read_gdcc_directory(buffer, pos)
+        return v, list(v), pos
+
+
+class AdfPlanStructure(AdfPlan):
+    def __init__(self, type_def: TypeDef):
+        self.type_id = type_def.type_hash
+        self.stride = type_def.size
+        self.members = []  # [(name, plan, offset), ...]
+        self.names = []
+        self.member_index = {}
+
+    def finish(self):
+        self.names = [name for name, _, _ in self.members]
+        # a name used by several members is the last of them, like in the dict of decode
+        self.member_index = {name: i for i, name in enumerate(self.names)}
+        self.layout = []
+        for _, plan, offset in self.members:
+            if plan.layout is None:
+                self.layout = None
+                break
+            self.layout += [(dtype, offset + member_offset) for dtype, member_offset in plan.layout]
+        AdfPlan.finish(self)
+
+    def decode(self, reader, buffer, n_buffer, pos, abs_offset):
+        full = {}
+        value = {}
+        for name, plan, offset in self.members:
+            full[name], value[name], _ = plan.decode(reader, buffer, n_buffer, pos + offset, abs_offset)
+        return AdfValue(full, self.type_id, pos + abs_offset), value, pos + self.stride
+
+    def build_columns(self, columns, reader, buffer, n_buffer, positions, abs_offset):
+        if not self.members:
+            return [AdfValue({}, self.type_id, p + abs_offset) for p in positions], [{} for _ in positions]
+
+        member_fulls = []
+        member_values = []
+        for _, plan, offset in self.members:
+            fulls, values = plan.build_columns(
+                columns, reader, buffer, n_buffer, [p + offset for p in positions], abs_offset)
+            member_fulls.append(fulls)
+            member_values.append(values)
+
+        names = self.names
+        type_id = self.type_id
+        fulls = [AdfValue(dict(zip(names, v)), type_id, p + abs_offset) for v, p in zip(zip(*member_fulls), positions)]
+        values = [dict(zip(names, v)) for v in zip(*member_values)]
+        return fulls, values
+
+
+class AdfPlanPointer(AdfPlan):
+    def __init__(self, type_def: TypeDef):
+        self.type_id = type_def.type_hash
+        self.type_def = type_def
+        self.stride = 8
+        self.layout = [(np.dtype('<u8'), 0)]
+        self.unpack_from = struct.Struct('<Q').unpack_from
+        self.finish()
+
+    def read(self, v0):
+        return v0, 'NOTE: {}: {:016x} to {:08x}'.format(self.type_def.name, v0, self.type_def.element_type_hash)
+
+    def decode(self, reader, buffer, n_buffer, pos, abs_offset):
+        end = pos + self.stride
+        adf_plan_check(end, n_buffer)
+        v = self.read(self.unpack_from(buffer, pos)[0])
+        return v, v, end
+
+    def build_columns(self, columns, reader, buffer, n_buffer, positions, abs_offset):
+        values = [self.read(v0) for v0 in next(columns)]
+        return values, values
+
+
+class AdfPlanArray(AdfPlan):
+    def __init__(self, type_def: TypeDef):
+        self.type_id = type_def.type_hash
+        self.element = None
+        if type_def.metatype == MetaType.Array:
+            self.length = None
+            self.stride = adf_plan_header_array.size
+            self.layout = [(adf_plan_u4, 0), (adf_plan_u4, 4), (adf_plan_u4, 8)]
+        else:
+            self.length = type_def.element_length
+
+    def finish(self):
+        self.element_primitive = isinstance(self.element, AdfPlanPrimitive)
+        if self.length is not None:
+            # inline elements are part of the layout
+            element = self.element
+            if element.stride is None:
+                self.layout = None
+            else:
+                self.stride = self.length * element.stride
+                if self.element_primitive:
+                    if element.stride == 1:
+                        self.layout = [(np.dtype('V{}'.format(self.length)), 0)] if self.length > 0 else None
+                    else:
+                        self.layout = [(np.dtype((element.dtype_value, (self.length,))), 0)]
+                elif element.layout is not None and self.length * len(element.layout) <= adf_plan_layout_max_fields:
+                    self.layout = [
+                        (dtype, i * element.stride + offset)
+                        for i in range(self.length) for dtype, offset in element.layout]
+        AdfPlan.finish(self)
+
+    def read(self, reader, buffer, n_buffer, pos, abs_offset, offset, length):
+        if self.element_primitive:
+            v, end = self.element.read_many(buffer, n_buffer, offset, length)
+            value = v if self.element.stride == 1 else list(v)
+        else:
+            v, value, end = self.element.decode_array(reader, buffer, n_buffer, offset, length, abs_offset)
+        return AdfValue(v, self.type_id, pos + abs_offset, offset + abs_offset), value, end
+
+    def decode(self, reader, buffer, n_buffer, pos, abs_offset):
+        if self.length is None:
+            adf_plan_check(pos + self.stride, n_buffer)
+            offset, flags, length = adf_plan_header_array.unpack_from(buffer, pos)
+            full, value, _ = self.read(reader, buffer, n_buffer, pos, abs_offset, offset, length)
+            return full, value, pos + self.stride
+        else:
+            return self.read(reader, buffer, n_buffer, pos, abs_offset, pos, self.length)
+
+    def build_columns(self, columns, reader, buffer, n_buffer, positions, abs_offset):
+        type_id = self.type_id
+        if self.length is None:
+            offsets = next(columns)
+            next(columns)
+            lengths = next(columns)
+            results = [
+                self.read(reader, buffer, n_buffer, p, abs_offset, o, n)
+                for o, n, p in zip(offsets, lengths, positions)]
+            return [r[0] for r in results], [r[1] for r in results]
+        elif self.element_primitive:
+            v = next(columns)
+            fulls = [AdfValue(iv, type_id, p + abs_offset) for iv, p in zip(v, positions)]
+            return fulls, v if self.element.stride == 1 else [list(iv) for iv in v]
+        elif self.length == 0:
+            return [AdfValue([], type_id, p + abs_offset) for p in positions], [[] for _ in positions]
+        else:
+            element = self.element
+            element_fulls = []
+            element_values = []
+            for i in range(self.length):
+                fulls, values = element.build_columns(
+                    columns, reader, buffer, n_buffer, [p + i * element.stride for p in positions], abs_offset)
+                element_fulls.append(fulls)
+                element_values.append(values)
+            fulls = [AdfValue(list(v), type_id, p + abs_offset) for v, p in zip(zip(*element_fulls), positions)]
+            return fulls, [list(v) for v in zip(*element_values)]
+
+
+class AdfPlanBitfield(AdfPlan):
+    def __init__(self, type_def: TypeDef, bit_offset):
+        self.type_id = type_def.type_hash
+        self.bit_offset = bit_offset
+        self.element = AdfPlanPrimitive(None, adf_plan_unsigned[type_def.size])
+        self.stride = self.element.stride
+        self.layout = self.element.layout
+        self.finish()
+
+    def decode(self, reader, buffer, n_buffer, pos, abs_offset):
+        _, v, end = self.element.decode(reader, buffer, n_buffer, pos, abs_offset)
+        fulls, values = self.build_columns(iter([[v]]), reader, buffer, n_buffer, [pos], abs_offset)
+        return fulls[0], values[0], end
+
+    def build_columns(self, columns, reader, buffer, n_buffer, positions, abs_offset):
+        values = next(columns)
+        bit_offset = self.bit_offset
+        if bit_offset is None:
+            bit_offset = 0
+            for _ in values:
+                print('Missing bit offset')
+        values = [(v >> bit_offset) & 1 for v in values]
+        type_id = self.type_id
+        fulls = [AdfValue(v, type_id, p + abs_offset, bit_offset=bit_offset) for v, p in zip(values, positions)]
+        return fulls, values
+
+
+class AdfPlanEnumeration(AdfPlan):
+    def __init__(self, type_def: TypeDef):
+        self.type_id = type_def.type_hash
+        self.type_def = type_def
+        self.stride = 4
+        self.layout = [(adf_plan_u4, 0)]
+        self.unpack_from = struct.Struct('<I').unpack_from
+        self.finish()
+
+    def decode(self, reader, buffer, n_buffer, pos, abs_offset):
+        end = pos + self.stride
+        adf_plan_check(end, n_buffer)
+        fulls, values = self.build_columns(
+            iter([self.unpack_from(buffer, pos)]), reader, buffer, n_buffer, [pos], abs_offset)
+        return fulls[0], values[0], end
+
+    def build_columns(self, columns, reader, buffer, n_buffer, positions, abs_offset):
+        values = next(columns)
+        members = self.type_def.members
+        n_members = len(members)
+        type_id = self.type_id
+        fulls = [
+            AdfValue(v, type_id, p + abs_offset, enum_string=members[v].name if v < n_members else None)
+            for v, p in zip(values, positions)]
+        return fulls, values
+
+
+class AdfPlanStringHash(AdfPlan):
+    def __init__(self, type_def: TypeDef):
+        self.type_id = type_def.type_hash
+        self.stride = type_def.size
+        if self.stride == 4:
+            self.layout = [(adf_plan_u4, 0)]
+        elif self.stride == 6:
+            self.layout = [(np.dtype('<u2'), 0), (np.dtype('<u2'), 2), (np.dtype('<u2'), 4)]
+        elif self.stride == 8:
+            self.layout = [(np.dtype('<u8'), 0)]
+        elif self.stride > 0:
+            self.layout = [(np.dtype('V{}'.format(self.stride)), 0)]
+        self.finish()
+
+    def decode(self, reader, buffer, n_buffer, pos, abs_offset):
+        end = pos + self.stride
+        adf_plan_check(end, n_buffer)
+        if self.stride == 4:
+            columns = [[v] for v in struct.unpack_from('<I', buffer, pos)]
+        elif self.stride == 6:
+            columns = [[v] for v in adf_plan_hash6.unpack_from(buffer, pos)]
+        elif self.stride == 8:
+            columns = [[v] for v in struct.unpack_from('<Q', buffer, pos)]
+        else:
+            columns = [[buffer[pos:end]]]
+        fulls, values = self.build_columns(iter(columns), reader, buffer, n_buffer, [pos], abs_offset)
+        return fulls[0], values[0], end
+
+    def build_columns(self, columns, reader, buffer, n_buffer, positions, abs_offset):
+        type_id = self.type_id
+        if self.stride == 6:
+            values = [v0 << 32 | v1 << 16 | v2 for v0, v1, v2 in zip(next(columns), next(columns), next(columns))]
+        else:
+            values = next(columns)
+
+        if self.stride in {4, 6, 8}:
+            map_string_hash = reader.map_string_hash
+            fulls = [
+                AdfValue(v, type_id, p + abs_offset,
+                         hash_string=map_string_hash[v].value if v in map_string_hash else None)
+                for v, p in zip(values, positions)]
+        else:
+            fulls = [AdfValue(v, type_id, p + abs_offset) for v, p in zip(values, positions)]
+        return fulls, values
+
+
+class AdfPlanCompiler:
+    def __init__(self, plans, map_typedef):
+        self.plans_done = plans
+        self.plans = {}
+        self.map_typedef = map_typedef
+        self.missing = False
+
+    def compile(self, type_id, bit_offset=None):
+        type_def = None
+        key = type_id
+        if type_id not in adf_plan_primitives and type_id not in {0x8955583e, 0xdefe88ed, 0x178842fe}:
+            type_def = self.map_typedef.get(type_id)
+            if type_def is not None and type_def.metatype == MetaType.Bitfield:
+                key = (type_id, bit_offset)
+
+        plan = self.plans_done.get(key)
+        if plan is None:
+            plan = self.plans.get(key)
+        if plan is not None:
+            return plan
+
+        if type_id in adf_plan_primitives:
+            plan = AdfPlanPrimitive(type_id, adf_plan_primitives[type_id])
+        elif type_id == 0x8955583e:
+            plan = AdfPlanString(type_id)
+        elif type_id == 0xdefe88ed:  # deferred value
+            plan = AdfPlanDeferred(type_id)
+        elif type_id == 0x178842fe:  # gdc/global.gdcc
+            plan = AdfPlanGdcc(type_id)
+        elif type_def is None:
+            self.missing = True
+            plan = AdfPlanRaise(type_id, lambda: EDecaMissingAdfType(type_id))
+        elif type_def.metatype == MetaType.Primative:
+            plan = AdfPlanRaise(type_id, lambda: EDecaMissingAdfType(type_id))
+        elif type_def.metatype == MetaType.Structure:
+            plan = AdfPlanStructure(type_def)
+            self.plans[key] = plan
+            plan.members = [(m.name_utf8, self.compile(m.type_hash, m.bit_offset), m.offset) for m in type_def.members]
+            plan.finish()
+        elif type_def.metatype == MetaType.Pointer:
+            plan = AdfPlanPointer(type_def)
+        elif type_def.metatype in {MetaType.Array, MetaType.InlineArray}:
+            plan = AdfPlanArray(type_def)
+            self.plans[key] = plan
+            plan.element = self.compile(type_def.element_type_hash)
+            plan.finish()
+        elif type_def.metatype == MetaType.Bitfield:
+            if type_def.size in {1, 2, 4, 8}:
+                plan = AdfPlanBitfield(type_def, bit_offset)
+            else:
+                plan = AdfPlanRaise(type_id, lambda: Exception('Unknown bitfield size'))
+        elif type_def.metatype == MetaType.Enumeration:
+            if type_def.size == 4:
+                plan = AdfPlanEnumeration(type_def)
+            else:
+                plan = AdfPlanRaise(type_id, lambda: Exception('Unknown enum size'))
+        elif type_def.metatype == MetaType.StringHash:
+            plan = AdfPlanStringHash(type_def)
+        else:
+            metatype = type_def.metatype
+            plan = AdfPlanRaise(type_id, lambda: Exception('Unknown Typedef Type {}'.format(metatype)))
+
+        self.plans[key] = plan
+        return plan
+
+
+class AdfTypePlans:
+    """
+    Compiled decoders by type hash, shared by all reads of an AdfDatabase. Plans that reach a missing type are not
+    kept, the type may be found later.
+    """
+    def __init__(self):
+        self._plans = {}
+
+    def __len__(self):
+        return len(self._plans)
+
+    def clear(self):
+        self._plans.clear()
+
+    def plan(self, type_id, map_typedef) -> AdfPlan:
+        plan = self._plans.get(type_id)
+        if plan is None:
+            compiler = AdfPlanCompiler(self._plans, map_typedef)
+            plan = compiler.compile(type_id)
+            if not compiler.missing:
+                self._plans.update(compiler.plans)
+        return plan
+
+
+class AdfInstanceReader:
+    def __init__(self, type_plans: AdfTypePlans, map_typedef, map_string_hash, found_strings=None, type_missing=None):
+        """
+        :param type_missing: called with the type id of a missing type raised by a lazy value after the read
+        """
+        self.type_plans = type_plans
+        self.map_typedef = map_typedef
+        self.map_string_hash = map_string_hash
+        self.found_strings = found_strings
+        self.type_missing = type_missing
+        self._plans = {}
+
+    def type_missing_found(self, type_id):
+        if self.type_missing is not None:
+            self.type_missing(type_id)
+
+    def plan(self, type_id) -> AdfPlan:
+        plan = self._plans.get(type_id)
+        if plan is None:
+            plan = self.type_plans.plan(type_id, self.map_typedef)
+            self._plans[type_id] = plan
+        return plan
+
+    def read(self, buffer, buffer_pos, type_id, abs_offset):
+        """
+        Like read_instance followed by adf_value_extract
+        :return: AdfValue tree, plain value, pos after the instance
+        """
+        plan = self.plan(type_id)
+        # the values make no reference cycles, collections while the tree grows only traverse it again and again
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return plan.decode(self, buffer, len(buffer), buffer_pos, abs_offset)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def read_lazy(self, buffer, buffer_pos, type_id, abs_offset):
+        """
+        Like read, structs and arrays of non primitive elements are proxies that decode members when accessed
+        :return: AdfValue tree, plain value
+        """
+        return adf_lazy_decode(self, buffer, self.plan(type_id), buffer_pos, abs_offset)
+
+
+def adf_lazy_decode(reader: AdfInstanceReader, buffer, plan: AdfPlan, pos, abs_offset):
+    """
+    Value at pos as (AdfValue, plain value) where structs are AdfLazyStruct and arrays of non primitive elements are
+    AdfLazyArray. Missing types are raised when a value of the type is accessed, in deferred values only a missing
+    type of the value itself becomes the MISSING TYPE string.
+    """
+    type_id = plan.type_id
+    if isinstance(plan, AdfPlanStructure):
+        members = {}
+        return \
+            AdfValue(AdfLazyStruct(reader, buffer, plan, pos, abs_offset, True, members), type_id, pos + abs_offset), \
+            AdfLazyStruct(reader, buffer, plan, pos, abs_offset, False, members)
+    elif isinstance(plan, AdfPlanArray) and not plan.element_primitive and plan.element.stride is not None:
+        if plan.length is None:
+            adf_plan_check(pos + plan.stride, len(buffer))
+            offset, flags, length = adf_plan_header_array.unpack_from(buffer, pos)
+        else:
+            offset = pos
+            length = plan.length
+        elements = {}
+        element = plan.element
+        return \
+            AdfValue(
+                AdfLazyArray(reader, buffer, element, offset, length, abs_offset, True, elements),
+                type_id, pos + abs_offset, offset + abs_offset), \
+            AdfLazyArray(reader, buffer, element, offset, length, abs_offset, False, elements)
+    elif isinstance(plan, AdfPlanDeferred):
+        adf_plan_check(pos + plan.stride, len(buffer))
+        offset, flags, value_type_id, _ = adf_plan_header_deferred.unpack_from(buffer, pos)
+        if offset == 0 or value_type_id == 0:
+            return None, None
+        try:
+            f, v = adf_lazy_decode(reader, buffer, reader.plan(value_type_id), offset, abs_offset)
+        except EDecaMissingAdfType as e:
+            f = v = f"!!!MISSING TYPE:  0x{e.type_id:08x} in 0x{value_type_id:08x}[{flags}]"
+        return AdfValue(f, type_id, pos + abs_offset, offset + abs_offset), v
+    else:
+        full, value, _ = plan.decode(reader, buffer, len(buffer), pos, abs_offset)
+        return full, value
+
+
+class AdfLazyStruct(Mapping):
+    """
+    Members of a struct over the raw buffer, each decoded when it is first accessed. With full the members are
+    AdfValue like in table_instance_full_values, else plain values like in table_instance_values.
+    """
+    __slots__ = ('_reader', '_buffer', '_plan', '_pos', '_abs_offset', '_full', '_members')
+
+    def __init__(self, reader, buffer, plan: AdfPlanStructure, pos, abs_offset, full, members=None):
+        self._reader = reader
+        self._buffer = buffer
+        self._plan = plan
+        self._pos = pos
+        self._abs_offset = abs_offset
+        self._full = full
+        self._members = {} if members is None else members  # name -> (AdfValue, plain value), shared by both views
+
+    def __getitem__(self, name):
+        v = self._members.get(name)
+        if v is None:
+            _, plan, offset = self._plan.members[self._plan.member_index[name]]
+            try:
+                v = adf_lazy_decode(self._reader, self._buffer, plan, self._pos + offset, self._abs_offset)
+            except EDecaMissingAdfType as ae:
+                self._reader.type_missing_found(ae.type_id)
+                raise
+            self._members[name] = v
+        return v[0] if self._full else v[1]
+
+    def __iter__(self):
+        return iter(self._plan.member_index)
+
+    def __len__(self):
+        return len(self._plan.member_index)
+
+    def __repr__(self):
+        return 'AdfLazyStruct(0x{:08x} @ {})'.format(self._plan.type_id, self._pos + self._abs_offset)
+
+    def materialize(self):
+        # the dict read_instance or adf_value_extract makes of the struct
+        try:
+            full, value, _ = self._plan.decode(
+                self._reader, self._buffer, len(self._buffer), self._pos, self._abs_offset)
+        except EDecaMissingAdfType as ae:
+            self._reader.type_missing_found(ae.type_id)
+            raise
+        return full.value if self._full else value
+
+
+class AdfLazyArray(Sequence):
+    """
+    Elements of an array over the raw buffer, each decoded when it is first accessed, see AdfLazyStruct
+    """
+    __slots__ = ('_reader', '_buffer', '_plan', '_pos', '_length', '_abs_offset', '_full', '_elements')
+
+    def __init__(self, reader, buffer, plan: AdfPlan, pos, length, abs_offset, full, elements=None):
+        self._reader = reader
+        self._buffer = buffer
+        self._plan = plan
+        self._pos = pos
+        self._length = length
+        self._abs_offset = abs_offset
+        self._full = full
+        self._elements = {} if elements is None else elements  # index -> (AdfValue, plain value)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('AdfLazyArray index out of range')
+        v = self._elements.get(index)
+        if v is None:
+            try:
+                v = adf_lazy_decode(
+                    self._reader, self._buffer, self._plan, self._pos + index * self._plan.stride, self._abs_offset)
+            except EDecaMissingAdfType as ae:
+                self._reader.type_missing_found(ae.type_id)
+                raise
+            self._elements[index] = v
+        return v[0] if self._full else v[1]
+
+    def __len__(self):
+        return self._length
+
+    def __repr__(self):
+        return 'AdfLazyArray(0x{:08x}[{}] @ {})'.format(self._plan.type_id, self._length, self._pos + self._abs_offset)
+
+    def materialize(self):
+        # the list read_instance or adf_value_extract makes of the array
+        try:
+            fulls, values, _ = self._plan.decode_array(
+                self._reader, self._buffer, len(self._buffer), self._pos, self._length, self._abs_offset)
+        except EDecaMissingAdfType as ae:
+            self._reader.type_missing_found(ae.type_id)
+            raise
+        return fulls if self._full else values
+
+
 class Adf:
     def __init__(self):
         self.version = None
@@ -835,64 +1677,86 @@ class Adf:
         self.table_instance_values = []
 
     def dump_to_string(self, vfs):
-        sbuf = ''
-        sbuf = sbuf + '--------header\n'
-        sbuf = sbuf + '{}: {}\n'.format('version', self.version)
-        sbuf = sbuf + '{}: {}\n'.format('instance_count', self.instance_count)
-        sbuf = sbuf + '{}: {}\n'.format('instance_offset', self.instance_offset)
-        sbuf = sbuf + '{}: {}\n'.format('typedef_count', self.typedef_count)
-        sbuf = sbuf + '{}: {}\n'.format('typedef_offset', self.typedef_offset)
-        sbuf = sbuf + '{}: {}\n'.format('stringhash_count', self.stringhash_count)
-        sbuf = sbuf + '{}: {}\n'.format('stringhash_offset', self.stringhash_offset)
-        sbuf = sbuf + '{}: {}\n'.format('nametable_count', self.nametable_count)
-        sbuf = sbuf + '{}: {}\n'.format('nametable_offset', self.nametable_offset)
-        sbuf = sbuf + '{}: {}\n'.format('total_size', self.total_size)
+        return ''.join(self.dump_lines(vfs))
+
+    def dump_to(self, stream, vfs):
+        for line in self.dump_lines(vfs):
+            stream.write(line)
+
+    def dump_lines(self, vfs):
+        """
+        Text of dump_to_string line by line, each instance is formatted as its lines are taken
+        """
+        yield '--------header\n'
+        yield '{}: {}\n'.format('version', self.version)
+        yield '{}: {}\n'.format('instance_count', self.instance_count)
+        yield '{}: {}\n'.format('instance_offset', self.instance_offset)
+        yield '{}: {}\n'.format('typedef_count', self.typedef_count)
+        yield '{}: {}\n'.format('typedef_offset', self.typedef_offset)
+        yield '{}: {}\n'.format('stringhash_count', self.stringhash_count)
+        yield '{}: {}\n'.format('stringhash_offset', self.stringhash_offset)
+        yield '{}: {}\n'.format('nametable_count', self.nametable_count)
+        yield '{}: {}\n'.format('nametable_offset', self.nametable_offset)
+        yield '{}: {}\n'.format('total_size', self.total_size)
         for i in range(len(self.unknown)):
-            sbuf = sbuf + 'Unknown[{0}]: {1} 0x{1:08x}\n'.format(i, self.unknown[i])
+            yield 'Unknown[{0}]: {1} 0x{1:08x}\n'.format(i, self.unknown[i])
 
-        sbuf = sbuf + '\n--------comment\n'
-        sbuf = sbuf + self.comment.decode('utf-8')
+        yield '\n'
+        yield '--------comment\n'
+        yield from (self.comment.decode('utf-8') + '\n').splitlines(keepends=True)
 
-        sbuf = sbuf + '\n\n--------name_table\n'
-        # sbuf = sbuf + '  NOT CURRENTLY SHOWN\n'
+        yield '\n'
+        yield '--------name_table\n'
+        # yield '  NOT CURRENTLY SHOWN\n'
         for i in range(len(self.table_name)):
-            sbuf = sbuf + 'name_table\t{}\t{}\n'.format(i, self.table_name[i][1].decode('utf-8'))
+            yield 'name_table\t{}\t{}\n'.format(i, self.table_name[i][1].decode('utf-8'))
 
-        sbuf = sbuf + '\n--------string_hash\n'
-        # sbuf = sbuf + '  NOT CURRENTLY SHOWN\n'
+        yield '\n'
+        yield '--------string_hash\n'
+        # yield '  NOT CURRENTLY SHOWN\n'
         v: StringHash
         for k, v in self.map_stringhash.items():
-            sbuf = sbuf + 'string_hash\t{:016x}\t{}\n'.format(k, v.value)
+            yield 'string_hash\t{:016x}\t{}\n'.format(k, v.value)
 
-        sbuf = sbuf + '\n--------typedefs\n'
-        # sbuf = sbuf + '  NOT CURRENTLY SHOWN\n'
+        yield '\n'
+        yield '--------typedefs\n'
+        # yield '  NOT CURRENTLY SHOWN\n'
         vt: TypeDef
         for k, vt in self.map_typedef.items():
-            sbuf = sbuf + 'typedefs\t{:08x}\t{} @ {} (0x{:08x})\n'.format(
+            yield 'typedefs\t{:08x}\t{} @ {} (0x{:08x})\n'.format(
                 k, vt.name.decode('utf-8'), vt.META_position, vt.META_position)
-            sbuf = sbuf + dump_type(k, self.extended_map_typedef, 2)
+            yield from dump_type(k, self.extended_map_typedef, 2).splitlines(keepends=True)
 
-        sbuf = sbuf + '\n--------instances\n'
+        yield '\n'
+        yield '--------instances\n'
+        names = AdfHashNames(vfs)
         for info, v, fv in zip(self.table_instance, self.table_instance_values, self.table_instance_full_values):
             end_str = '{:08x}-???'.format(info.offset)
             if info.size is not None:
                 end_str = '{:08x}-{:08x}'.format(info.offset, info.offset + info.size)
 
-            sbuf = sbuf + 'instances\t{:08x}\t{:08x}\t{}\t{}\t{}\t{}\n'.format(
+            yield 'instances\t{:08x}\t{:08x}\t{}\t{}\t{}\t{}\n'.format(
                 info.name_hash,
                 info.type_hash,
                 info.name.decode('utf-8'),
                 info.offset, info.size,
                 end_str)
 
-            # sbuf = sbuf + pformat(v, width=1024) + '\n'
-            sbuf = sbuf + adf_format(fv, vfs, self.extended_map_typedef) + '\n'
-
-        return sbuf
-
-    def deserialize(self, fp, map_typedef=None, process_instances=True):
+            # yield pformat(v, width=1024) + '\n'
+            names.collect(fv, self.extended_map_typedef)
+            yield from adf_format_lines(fv, names, self.extended_map_typedef)
+            yield '\n'
+
+    def deserialize(self, fp, map_typedef=None, process_instances=True, type_plans=None, lazy=False, type_missing=None):
+        """
+        :param lazy: instances are AdfLazyStruct/AdfLazyArray over the instance buffers, decoded as accessed, only
+            strings of decoded values are in found_strings
+        :param type_missing: called with the type id of a missing type raised by a lazy instance when accessed
+        """
         if map_typedef is None:
             map_typedef = {}
+        if type_plans is None:
+            type_plans = AdfTypePlans()
 
         header = fp.read(0x40)
 
@@ -945,9 +1809,8 @@ class Adf:
         # typedef
         self.table_typedef = [TypeDef() for i in range(self.typedef_count)]
 
-        self.extended_map_typedef = {}
-        for k, v in map_typedef.items():
-            self.extended_map_typedef[k] = v
+        # types of this file on top of the known types, without copying the known types
+        self.extended_map_typedef = ChainMap({}, map_typedef)
 
         self.map_typedef = {}
         fp.seek(self.typedef_offset)
@@ -970,57 +1833,395 @@ class Adf:
         self.table_instance_values = [None] * len(self.table_instance)
         self.table_instance_full_values = [None] * len(self.table_instance)
         if process_instances:
+            reader = AdfInstanceReader(
+                type_plans, self.extended_map_typedef, self.map_stringhash, found_strings=self.found_strings,
+                type_missing=type_missing)
             for i in range(len(self.table_instance)):
                 ins = self.table_instance[i]
                 fp.seek(ins.offset)
                 buffer = fp.read(ins.size)
-                n_buffer = len(buffer)
-                buffer_pos = 0
-                v, buffer_pos = read_instance(
-                    buffer, n_buffer, buffer_pos,
-                    ins.type_hash, self.extended_map_typedef, self.map_stringhash, ins.offset,
-                    found_strings=self.found_strings)
-                self.table_instance_full_values[i] = v
-                self.table_instance_values[i] = adf_value_extract(v)
+                if lazy:
+                    full, value = reader.read_lazy(buffer, 0, ins.type_hash, ins.offset)
+                else:
+                    full, value, _ = reader.read(buffer, 0, ins.type_hash, ins.offset)
+                self.table_instance_full_values[i] = full
+                self.table_instance_values[i] = value
                 # except EDecaMissingAdfType as ae:
                 #     print('Missing HASHID {:08x}'.format(ae.hashid))
                 # except Exception as exp:
                 #     print(exp)
 
 
+# compact form of a TypeDef, little endian
+#   header: magic, version, metatype, size, alignment, type_hash, flags, element_type_hash, element_length,
+#           META_position (-1 for None)
+#   name: length (-1 for None), bytes
+#   members: count (-1 for None), then per member its name and
+#            Enumeration: value
+#            others: type_hash, size, offset, bit_offset, default_type, default_value
+typedef_pack_magic = b'ADFT'
+typedef_pack_version = 1
+typedef_pack_header = struct.Struct('<4sBIIIIIIIq')
+typedef_pack_length = struct.Struct('<i')
+typedef_pack_member = struct.Struct('<IIIIIQ')
+typedef_pack_enum = struct.Struct('<I')
+
+
+def typedef_pack_bytes(parts, value):
+    if value is None:
+        parts.append(typedef_pack_length.pack(-1))
+    else:
+        parts.append(typedef_pack_length.pack(len(value)))
+        parts.append(value)
+
+
+def typedef_unpack_bytes(buffer, pos):
+    n = typedef_pack_length.unpack_from(buffer, pos)[0]
+    pos += typedef_pack_length.size
+    if n < 0:
+        return None, pos
+    return bytes(buffer[pos:pos + n]), pos + n
+
+
+def typedef_pack(td: TypeDef):
+    parts = [typedef_pack_header.pack(
+        typedef_pack_magic, typedef_pack_version, td.metatype, td.size, td.alignment, td.type_hash, td.flags,
+        td.element_type_hash, td.element_length, -1 if td.META_position is None else td.META_position)]
+    typedef_pack_bytes(parts, td.name)
+    if td.members is None:
+        parts.append(typedef_pack_length.pack(-1))
+    else:
+        parts.append(typedef_pack_length.pack(len(td.members)))
+        for m in td.members:
+            typedef_pack_bytes(parts, m.name)
+            if td.metatype == MetaType.Enumeration:
+                parts.append(typedef_pack_enum.pack(m.value))
+            else:
+                parts.append(typedef_pack_member.pack(
+                    m.type_hash, m.size, m.offset, m.bit_offset, m.default_type, m.default_value))
+    return b''.join(parts)
+
+
+def typedef_unpack(buffer):
+    """
+    :param buffer: bytes like of typedef_pack, or a pickled TypeDef as saved by older versions
+    :return: TypeDef
+    """
+    if bytes(buffer[0:len(typedef_pack_magic)]) != typedef_pack_magic:
+        return pickle.loads(buffer)
+
+    td = TypeDef()
+    _, version, td.metatype, td.size, td.alignment, td.type_hash, td.flags, td.element_type_hash, \
+        td.element_length, td.META_position = typedef_pack_header.unpack_from(buffer, 0)
+    if version != typedef_pack_version:
+        raise EDecaErrorParse(f'Unknown packed ADF type version {version}')
+    if td.META_position < 0:
+        td.META_position = None
+    pos = typedef_pack_header.size
+    td.name, pos = typedef_unpack_bytes(buffer, pos)
+
+    count = typedef_pack_length.unpack_from(buffer, pos)[0]
+    pos += typedef_pack_length.size
+    if count >= 0:
+        td.members = []
+        for i in range(count):
+            name, pos = typedef_unpack_bytes(buffer, pos)
+            if td.metatype == MetaType.Enumeration:
+                m = EnumDef()
+                m.name = name
+                m.value = typedef_pack_enum.unpack_from(buffer, pos)[0]
+                pos += typedef_pack_enum.size
+            else:
+                m = MemberDef()
+                m.name = name
+                m.name_utf8 = None if name is None else name.decode('utf-8')
+                m.type_hash, m.size, m.offset, m.bit_offset, m.default_type, m.default_value = \
+                    typedef_pack_member.unpack_from(buffer, pos)
+                pos += typedef_pack_member.size
+            td.members.append(m)
+
+    return td
+
+
+# registry file: header, index of (type_hash, length, offset) sorted by type_hash, packed TypeDefs
+registry_magic = b'DECAADFR'
+registry_version = 1
+registry_header = struct.Struct('<8sII')
+registry_entry = struct.Struct('<IIQ')
+
+
+class AdfTypeRegistry(Mapping):
+    """
+    Read only map of type_hash -> TypeDef over a memory mapped registry file, the file is written once per version
+    of core_adf_types and shared by all processes, TypeDefs are unpacked on first use
+    """
+    def __init__(self, filename, version=None):
+        self.filename = filename
+        self.version = version
+        with open(filename, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, file_version, n_types = registry_header.unpack_from(self._mm, 0)
+        if magic != registry_magic or file_version != registry_version:
+            raise EDecaErrorParse(f'Not an ADF type registry: {filename}')
+        index_end = registry_header.size + n_types * registry_entry.size
+        self._index = {
+            type_hash: (offset, length)
+            for type_hash, length, offset in registry_entry.iter_unpack(self._mm[registry_header.size:index_end])}
+        self._type_defs = {}
+
+    @staticmethod
+    def write(filename, rows):
+        """
+        :param rows: (type_hash, packed or pickled TypeDef), the first row of a type_hash is used
+        """
+        blobs = {}
+        for type_hash, blob in rows:
+            if type_hash not in blobs:
+                if bytes(blob[0:len(typedef_pack_magic)]) != typedef_pack_magic:
+                    blob = typedef_pack(pickle.loads(blob))
+                blobs[type_hash] = blob
+
+        type_hashes = sorted(blobs)
+        offset = registry_header.size + len(type_hashes) * registry_entry.size
+        parts = [registry_header.pack(registry_magic, registry_version, len(type_hashes))]
+        for type_hash in type_hashes:
+            parts.append(registry_entry.pack(type_hash, len(blobs[type_hash]), offset))
+            offset += len(blobs[type_hash])
+        parts += [blobs[type_hash] for type_hash in type_hashes]
+
+        # written under a temporary name, other processes only ever see a complete file
+        filename_tmp = f'{filename}.{os.getpid()}.tmp'
+        with open(filename_tmp, 'wb') as f:
+            f.write(b''.join(parts))
+        try:
+            os.replace(filename_tmp, filename)
+        except PermissionError:
+            # windows, the file is already there and mapped by another process that wrote the same version
+            os.remove(filename_tmp)
+            if not os.path.isfile(filename):
+                raise
+
+    def __getitem__(self, type_hash):
+        td = self._type_defs.get(type_hash)
+        if td is None:
+            offset, length = self._index[type_hash]
+            td = typedef_unpack(self._mm[offset:offset + length])
+            self._type_defs[type_hash] = td
+        return td
+
+    def __contains__(self, type_hash):
+        return type_hash in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+
+# db filename -> AdfTypeRegistry, the latest version of the registry of each database in this process
+adf_type_registry_cache = {}
+
+
+def adf_type_registry_filename(db_dir, version):
+    return os.path.join(db_dir, 'adf_types_{}_{}_{:x}.bin'.format(*version))
+
+
+def adf_type_registry_open(filename, version):
+    # None if the file is missing, or was removed or is locked by another process while opening it
+    try:
+        return AdfTypeRegistry(filename, version)
+    except (FileNotFoundError, PermissionError):
+        return None
+
+
+def adf_type_registry_load(vfs: VfsDatabase, retries=3):
+    """
+    Registry of the ADF types in core_adf_types, reused while the types in the database are unchanged
+    """
+    version = vfs.adf_type_map_version()
+    registry = adf_type_registry_cache.get(vfs.db_filename)
+    if registry is not None and registry.version == version:
+        return registry
+
+    db_dir = os.path.dirname(vfs.db_filename)
+    filename = adf_type_registry_filename(db_dir, version)
+    registry = adf_type_registry_open(filename, version)
+    for i in range(retries):
+        if registry is not None:
+            break
+        # the file is named by the version of the rows written to it, types can be added after the version query
+        version, rows = vfs.adf_type_map_load_packed()
+        filename = adf_type_registry_filename(db_dir, version)
+        if not os.path.isfile(filename):
+            AdfTypeRegistry.write(filename, rows)
+        registry = adf_type_registry_open(filename, version)
+
+        # types are only added, registries up to an earlier rowid are out of date, later ones can be in use elsewhere
+        for fn in os.listdir(db_dir):
+            m = re.match(r'^adf_types_\d+_(\d+)_[0-9a-f]+\.bin$', fn)
+            if m is not None and int(m.group(1)) < version[1]:
+                try:
+                    os.remove(os.path.join(db_dir, fn))
+                except OSError:
+                    # still mapped by another process
+                    pass
+
+    if registry is None:
+        raise EDecaFileMissing(f'ADF type registry could not be opened: {filename}')
+
+    adf_type_registry_cache[vfs.db_filename] = registry
+    return registry
+
+
+# EXE scan file: header, (offset, size) of the ADFs, missing type hashes, (type_hash, length) and packed TypeDefs
+exe_scan_magic = b'DECAEXEA'
+exe_scan_version = 1
+exe_scan_header = struct.Struct('<8sIIII')
+exe_scan_sub_file = struct.Struct('<QI')
+exe_scan_type_missing = struct.Struct('<I')
+exe_scan_type = struct.Struct('<II')
+
+
+def exe_scan_save(filename, adf_sub_files, type_missing, map_typedef):
+    parts = [exe_scan_header.pack(
+        exe_scan_magic, exe_scan_version, len(adf_sub_files), len(type_missing), len(map_typedef))]
+    parts += [exe_scan_sub_file.pack(offset, size) for offset, size in adf_sub_files]
+    parts += [exe_scan_type_missing.pack(type_id) for type_id in sorted(type_missing)]
+    for type_hash, td in map_typedef.items():
+        blob = typedef_pack(td)
+        parts.append(exe_scan_type.pack(type_hash, len(blob)))
+        parts.append(blob)
+
+    filename_tmp = f'{filename}.{os.getpid()}.tmp'
+    with open(filename_tmp, 'wb') as f:
+        f.write(b''.join(parts))
+    os.replace(filename_tmp, filename)
+
+
+def exe_scan_load(filename):
+    """
+    :return: (adf_sub_files, type_missing, map_typedef) as saved by exe_scan_save, None if the file is not of this
+        version
+    """
+    with open(filename, 'rb') as f:
+        buffer = f.read()
+    if len(buffer) < exe_scan_header.size:
+        return None
+    magic, version, n_sub_files, n_type_missing, n_types = exe_scan_header.unpack_from(buffer, 0)
+    if magic != exe_scan_magic or version != exe_scan_version:
+        return None
+    pos = exe_scan_header.size
+
+    adf_sub_files = []
+    for i in range(n_sub_files):
+        adf_sub_files.append(exe_scan_sub_file.unpack_from(buffer, pos))
+        pos += exe_scan_sub_file.size
+
+    type_missing = set()
+    for i in range(n_type_missing):
+        type_missing.add(exe_scan_type_missing.unpack_from(buffer, pos)[0])
+        pos += exe_scan_type_missing.size
+
+    map_typedef = {}
+    for i in range(n_types):
+        type_hash, length = exe_scan_type.unpack_from(buffer, pos)
+        pos += exe_scan_type.size
+        map_typedef[type_hash] = typedef_unpack(buffer[pos:pos + length])
+        pos += length
+
+    return adf_sub_files, type_missing, map_typedef
+
+
 class AdfDatabase:
     def __init__(self, vfs=None):
-        self.type_map_def = {}
+        # types found since the load, over the shared registry of the database
+        self._type_map_new = {}
+        self.type_map_def = ChainMap(self._type_map_new)
         self.type_missing = set()
         self._type_map_updated = False
 
+        # decoders compiled from the types, by type hash
+        self.type_plans = AdfTypePlans()
+
         if vfs is not None:
             self.load_from_database(vfs)
 
     def has_type_map_changed(self):
         return self._type_map_updated
 
+    def type_map_changed_clear(self):
+        self._type_map_updated = False
+
+    def type_map_new_packed(self):
+        return {k: typedef_pack(v) for k, v in self._type_map_new.items()}
+
     def load_from_database(self, vfs: VfsDatabase):
-        self.type_map_def, self.type_missing = vfs.adf_type_map_load()
+        self._type_map_new = {}
+        self.type_map_def = ChainMap(self._type_map_new, adf_type_registry_load(vfs))
+        self.type_missing = vfs.adf_type_missing_load()
 
     def save_to_database(self, vfs: VfsDatabase):
-        vfs.adf_type_map_save(self.type_map_def, self.type_missing)
+        vfs.adf_type_map_save(self.type_map_new_packed(), self.type_missing)
+        self.type_map_changed_clear()
 
     def typedefs_add(self, map_typedefs):
         for k, v in map_typedefs.items():
             if k not in self.type_map_def:
-                self.type_map_def[k] = v
+                self._type_map_new[k] = v
                 self._type_map_updated = True
 
-    def process_adf_in_exe(self, exepath, node_uid):
-        self.type_map_def = {}
-
-        adf_sub_files = []
+    def process_adf_in_exe(self, exepath, node_uid, cache_dir=None):
+        """
+        Find the ADFs embedded in an EXE and add their types
+        :param cache_dir: if given, the scan is saved there keyed by the hash of the EXE and reused for the same EXE
+        :return: [(offset, size)] of the ADFs in the EXE
+        """
+        self._type_map_new = {}
+        self.type_map_def = ChainMap(self._type_map_new)
+
+        # an empty file can not be memory mapped, and has no ADFs
+        if os.path.getsize(exepath) == 0:
+            return []
+
+        with open(exepath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as exe:
+            scan = None
+            cache_filename = None
+            if cache_dir is not None:
+                # the scans of an EXE share a prefix by its file name, the one of an older build is removed
+                exe_name = os.fsencode(os.path.basename(exepath))
+                cache_prefix = 'exe_adf_{}_'.format(hashlib.sha1(exe_name).hexdigest()[:8])
+                cache_filename = os.path.join(cache_dir, cache_prefix + hashlib.sha1(exe).hexdigest() + '.bin')
+                if os.path.isfile(cache_filename):
+                    scan = exe_scan_load(cache_filename)
+
+            if scan is None:
+                scan = self._exe_scan(exe)
+                if cache_filename is not None:
+                    exe_scan_save(cache_filename, *scan)
+                    for fn in os.listdir(cache_dir):
+                        if fn.startswith(cache_prefix) and fn.endswith('.bin') and \
+                                fn != os.path.basename(cache_filename):
+                            try:
+                                os.remove(os.path.join(cache_dir, fn))
+                            except OSError:
+                                # removed by another process
+                                pass
+
+        adf_sub_files, type_missing, map_typedef = scan
+        for type_id in type_missing:
+            self.type_missing.add((type_id, node_uid))
+            self._type_map_updated = True
+        self.typedefs_add(map_typedef)
+        # TODO also add field strings to adf_db/vfs, combine adf_db and vfs into GAME DATABASE?
 
-        exe_stat = os.stat(exepath)
+        return adf_sub_files
 
-        with open(exepath, 'rb') as f:
-            exe = f.read(exe_stat.st_size)
+    def _exe_scan(self, exe):
+        # each ADF is parsed in place, reads only copy the ranges they need, types of earlier ADFs are known to later
+        adf_sub_files = []
+        type_missing = set()
+        map_typedef = {}
 
         poss = 0
         while True:
@@ -1028,30 +2229,29 @@ class AdfDatabase:
             if poss < 0:
                 break
 
-            exe_short = exe[poss:]
-            with ArchiveFile(BytesIO(exe_short)) as f:
+            with ArchiveFile(BufferFile(memoryview(exe)[poss:])) as f:
                 try:
                     adf = Adf()
-                    adf.deserialize(f, map_typedef=self.type_map_def)
+                    adf.deserialize(f, map_typedef=map_typedef, type_plans=self.type_plans)
 
                 except EDecaMissingAdfType as ae:
-                    self.type_missing.add((ae.type_id, node_uid))
-                    self._type_map_updated = True
+                    type_missing.add(ae.type_id)
 
             adf_sub_files.append((poss, adf.total_size))
 
-            self.typedefs_add(adf.map_typedef)
-            # TODO also add field strings to adf_db/vfs, combine adf_db and vfs into GAME DATABASE?
+            for k, v in adf.map_typedef.items():
+                map_typedef.setdefault(k, v)
 
-        return adf_sub_files
+        return adf_sub_files, type_missing, map_typedef
 
-    def _load_adf(self, buffer):
+    def _load_adf(self, buffer, lazy=False, type_missing=None):
         with ArchiveFile(io.BytesIO(buffer)) as fp:
             obj = Adf()
             try:
                 # import time
                 # t0 = time.time()
-                obj.deserialize(fp, self.type_map_def)
+                obj.deserialize(
+                    fp, self.type_map_def, type_plans=self.type_plans, lazy=lazy, type_missing=type_missing)
                 # t1 = time.time()
                 # print(f'Time ADF = {t1 - t0}')
 
@@ -1061,7 +2261,7 @@ class AdfDatabase:
             except EDecaErrorParse:
                 return None
 
-    def _load_adf_bare(self, buffer, adf_type, offset, size):
+    def _load_adf_bare(self, buffer, adf_type, offset, size, lazy=False, type_missing=None):
         if adf_type not in self.type_map_def:
             raise EDecaMissingAdfType(adf_type)
 
@@ -1087,42 +2287,55 @@ class AdfDatabase:
             obj.found_strings = set()
             obj.table_instance_values = [None] * len(obj.table_instance)
             obj.table_instance_full_values = [None] * len(obj.table_instance)
+            reader = AdfInstanceReader(
+                self.type_plans, obj.extended_map_typedef, obj.map_stringhash, found_strings=obj.found_strings,
+                type_missing=type_missing)
             for i in range(len(obj.table_instance)):
                 ins = obj.table_instance[i]
-                n_buffer = len(buffer)
-                buffer_pos = ins.offset
-                v, buffer_pos = read_instance(
-                    buffer, n_buffer, buffer_pos,
-                    ins.type_hash, obj.extended_map_typedef, obj.map_stringhash, 0, found_strings=obj.found_strings)
-                obj.table_instance_full_values[i] = v
-                obj.table_instance_values[i] = adf_value_extract(v)
+                if lazy:
+                    full, value = reader.read_lazy(buffer, ins.offset, ins.type_hash, 0)
+                else:
+                    full, value, _ = reader.read(buffer, ins.offset, ins.type_hash, 0)
+                obj.table_instance_full_values[i] = full
+                obj.table_instance_values[i] = value
 
             return obj
         except EDecaErrorParse:
             return None
 
-    def read_node(self, vfs: VfsDatabase, node: VfsNode):
+    def read_node(self, vfs: VfsDatabase, node: VfsNode, lazy=False):
+        """
+        :param lazy: instances are decoded as they are accessed, see Adf.deserialize
+        """
         with vfs.file_obj_from(node) as f:
             buffer = f.read()
 
+        def type_missing(type_id):
+            self.type_missing.add((type_id, node.uid))
+            self._type_map_updated = True
+
+        # lazy instances report the missing types they raise when accessed after the read
+        type_missing_lazy = type_missing if lazy else None
+
         try:
             if node.file_type == FTYPE_ADF_BARE:
-                adf = self._load_adf_bare(buffer, node.file_sub_type, node.offset, node.size_u)
+                adf = self._load_adf_bare(
+                    buffer, node.file_sub_type, node.offset, node.size_u, lazy=lazy, type_missing=type_missing_lazy)
             elif node.file_type == FTYPE_ADF0:
                 if node.file_sub_type is None:
                     adf_type = struct.unpack('I', buffer[4:8])[0]
                 else:
                     adf_type = node.file_sub_type
                 skip = 8  # skip magic and type id
-                adf = self._load_adf_bare(buffer[skip:], adf_type, 0, node.size_u - skip)
+                adf = self._load_adf_bare(
+                    buffer[skip:], adf_type, 0, node.size_u - skip, lazy=lazy, type_missing=type_missing_lazy)
             elif node.file_type == FTYPE_ADF5:
                 skip = 5
-                adf = self._load_adf(buffer[skip:])
+                adf = self._load_adf(buffer[skip:], lazy=lazy, type_missing=type_missing_lazy)
             else:
-                adf = self._load_adf(buffer)
+                adf = self._load_adf(buffer, lazy=lazy, type_missing=type_missing_lazy)
         except EDecaMissingAdfType as ae:
-            self.type_missing.add((ae.type_id, node.uid))
-            self._type_map_updated = True
+            type_missing(ae.type_id)
             raise
 
         return adf
@@ -0,0 +1,189 @@
+import csv
+import numpy as np
+from typing import Dict
+from deca.errors import EDecaMissingAdfType
+from deca.ff_adf import \
+    AdfLazyStruct, AdfLazyArray, AdfPlan, AdfPlanPrimitive, AdfPlanBitfield, AdfPlanEnumeration, AdfPlanStringHash, \
+    AdfPlanPointer, AdfPlanArray, AdfPlanStructure, adf_plan_check
+from deca.xlsxwriter_hack import DecaWorkBook
+
+# Columns of ADF arrays of structs, one numpy array per leaf member keyed by its path like 'Transform.Scale' or
+# 'Tags[2]'. Fixed size members are strided views of the buffer copied into typed arrays, inline arrays of primitives
+# are 2d columns, pointers are their raw values, string hashes also get a '.hash_string' column of the strings they
+# resolve to. Strings, arrays, deferred values and other variable size members are object columns of the plain values
+# of table_instance_values.
+
+
+def adf_column_path(path, name):
+    return name if not path else '{}.{}'.format(path, name)
+
+
+def adf_column_read(buffer, dtype, pos, stride, count):
+    if count == 0:
+        return np.zeros((0,) + dtype.shape, dtype=dtype.base)
+    adf_plan_check(pos + (count - 1) * stride + dtype.itemsize, len(buffer))
+    if dtype.shape:
+        shape = (count,) + dtype.shape
+        strides = (stride,) + tuple(np.zeros(dtype.shape, dtype.base).strides)
+    else:
+        shape = (count,)
+        strides = (stride,)
+    view = np.ndarray(shape, dtype=dtype.base, buffer=buffer, offset=pos, strides=strides)
+    return view.copy()
+
+
+def adf_column_hash_strings(map_string_hash, hashes):
+    # each distinct hash is looked up once
+    keys, inverse = np.unique(hashes, return_inverse=True)
+    strings = np.empty(len(keys), dtype=object)
+    for i, k in enumerate(keys.tolist()):
+        strings[i] = map_string_hash[k].value if k in map_string_hash else None
+    return strings[inverse.reshape(-1)]
+
+
+def adf_column_objects(values):
+    column = np.empty(len(values), dtype=object)
+    for i, v in enumerate(values):
+        column[i] = v
+    return column
+
+
+def adf_plan_columns(columns, reader, buffer, plan: AdfPlan, pos, stride, count, abs_offset, path, hash_strings):
+    """
+    Add the columns of the values of plan at pos, pos + stride, ... to columns
+    """
+    if isinstance(plan, AdfPlanStructure):
+        for name, member, offset in plan.members:
+            adf_plan_columns(
+                columns, reader, buffer, member, pos + offset, stride, count, abs_offset,
+                adf_column_path(path, name), hash_strings)
+    elif isinstance(plan, AdfPlanPrimitive):
+        columns[path] = adf_column_read(buffer, plan.dtype_value, pos, stride, count)
+    elif isinstance(plan, AdfPlanBitfield):
+        v = adf_column_read(buffer, plan.element.dtype_value, pos, stride, count)
+        columns[path] = ((v >> (plan.bit_offset or 0)) & 1).astype(np.uint8)
+    elif isinstance(plan, (AdfPlanEnumeration, AdfPlanPointer)):
+        columns[path] = adf_column_read(buffer, plan.layout[0][0], pos, stride, count)
+    elif isinstance(plan, AdfPlanStringHash) and plan.stride in {4, 6, 8}:
+        if plan.stride == 6:
+            v0, v1, v2 = [
+                adf_column_read(buffer, dtype, pos + offset, stride, count).astype(np.uint64)
+                for dtype, offset in plan.layout]
+            v = v0 << np.uint64(32) | v1 << np.uint64(16) | v2
+        else:
+            v = adf_column_read(buffer, plan.layout[0][0], pos, stride, count)
+        columns[path] = v
+        if hash_strings:
+            columns[path + '.hash_string'] = adf_column_hash_strings(reader.map_string_hash, v)
+    elif isinstance(plan, AdfPlanArray) and plan.length is not None and plan.stride is not None:
+        element = plan.element
+        if isinstance(element, AdfPlanPrimitive):
+            columns[path] = adf_column_read(
+                buffer, np.dtype((element.dtype_value, (plan.length,))), pos, stride, count)
+        else:
+            for i in range(plan.length):
+                adf_plan_columns(
+                    columns, reader, buffer, element, pos + i * element.stride, stride, count, abs_offset,
+                    '{}[{}]'.format(path, i), hash_strings)
+    else:
+        n_buffer = len(buffer)
+        columns[path] = adf_column_objects([
+            plan.decode(reader, buffer, n_buffer, p, abs_offset)[1]
+            for p in range(pos, pos + count * stride, stride)])
+
+
+def adf_columns(array: AdfLazyArray, hash_strings=True) -> Dict[str, np.ndarray]:
+    """
+    Columns of an array of structs read with lazy=True, one row per element
+    :param array: AdfLazyArray, like adf.table_instance_values[0]['Missions']
+    :param hash_strings: add the '.hash_string' columns of string hashes
+    :return: {column path: numpy array}, ordered like the members
+    """
+    plan = array._plan
+    columns = {}
+    try:
+        adf_plan_columns(
+            columns, array._reader, array._buffer, plan, array._pos, plan.stride, len(array), array._abs_offset,
+            '', hash_strings)
+    except EDecaMissingAdfType as ae:
+        array._reader.type_missing_found(ae.type_id)
+        raise
+    return columns
+
+
+def adf_struct_arrays(value: AdfLazyStruct, path=''):
+    """
+    All arrays of structs in value and its nested structs, not the ones inside of arrays or deferred values
+    :return: generator of (path, AdfLazyArray)
+    """
+    for name, plan, _ in value._plan.members:
+        if isinstance(plan, AdfPlanStructure) or \
+                (isinstance(plan, AdfPlanArray) and isinstance(plan.element, AdfPlanStructure)):
+            v = value[name]
+            if isinstance(v, AdfLazyStruct):
+                yield from adf_struct_arrays(v, adf_column_path(path, name))
+            elif isinstance(v, AdfLazyArray):
+                yield adf_column_path(path, name), v
+
+
+def adf_columns_flat(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    # 2d columns of inline arrays split into one column per element
+    flat = {}
+    for path, column in columns.items():
+        if column.ndim == 1:
+            flat[path] = column
+        else:
+            for i in range(column.shape[1]):
+                flat['{}[{}]'.format(path, i)] = column[:, i]
+    return flat
+
+
+def adf_cell(v):
+    if isinstance(v, bytes):
+        return v.decode('utf-8', errors='replace')
+    return v
+
+
+def adf_columns_save_npz(filename, tables: Dict[str, Dict[str, np.ndarray]]):
+    """
+    Save tables of columns with np.savez_compressed, keys are '<table>/<column path>'. Columns of strings are fixed
+    size byte strings, other object columns need np.load(..., allow_pickle=True)
+    """
+    arrays = {}
+    for table, columns in tables.items():
+        for path, column in columns.items():
+            if column.dtype == object and all(isinstance(v, bytes) for v in column.tolist()):
+                column = column.astype(np.bytes_)
+            arrays['{}/{}'.format(table, path)] = column
+    np.savez_compressed(filename, **arrays)
+
+
+def adf_columns_save_csv(filename, columns: Dict[str, np.ndarray]):
+    columns = adf_columns_flat(columns)
+    with open(filename, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns.keys())
+        for row in zip(*[column.tolist() for column in columns.values()]):
+            writer.writerow([adf_cell(v) for v in row])
+
+
+def adf_columns_save_xlsx(filename, tables: Dict[str, Dict[str, np.ndarray]]):
+    """
+    Save tables of columns to one worksheet each, object columns that are not strings are written as their repr
+    """
+    book = DecaWorkBook(filename, {'nan_inf_to_errors': True})
+    for table, columns in tables.items():
+        columns = adf_columns_flat(columns)
+        worksheet = book.add_worksheet(table)
+        for c, (path, column) in enumerate(columns.items()):
+            worksheet.write_string(0, c, path)
+            if column.dtype == object:
+                cells = [adf_cell(v) for v in column.tolist()]
+                cells = [v if v is None or isinstance(v, str) else repr(v) for v in cells]
+            elif column.dtype.kind in 'iub' and column.dtype.itemsize == 8:
+                # beyond the 53 bits excel keeps, like 64 bit hashes
+                cells = [str(v) for v in column.tolist()]
+            else:
+                cells = column.tolist()
+            worksheet.write_column(1, c, cells)
+    book.close()
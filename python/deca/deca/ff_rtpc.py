@@ -93,49 +93,17 @@ h_prop_deca_cpoi_desc = 0xe6b6b3f9
 class FieldNameMap:
     def __init__(self, vfs: VfsDatabase):
         self._vfs = vfs
-        self._h32_dict = {}
-        self._h48_dict = {}
-        self._h64_dict = {}
+        self._resolver = vfs.hash_string_resolver()
 
     def lookup(self, hash32=None, hash48=None, hash64=None) -> Optional[str]:
         if hash32 is not None:
-            v = self._h32_dict.get(hash32, ())
-            if v != ():
-                return v
-            else:
-                v = self._vfs.hash_string_match(hash32=hash32)
-                if len(v) > 0:
-                    v = v[0][1].decode('utf-8')
-                else:
-                    v = None
-                self._h32_dict[hash32] = v
-                return v
+            return self._resolver.string_where_hash32(hash32)
 
         if hash48 is not None:
-            v = self._h48_dict.get(hash48, ())
-            if v != ():
-                return v
-            else:
-                v = self._vfs.hash_string_match(hash48=hash48)
-                if len(v) > 0:
-                    v = v[0][1].decode('utf-8')
-                else:
-                    v = None
-                self._h48_dict[hash48] = v
-                return v
+            return self._resolver.string_where_hash48(hash48)
 
         if hash64 is not None:
-            v = self._h64_dict.get(hash64, ())
-            if v != ():
-                return v
-            else:
-                v = self._vfs.hash_string_match(hash64=hash64)
-                if len(v) > 0:
-                    v = v[0][1].decode('utf-8')
-                else:
-                    v = None
-                self._h64_dict[hash64] = v
-                return v
+            return self._resolver.string_where_hash64(hash64)
 
         return None
 
@@ -431,21 +399,22 @@ def rtpc_prop_to_string(prop0, hash_lookup: FieldNameMap):
     # return '0x{:08x}: {} = {}'.format(self.name_hash, PropType.type_names[self.type], self.data,)
 
 
-def rtpc_node_to_string(node: RtpcNode, hash_lookup: FieldNameMap, indent=0):
+def rtpc_node_lines(node: RtpcNode, hash_lookup: FieldNameMap, indent=0):
     ind0 = ' ' * indent
     ind1 = ' ' * (indent + 2)
     ind2 = ' ' * (indent + 4)
-    sbuf = ''
-    sbuf = sbuf + ind0 + 'node:\n'
-    sbuf = sbuf + ind1 + node.repr_with_name(hash_lookup) + '\n'
-    sbuf = sbuf + ind1 + 'properties ---------------\n'
+    yield ind0 + 'node:\n'
+    yield ind1 + node.repr_with_name(hash_lookup) + '\n'
+    yield ind1 + 'properties ---------------\n'
     for p in node.prop_table:
-        sbuf = sbuf + ind2 + rtpc_prop_to_string(p, hash_lookup) + '\n'
-    sbuf = sbuf + ind1 + 'children -----------------\n'
+        yield ind2 + rtpc_prop_to_string(p, hash_lookup) + '\n'
+    yield ind1 + 'children -----------------\n'
     for c in node.child_table:
-        sbuf = sbuf + rtpc_node_to_string(c, hash_lookup, indent + 4)
+        yield from rtpc_node_lines(c, hash_lookup, indent + 4)
+
 
-    return sbuf
+def rtpc_node_to_string(node: RtpcNode, hash_lookup: FieldNameMap, indent=0):
+    return ''.join(rtpc_node_lines(node, hash_lookup, indent))
 
 
 def rtpc_to_string(rtpc: Rtpc, vfs):
@@ -580,7 +549,10 @@ class RtpcVisitor:
 
         return pos
 
-    def visit_node(self, bufn, pos, index):
+    def visit_node_iter(self, bufn, pos, index):
+        """
+        visit_node as a generator, the callbacks run as it is advanced, it yields after the properties of each node
+        """
         node_start_pos = pos
 
         name_hash, pos = ff_read_u32(bufn, pos)
@@ -600,6 +572,7 @@ class RtpcVisitor:
         for i in range(prop_count):
             pos = self.visit_prop(bufn, pos, i)
         self.props_end(bufn, pos, prop_count)
+        yield
 
         # read children
         #  children 4-byte aligned
@@ -607,14 +580,22 @@ class RtpcVisitor:
         pos = pos + (4 - (pos % 4)) % 4
         self.children_start(bufn, pos, child_count)
         for i in range(child_count):
-            pos = self.visit_node(bufn, pos, i)
+            pos = yield from self.visit_node_iter(bufn, pos, i)
         self.children_end(bufn, pos, child_count)
 
         self.node_end(bufn, node_start_pos, index, node_info)
 
         return end_header_pos
 
-    def visit(self, buffer):
+    def visit_node(self, bufn, pos, index):
+        nodes = self.visit_node_iter(bufn, pos, index)
+        while True:
+            try:
+                next(nodes)
+            except StopIteration as stop:
+                return stop.value
+
+    def visit_iter(self, buffer):
         pos = 0
         n_buffer = len(buffer)
         bufn = (buffer, n_buffer)
@@ -624,15 +605,24 @@ class RtpcVisitor:
 
         version, pos = ff_read_u32(bufn, pos)
 
-        self.visit_node(bufn, pos, 0)
+        yield from self.visit_node_iter(bufn, pos, 0)
+
+    def visit(self, buffer):
+        for _ in self.visit_iter(buffer):
+            pass
 
 
 class RtpcVisitorDumpToString(RtpcVisitor):
-    def __init__(self, vfs: VfsDatabase):
+    def __init__(self, vfs: VfsDatabase, stream=None):
+        """
+        :param stream: lines are written to stream as they are made instead of kept for result
+        """
         super(RtpcVisitorDumpToString, self).__init__()
         self.hash_lookup = FieldNameMap(vfs)
+        self._stream = stream
         self._result = None
         self._lines = []
+        self._line_count = 0
         self._depth = -1
         self._ind0 = None
         self._ind1 = None
@@ -642,6 +632,17 @@ class RtpcVisitorDumpToString(RtpcVisitor):
         self._result = '\n'.join(self._lines)
         return self._result
 
+    def lines(self):
+        return self._lines
+
+    def _line(self, line):
+        if self._stream is None:
+            self._lines.append(line)
+        else:
+            # lines are separated by new lines like in result
+            self._stream.write(line if self._line_count == 0 else '\n' + line)
+        self._line_count += 1
+
     def process_depth(self):
         self._ind0 = ' ' * self._depth
         self._ind1 = ' ' * (self._depth + 2)
@@ -650,9 +651,25 @@ class RtpcVisitorDumpToString(RtpcVisitor):
     def visit(self, buffer):
         self._result = ''
         self._lines = []
+        self._line_count = 0
         self._depth = -2
         super(RtpcVisitorDumpToString, self).visit(buffer)
 
+    def visit_lines(self, buffer):
+        """
+        Lines of the dump as they are taken, the nodes are visited as needed instead of all lines made first
+        """
+        self._result = ''
+        self._lines = []
+        self._line_count = 0
+        self._depth = -2
+        for _ in self.visit_iter(buffer):
+            lines = self._lines
+            self._lines = []
+            yield from lines
+        yield from self._lines
+        self._lines = []
+
     def node_start(self, bufn, pos, index, node_info):
         self._depth += 2
         self.process_depth()
@@ -667,15 +684,15 @@ class RtpcVisitorDumpToString(RtpcVisitor):
         node_info_str = 'n:{} pc:{} cc:{} @ {} {:08x}'.format(
             name, prop_count, child_count, data_offset, data_offset)
 
-        self._lines.append(self._ind0 + 'node:')
-        self._lines.append(self._ind1 + node_info_str)
+        self._line(self._ind0 + 'node:')
+        self._line(self._ind1 + node_info_str)
 
     def node_end(self, bufn, pos, index, node_info):
         self._depth -= 2
         self.process_depth()
 
     def children_start(self, bufn, pos, count):
-        self._lines.append(self._ind1 + 'children -----------------')
+        self._line(self._ind1 + 'children -----------------')
         self._depth += 2
         self.process_depth()
 
@@ -684,12 +701,12 @@ class RtpcVisitorDumpToString(RtpcVisitor):
         self.process_depth()
 
     def props_start(self, bufn, pos, count):
-        self._lines.append(self._ind1 + 'properties ---------------')
+        self._line(self._ind1 + 'properties ---------------')
 
     def prop_start(self, bufn, pos, index, prop_info):
         prop = (*prop_info, *parse_prop_data(bufn, prop_info))
 
-        self._lines.append(self._ind2 + rtpc_prop_to_string(prop, self.hash_lookup))
+        self._line(self._ind2 + rtpc_prop_to_string(prop, self.hash_lookup))
 
 
 class RtpcVisitorGatherStrings(RtpcVisitor):
@@ -42,6 +42,44 @@ class SubsetFile:
         return self.f.write(blk)
 
 
+class BufferFile:
+    # read only file over a buffer (bytes, bytearray, memoryview), reads only copy the requested range
+    def __init__(self, buffer):
+        self.buffer = memoryview(buffer)
+        self.pos = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, t, value, traceback):
+        self.close()
+
+    def close(self):
+        # lets go of the buffer, like a memory map that is closed next
+        self.buffer.release()
+
+    def seek(self, pos, whence=0):
+        if whence == 1:
+            pos = self.pos + pos
+        elif whence == 2:
+            pos = len(self.buffer) + pos
+        self.pos = max(0, pos)
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def read(self, n=None):
+        bpos = self.pos
+        if n is None or n < 0:
+            epos = len(self.buffer)
+        else:
+            epos = min(bpos + n, len(self.buffer))
+        epos = max(bpos, epos)
+        self.pos = epos
+        return bytes(self.buffer[bpos:epos])
+
+
 class ArchiveFile:
     def __init__(self, f, debug=False, endian=None):
         self.f0 = f
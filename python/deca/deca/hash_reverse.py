@@ -0,0 +1,273 @@
+import os
+import re
+import time
+import string
+import numpy as np
+from numba import njit, prange
+from collections import Counter
+from deca.hashes import hashlittle2, murmur3_x64_128, hash32_func, strings_pack
+from deca.db_types import node_flag_v_hash_type_4, node_flag_v_hash_type_8
+from deca.db_wrap import DbWrap
+from deca.db_commands import Processor, LogWrapper
+
+'''
+Offline reversal of unmatched v_hashes
+
+Candidate names are generated from templates like '{prefix}{word}_{nn:02d}.{ext}', each field is replaced by every
+token of its kind, tokens are mined from the strings already in core_strings. Fields that are not token kinds are
+numbers from 0 to number_count - 1, formatted with the field's format spec. Candidates are hashed with numba on all
+cores, hits are proposed as strings and then matched to nodes by process_vhash_final.
+
+Jobs and their tokens are stored in core_hash_reverse_jobs, a stopped run resumes where it stopped.
+'''
+
+re_token_word = re.compile(rb'^[a-z0-9_\-]+$')
+
+
+def tokens_mine(strings, max_tokens=1000):
+    """
+    Mine template tokens from file names
+    :param strings: file name strings (bytes)
+    :param max_tokens: max tokens of each kind, the most common are kept
+    :return: dict of token kind -> list of tokens (bytes)
+    """
+    prefixes = Counter()
+    words = Counter()
+    exts = Counter()
+    for s in strings:
+        if s.find(b'/') < 0 and s.find(b'.') < 0:
+            continue
+
+        path, fn = os.path.split(s)
+        while len(path) > 0:
+            prefixes[path + b'/'] += 1
+            path = os.path.dirname(path)
+
+        stem, ext = os.path.splitext(fn)
+        if len(ext) > 1 and re_token_word.match(ext[1:]):
+            exts[ext[1:]] += 1
+
+        stem = stem.rstrip(b'0123456789_')
+        if len(stem) > 0 and re_token_word.match(stem):
+            words[stem] += 1
+            for part in stem.split(b'_'):
+                part = part.rstrip(b'0123456789')
+                if len(part) > 0:
+                    words[part] += 1
+
+    return {
+        'prefix': [t for t, _ in prefixes.most_common(max_tokens)],
+        'word': [t for t, _ in words.most_common(max_tokens)],
+        'ext': [t for t, _ in exts.most_common(max_tokens)],
+    }
+
+
+class HashReverseTemplate:
+    def __init__(self, template, tokens, number_count=100):
+        self.template = template
+        self.slots = []
+        for literal, field, spec, conversion in string.Formatter().parse(template):
+            if literal:
+                self.slots.append([literal.encode('ascii')])
+            if field is None:
+                continue
+            if field in tokens:
+                self.slots.append(list(tokens[field]))
+            else:
+                self.slots.append([format(v, spec).encode('ascii') for v in range(number_count)])
+
+        self.slot_counts = np.array([len(slot) for slot in self.slots], dtype=np.int64)
+        self.n_candidates = int(np.prod(self.slot_counts)) if len(self.slots) > 0 else 0
+        self.max_len = sum([max([len(t) for t in slot], default=0) for slot in self.slots])
+
+        buffer, offsets = strings_pack([t for slot in self.slots for t in slot])
+        if len(buffer) == 0:
+            buffer = np.zeros(1, dtype=np.uint8)
+        self.buffer = buffer
+        self.offsets = offsets
+        self.slot_begin = np.zeros(len(self.slots), dtype=np.int64)
+        np.cumsum(self.slot_counts[:-1], out=self.slot_begin[1:])
+
+    def candidate(self, index):
+        # the last slot changes fastest, same order as template_hash_search
+        parts = []
+        for slot in reversed(self.slots):
+            index, digit = divmod(index, len(slot))
+            parts.append(slot[digit])
+        return b''.join(reversed(parts))
+
+    def search(self, begin, end, targets, hash_type):
+        if hash_type == node_flag_v_hash_type_4:
+            hash_size = 4
+        elif hash_type == node_flag_v_hash_type_8:
+            hash_size = 8
+        else:
+            raise NotImplementedError('Unhandled Hash Type {}'.format(hash_type))
+
+        if self.n_candidates == 0 or len(targets) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        return template_hash_search(
+            self.buffer, self.offsets, self.slot_begin, self.slot_counts, begin, end, targets, hash_size,
+            max(self.max_len, 1))
+
+
+@njit(parallel=True)
+def template_hash_search(buffer, offsets, slot_begin, slot_counts, begin, end, targets, hash_size, max_len):
+    """
+    Hash template candidates begin to end-1, targets is a sorted int64 array of hashes to find
+    :return: indexes of the candidates with a hash in targets
+    """
+    block_size = 4096
+    n = end - begin
+    n_slots = len(slot_counts)
+    n_blocks = (n + block_size - 1) // block_size
+    hit = np.zeros(n, dtype=np.bool_)
+    for bi in prange(n_blocks):
+        data = np.empty(max_len, dtype=np.uint8)
+        digits = np.empty(n_slots, dtype=np.int64)
+
+        index = begin + bi * block_size
+        for s in range(n_slots - 1, -1, -1):
+            digits[s] = index % slot_counts[s]
+            index = index // slot_counts[s]
+
+        i_end = min(n, (bi + 1) * block_size)
+        for i in range(bi * block_size, i_end):
+            pos = 0
+            for s in range(n_slots):
+                t = slot_begin[s] + digits[s]
+                for j in range(offsets[t], offsets[t + 1]):
+                    data[pos] = buffer[j]
+                    pos += 1
+
+            if hash_size == 4:
+                c, b = hashlittle2(data[:pos], 0, 0)
+                h = np.int64(c)
+            else:
+                h1, h2 = murmur3_x64_128(data[:pos], 0)
+                h = np.int64(h1)
+
+            k = np.searchsorted(targets, h)
+            if k < len(targets) and targets[k] == h:
+                hit[i] = True
+
+            # next candidate, the last slot changes fastest
+            for s in range(n_slots - 1, -1, -1):
+                digits[s] += 1
+                if digits[s] < slot_counts[s]:
+                    break
+                digits[s] = 0
+
+    return np.nonzero(hit)[0].astype(np.int64) + begin
+
+
+class HashReverser:
+    def __init__(self, vfs, logger, chunk_size=1 << 24, number_count=100, max_tokens=1000):
+        """
+        :param vfs: VfsProcessor of the project
+        :param chunk_size: candidates per work unit, progress is saved after each work unit
+        :param number_count: numeric fields take the values 0 to number_count - 1
+        :param max_tokens: max tokens of each kind mined for new jobs
+        """
+        self.vfs = vfs
+        self.logger = logger
+        self.chunk_size = chunk_size
+        self.number_count = number_count
+        self.max_tokens = max_tokens
+        self.targets = np.zeros(0, dtype=np.int64)
+        self.target_ext_hashes = {}
+
+    def targets_load(self):
+        result = self.vfs.db_query_all(
+            "SELECT v_hash, ext_hash FROM core_nodes WHERE v_path IS NULL AND v_hash IS NOT NULL",
+            dbg='hash_reverse_targets_load')
+
+        # the extension hash of a node, when known, is used to drop hash collisions
+        self.target_ext_hashes = {}
+        for v_hash, ext_hash in result:
+            self.target_ext_hashes.setdefault(v_hash, set()).add(ext_hash)
+
+        self.targets = np.unique(np.array(list(self.target_ext_hashes.keys()), dtype=np.int64))
+        self.logger.log('HASH REVERSE: Unmatched Path Hashes: {}'.format(len(self.targets)))
+
+    def jobs_add(self, templates, restart=False):
+        jobs = {job[0]: job for job in self.vfs.hash_reverse_jobs_select()}
+        new_templates = [t for t in templates if restart or t not in jobs]
+        if len(new_templates) == 0:
+            return
+
+        tokens = tokens_mine(self.vfs.hash_string_select_distinct_string(), self.max_tokens)
+        self.logger.log('HASH REVERSE: Tokens: {}'.format(
+            ', '.join(['{} {}'.format(k, len(v)) for k, v in tokens.items()])))
+
+        for template in new_templates:
+            tokens_used = {k: v for k, v in tokens.items() if '{' + k in template}
+            n_candidates = HashReverseTemplate(template, tokens_used, self.number_count).n_candidates
+            self.vfs.hash_reverse_job_set(template, tokens_used, n_candidates, 0, 0)
+            self.logger.log('HASH REVERSE: Job Added: {}: {} candidates'.format(template, n_candidates))
+
+    def hits_verify(self, strings):
+        hits = []
+        for s in strings:
+            v_hash = self.vfs.file_hash(s)
+            ext_hashes = self.target_ext_hashes.get(v_hash, set())
+            if None in ext_hashes or hash32_func(os.path.splitext(s)[1]) in ext_hashes:
+                hits.append((s, v_hash))
+        return hits
+
+    def run(self, time_limit=None):
+        """
+        Work through the unfinished jobs in the order they were added
+        :param time_limit: seconds, stop after the first work unit that ends past the limit
+        :return: v_hashes that were matched to proposed strings
+        """
+        t_start = time.time()
+        self.targets_load()
+
+        hits_all = set()
+        for template, tokens, n_candidates, n_done, n_hits in self.vfs.hash_reverse_jobs_select():
+            if n_done >= n_candidates:
+                continue
+
+            t = HashReverseTemplate(template, tokens, self.number_count)
+            self.logger.log('HASH REVERSE: {}: Begin at {} of {}'.format(template, n_done, n_candidates))
+            while n_done < n_candidates and len(self.targets) > 0:
+                if time_limit is not None and time.time() - t_start > time_limit:
+                    self.logger.log('HASH REVERSE: Time limit reached')
+                    return list(hits_all)
+
+                t0 = time.time()
+                n_end = min(n_candidates, n_done + self.chunk_size)
+                indexes = t.search(n_done, n_end, self.targets, self.vfs.file_hash_type)
+                hits = self.hits_verify([t.candidate(int(i)) for i in indexes])
+                t1 = time.time()
+
+                if hits:
+                    with DbWrap(self.vfs, logger=self.logger) as db:
+                        for s, v_hash in hits:
+                            db.propose_string(s, None)
+                            self.logger.log('HASH REVERSE: Found {} {}'.format(self.vfs.file_hash_format(v_hash), s))
+                            hits_all.add(v_hash)
+                    self.targets = np.setdiff1d(self.targets, [v_hash for _, v_hash in hits])
+
+                n_hits += len(hits)
+                n_chunk = n_end - n_done
+                n_done = n_end
+                self.vfs.hash_reverse_job_progress(template, n_done, n_hits)
+
+                self.logger.log('HASH REVERSE: {}: {} of {} ({:.1f}%), {:.2f} MHash/s, hits {}'.format(
+                    template, n_done, n_candidates, 100.0 * n_done / n_candidates,
+                    n_chunk / max(t1 - t0, 1e-6) / 1e6, n_hits))
+
+            self.logger.log('HASH REVERSE: {}: End, hits {}'.format(template, n_hits))
+
+        return list(hits_all)
+
+    def apply(self, v_hashes):
+        # give the nodes of the found hashes their v_path, in this process, there are few of them
+        if len(v_hashes) > 0:
+            processor = Processor(self.vfs, LogWrapper(self.logger))
+            processor.process_command('process_vhash_final', [v_hashes])
+            self.vfs.update_used_depths()
+        self.logger.log('HASH REVERSE: Applied {} found hashes'.format(len(v_hashes)))
@@ -1,7 +1,12 @@
 import sys
 import mmh3
+import numba
 import numpy as np
-from numba import njit
+from numba import njit, prange
+
+# parallel loops of deca run on numba's workqueue threading layer, with the TBB layer the threads started in the main
+# process hang it at exit once worker processes are forked, set before the first parallel loop runs
+numba.config.THREADING_LAYER = 'workqueue'
 
 # Need to constrain U32 to only 32 bits using the & 0xffffffff
 # since Python has no native notion of integers limited to 32 bit
@@ -139,6 +144,131 @@ def hash_all_func(data):
     return c, (v >> 16) & 0x0000FFFFFFFFFFFF, int(np.int64(np.uint64(v & 0xFFFFFFFFFFFFFFFF)))
 
 
+@njit(inline=CostModel(cost_model_params))
+def rotl64(x, k):
+    return (x << np.uint64(k)) | (x >> np.uint64(64 - k))
+
+
+@njit(inline=CostModel(cost_model_params))
+def fmix64(k):
+    k ^= k >> np.uint64(33)
+    k *= np.uint64(0xff51afd7ed558ccd)
+    k ^= k >> np.uint64(33)
+    k *= np.uint64(0xc4ceb9fe1a85ec53)
+    k ^= k >> np.uint64(33)
+    return k
+
+
+@njit(inline=CostModel(cost_model_params))
+def murmur3_x64_128(data, seed=0):
+    # same as mmh3.hash128(data, seed, x64arch=True), returns the low and high 64 bits
+    length = len(data)
+    nblocks = length // 16
+
+    h1 = np.uint64(seed)
+    h2 = np.uint64(seed)
+    c1 = np.uint64(0x87c37b91114253d5)
+    c2 = np.uint64(0x4cf5ad432745937f)
+
+    for i in range(nblocks):
+        p = i * 16
+        k1 = np.uint64(0)
+        k2 = np.uint64(0)
+        for j in range(8):
+            k1 |= np.uint64(data[p + j]) << np.uint64(8 * j)
+            k2 |= np.uint64(data[p + 8 + j]) << np.uint64(8 * j)
+
+        k1 *= c1; k1 = rotl64(k1, 31); k1 *= c2; h1 ^= k1
+        h1 = rotl64(h1, 27); h1 += h2; h1 = h1 * np.uint64(5) + np.uint64(0x52dce729)
+        k2 *= c2; k2 = rotl64(k2, 33); k2 *= c1; h2 ^= k2
+        h2 = rotl64(h2, 31); h2 += h1; h2 = h2 * np.uint64(5) + np.uint64(0x38495ab5)
+
+    p = nblocks * 16
+    tail = length & 15
+    k1 = np.uint64(0)
+    k2 = np.uint64(0)
+    if tail > 8:
+        for j in range(tail - 8):
+            k2 ^= np.uint64(data[p + 8 + j]) << np.uint64(8 * j)
+        k2 *= c2; k2 = rotl64(k2, 33); k2 *= c1; h2 ^= k2
+    if tail > 0:
+        for j in range(min(tail, 8)):
+            k1 ^= np.uint64(data[p + j]) << np.uint64(8 * j)
+        k1 *= c1; k1 = rotl64(k1, 31); k1 *= c2; h1 ^= k1
+
+    h1 ^= np.uint64(length)
+    h2 ^= np.uint64(length)
+    h1 += h2
+    h2 += h1
+    h1 = fmix64(h1)
+    h2 = fmix64(h2)
+    h1 += h2
+    h2 += h1
+
+    return h1, h2
+
+
+@njit(parallel=True)
+def hash_all_packed(buffer, offsets):
+    """
+    Hash n strings packed back to back in a uint8 buffer, string i is buffer[offsets[i]:offsets[i+1]]
+    :return: hash32, hash48, hash64, ext_hash32 arrays, same values as hash_all_func and hash32_func of the extension
+    """
+    n = len(offsets) - 1
+    hash32 = np.zeros(n, dtype=np.uint32)
+    hash48 = np.zeros(n, dtype=np.int64)
+    hash64 = np.zeros(n, dtype=np.int64)
+    ext_hash32 = np.zeros(n, dtype=np.uint32)
+    for i in prange(n):
+        data = buffer[offsets[i]:offsets[i + 1]]
+
+        c, b = hashlittle2(data, 0, 0)
+        hash32[i] = c
+
+        h1, h2 = murmur3_x64_128(data, 0)
+        hash48[i] = np.int64((h1 >> np.uint64(16)) & np.uint64(0x0000FFFFFFFFFFFF))
+        hash64[i] = np.int64(h1)
+
+        # extension, from the last period to the end, empty if there is none
+        ext_pos = len(data)
+        for j in range(len(data) - 1, -1, -1):
+            if data[j] == 46:  # '.'
+                ext_pos = j
+                break
+        c, b = hashlittle2(data[ext_pos:], 0, 0)
+        ext_hash32[i] = c
+
+    return hash32, hash48, hash64, ext_hash32
+
+
+def strings_pack(strings):
+    strings = [s.encode('ascii') if isinstance(s, str) else s for s in strings]
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in strings], out=offsets[1:])
+    buffer = np.frombuffer(b''.join(strings), dtype=np.uint8)
+    return buffer, offsets
+
+
+def hash_all_batch(strings):
+    """
+    Batch version of hash_all_func, plus the hash32 of the extension, for a list of str/bytes
+    :return: hash32, hash48, hash64, ext_hash32 numpy arrays
+    """
+    buffer, offsets = strings_pack(strings)
+    if len(buffer) == 0:
+        # numba can not slice an empty buffer from b''
+        buffer = np.zeros(1, dtype=np.uint8)
+    return hash_all_packed(buffer, offsets)
+
+
+def hash32_batch(strings):
+    return hash_all_batch(strings)[0].tolist()
+
+
+def hash64_batch(strings):
+    return hash_all_batch(strings)[2].tolist()
+
+
 def main():
     data = sys.argv[1]
 
@@ -1,38 +1,134 @@
+import atexit
 import datetime
 import os
+import queue
 import struct
+import threading
 import weakref
 import sys
 
 
+log_level_none = -1
+log_level_error = 0
+log_level_warning = 1
+log_level_log = 2
+log_level_trace = 3
+
+# loggers that still have a writer thread, flushed when the interpreter exits
+_loggers_active = weakref.WeakSet()
+
+
+def _loggers_shutdown():
+    for logger in list(_loggers_active):
+        logger.shutdown()
+
+
+atexit.register(_loggers_shutdown)
+
+
 class Logger:
-    def __init__(self, working_dir):
+    """
+    Messages at or below level are written to working_dir/log.txt by one writer thread that keeps the file open,
+    callers only queue the line. Messages up to log_level_log are also printed. Without a working_dir nothing is
+    written and the level is log_level_none, so workers can drop messages before they are sent.
+    """
+    def __init__(self, working_dir, level=log_level_trace):
         self.working_dir = working_dir
+        self.level = level if working_dir is not None else log_level_none
+        self._q_msgs = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.exception = None
+
+    def writer_start(self):
+        with self._lock:
+            # a forked process inherits the queue but not the thread
+            if self._thread is None or self._pid != os.getpid():
+                self._q_msgs = queue.SimpleQueue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='Logger', daemon=True)
+                self._thread.start()
+                _loggers_active.add(self)
+
+    def _run(self):
+        try:
+            self._write(self._q_msgs)
+        except Exception as exc:
+            # flush raises it, the thread is gone and nothing would set its events
+            self.exception = exc
+
+    def _write(self, q_msgs):
+        with open(self.working_dir + 'log.txt', 'a', buffering=1024**2) as f:
+            keep_running = True
+            while keep_running:
+                msgs = [q_msgs.get()]
+                # write what is already waiting before flushing once
+                while True:
+                    try:
+                        msgs.append(q_msgs.get(block=False))
+                    except queue.Empty:
+                        break
+
+                flushed = []
+                for msg in msgs:
+                    if msg is None:
+                        keep_running = False
+                    elif isinstance(msg, threading.Event):
+                        flushed.append(msg)
+                    else:
+                        f.write(msg)
+                        f.write('\n')
+                f.flush()
+                for event in flushed:
+                    event.set()
+
+    def flush(self, poll_interval_sec=0.5):
+        # wait until the queued messages are in the file, or the writer thread is gone
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid():
+            event = threading.Event()
+            self._q_msgs.put(event)
+            while not event.wait(poll_interval_sec):
+                if not thread.is_alive():
+                    break
+        if self.exception is not None:
+            raise self.exception
+
+    def shutdown(self):
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                self._q_msgs.put(None)
+                self._thread.join()
+            self._thread = None
+            self._q_msgs = None
+            _loggers_active.discard(self)
 
     def log_base(self, level, s):
         msg = '{}: {}'.format(datetime.datetime.now(), s)
-        if self.working_dir is not None:
-            with open(self.working_dir + 'log.txt', 'a') as f:
-                f.write(msg + '\n')
-                if level <= 2:
-                    print(msg)
+        if level <= self.level:
+            if self._thread is None or self._pid != os.getpid():
+                self.writer_start()
+            self._q_msgs.put(msg)
+            if level <= log_level_log:
+                print(msg)
 
         return msg
 
     def error(self, s):
-        self.log_base(0, s)
+        self.log_base(log_level_error, s)
 
     def warning(self, s):
-        self.log_base(1, s)
+        self.log_base(log_level_warning, s)
 
     def log(self, s):
-        self.log_base(2, s)
+        self.log_base(log_level_log, s)
 
     def trace(self, s):
-        self.log_base(3, s)
+        self.log_base(log_level_trace, s)
 
     def debug(self, s):
-        self.log_base(3, s)
+        self.log_base(log_level_trace, s)
 
 
 class DecaSignal:
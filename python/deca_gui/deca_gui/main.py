@@ -82,6 +82,7 @@ class MainWindow(QMainWindow):
         self.ui.chkbx_export_raw_extract.setChecked(True)
         self.ui.chkbx_export_contents_extract.setChecked(False)
         self.ui.chkbx_export_text_extract.setChecked(False)
+        self.ui.chkbx_export_columns_extract.setChecked(False)
         self.ui.chkbx_export_processed_extract.setChecked(False)
 
         self.ui.chkbx_export_raw_mods.setChecked(True)
@@ -255,7 +256,7 @@ class MainWindow(QMainWindow):
         self.ui.data_view.vnode_2click_selected(uids)
 
     def extract(
-            self, eid, extract_dir, export_raw, export_contents, save_to_processed, save_to_text,
+            self, eid, extract_dir, export_raw, export_contents, save_to_processed, save_to_text, save_to_columns,
             export_map_full, export_map_tiles):
         if self.vfs_view_current().node_selected_count() > 0:
             try:
@@ -272,7 +273,8 @@ class MainWindow(QMainWindow):
                     self.vfs, self.vfs_view_current(), extract_dir,
                     allow_overwrite=False,
                     save_to_processed=save_to_processed,
-                    save_to_text=save_to_text)
+                    save_to_text=save_to_text,
+                    save_to_columns=save_to_columns)
 
             except EDecaFileExists as exce:
                 self.error_dialog('{} Canceled: File Exists: {}'.format(eid, exce.args))
@@ -330,6 +332,7 @@ class MainWindow(QMainWindow):
             export_contents=self.ui.chkbx_export_contents_extract.isChecked(),
             save_to_processed=self.ui.chkbx_export_processed_extract.isChecked(),
             save_to_text=self.ui.chkbx_export_text_extract.isChecked(),
+            save_to_columns=self.ui.chkbx_export_columns_extract.isChecked(),
             export_map_full=self.ui.cmbbx_map_format.currentText().find('Full') > -1,
             export_map_tiles=self.ui.cmbbx_map_format.currentText().find('Tiles') > -1,
         )
@@ -352,6 +355,7 @@ class MainWindow(QMainWindow):
             export_contents=self.ui.chkbx_export_contents_mods.isChecked(),
             save_to_processed=self.ui.chkbx_export_processed_mods.isChecked(),
             save_to_text=False,
+            save_to_columns=False,
             export_map_full=False,
             export_map_tiles=False,
         )
@@ -62,6 +62,9 @@ class Ui_MainWindow(object):
         self.chkbx_export_text_extract = QtWidgets.QCheckBox(self.tab_extract)
         self.chkbx_export_text_extract.setObjectName("chkbx_export_text_extract")
         self.gridLayout.addWidget(self.chkbx_export_text_extract, 1, 0, 1, 1)
+        self.chkbx_export_columns_extract = QtWidgets.QCheckBox(self.tab_extract)
+        self.chkbx_export_columns_extract.setObjectName("chkbx_export_columns_extract")
+        self.gridLayout.addWidget(self.chkbx_export_columns_extract, 2, 0, 1, 1)
         self.bt_extract_folder_show = QtWidgets.QPushButton(self.tab_extract)
         self.bt_extract_folder_show.setText("")
         self.bt_extract_folder_show.setObjectName("bt_extract_folder_show")
@@ -237,6 +240,7 @@ class Ui_MainWindow(object):
         self.filter_clear_bt.setText(QtWidgets.QApplication.translate("MainWindow", "Clear", None, -1))
         self.chkbx_export_processed_extract.setText(QtWidgets.QApplication.translate("MainWindow", "Export As Processed", None, -1))
         self.chkbx_export_text_extract.setText(QtWidgets.QApplication.translate("MainWindow", "Export As Text", None, -1))
+        self.chkbx_export_columns_extract.setText(QtWidgets.QApplication.translate("MainWindow", "Export ADF Arrays As Columns", None, -1))
         self.chkbx_export_contents_extract.setText(QtWidgets.QApplication.translate("MainWindow", "Export Contents", None, -1))
         self.bt_extract.setText(QtWidgets.QApplication.translate("MainWindow", "EXTRACT", None, -1))
         self.chkbx_export_raw_extract.setText(QtWidgets.QApplication.translate("MainWindow", "Export Raw Files", None, -1))
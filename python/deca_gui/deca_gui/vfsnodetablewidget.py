@@ -17,6 +17,7 @@ class VfsNodeTableModel(QAbstractTableModel):
         self.vfs_view: Optional[VfsView] = None
         self.show_all = True
         self.uid_table = None
+        self.node_cache = {}
 
         self.remap = None
         self.remap_uid = None
@@ -48,9 +49,20 @@ class VfsNodeTableModel(QAbstractTableModel):
         else:
             self.uid_table = list(self.vfs_view.nodes_visible_uids_no_vpath_get())
         self.uid_table.sort()
+        self.node_cache = {}
 
         self.endResetModel()
 
+    def node_get(self, uid):
+        # data() is called per cell and role, keep the nodes of the rows on screen
+        node = self.node_cache.get(uid)
+        if node is None:
+            if len(self.node_cache) >= 4096:
+                self.node_cache = {}
+            node = self.vfs_view.node_where_uid(uid)
+            self.node_cache[uid] = node
+        return node
+
     def sort(self, column: int, order: PySide2.QtCore.Qt.SortOrder):
         # if self.remap_uid is None:
         #     rm = list(range(len(self.vfs_view.table_vfsnode)))
@@ -113,7 +125,7 @@ class VfsNodeTableModel(QAbstractTableModel):
 
         if role == Qt.DisplayRole:
             uid = self.uid_table[row]
-            node: VfsNode = self.vfs_view.node_where_uid(uid)
+            node: VfsNode = self.node_get(uid)
             if node is None:
                 return 'NA'
             else:
@@ -151,7 +163,7 @@ class VfsNodeTableModel(QAbstractTableModel):
 
         elif role == Qt.BackgroundRole:
             uid = self.uid_table[row]
-            node: VfsNode = self.vfs_view.node_where_uid(uid)
+            node: VfsNode = self.node_get(uid)
             if node.is_valid():
                 if column == 8:
                     if node.used_at_runtime_depth is not None:
@@ -222,7 +234,7 @@ class VfsNodeTableWidget(QWidget):
         if index.isValid():
             if self.model.vfs_view is not None:
                 items = list(set([self.model.uid_table[idx.row()] for idx in self.table_view.selectedIndexes()]))
-                items = [self.model.vfs_view.node_where_uid(i) for i in items]
+                items = self.model.vfs_view.nodes_where_uids(items)
                 self.model.vfs_view.paths_set(items)
 
     def double_clicked(self, index):
@@ -12,10 +12,21 @@ class DataViewerAdf(DataViewerText):
 
         try:
             obj = adf_db.read_node(vfs, vnode)
-            sbuf = obj.dump_to_string(vfs)
         except EDecaMissingAdfType as e:
-            sbuf = 'Missing ADF_TYPE {:08x} in parsing of type {:08x}'.format(e.type_id, vnode.file_sub_type)
+            self.content_set(self.type_missing_message(e, vnode))
+            return
 
-        self.content_set(sbuf)
+        self.content_set_lines(self.dump_lines(vfs, vnode, obj))
+
+    @staticmethod
+    def type_missing_message(e, vnode):
+        return 'Missing ADF_TYPE {:08x} in parsing of type {:08x}'.format(e.type_id, vnode.file_sub_type)
+
+    def dump_lines(self, vfs, vnode, obj):
+        # instances are read as their lines are taken from the event loop, a missing type can turn up there
+        try:
+            yield from obj.dump_lines(vfs)
+        except EDecaMissingAdfType as e:
+            yield self.type_missing_message(e, vnode)
 
 
@@ -12,7 +12,5 @@ class DataViewerRtpc(DataViewerText):
             buffer = f.read(vnode.size_u)
 
         dump = RtpcVisitorDumpToString(vfs)
-        dump.visit(buffer)
-        sbuf = dump.result()
 
-        self.content_set(sbuf)
+        self.content_set_lines(dump.visit_lines(buffer))
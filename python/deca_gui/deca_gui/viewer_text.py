@@ -1,9 +1,10 @@
 from .viewer import *
 from deca.file import ArchiveFile
-from PySide2.QtCore import QStringListModel
+from PySide2.QtCore import QStringListModel, QTimer
 from PySide2.QtGui import QFont, QKeyEvent, QKeySequence, QGuiApplication
 from PySide2.QtWidgets import QSizePolicy, QVBoxLayout, QListView, QAbstractItemView
 import io
+import itertools
 
 
 class DecaListView(QListView):
@@ -39,7 +40,11 @@ class DataViewerText(DataViewer):
         self.main_layout.addWidget(self.list_view)
         self.setLayout(self.main_layout)
 
+        self._lines_source = None
+
     def content_set(self, s):
+        self._lines_source = None
+
         if isinstance(s, str):
             with io.StringIO(s) as f:
                 ss = f.readlines()
@@ -52,6 +57,33 @@ class DataViewerText(DataViewer):
 
         self.list_view.setModel(model)
 
+    def content_set_lines(self, lines, batch_size=2000):
+        """
+        Show lines as they are taken from an iterator, the first batch now and the rest from the event loop, so the
+        first screen is shown before all lines are made
+        """
+        source = iter(lines)
+        self._lines_source = source
+        self.list_view.setModel(QStringListModel())
+        self.content_add_lines(source, batch_size)
+
+    def content_add_lines(self, source, batch_size):
+        if source is not self._lines_source:
+            return  # other content was set
+
+        ss = [s.rstrip() for s in itertools.islice(source, batch_size)]
+        if ss:
+            model = self.list_view.model()
+            row = model.rowCount()
+            model.insertRows(row, len(ss))
+            for i, s in enumerate(ss):
+                model.setData(model.index(row + i), s)
+
+        if len(ss) == batch_size:
+            QTimer.singleShot(0, lambda: self.content_add_lines(source, batch_size))
+        else:
+            self._lines_source = None
+
     def vnode_process(self, vfs: VfsProcessor, vnode: VfsNode):
         with ArchiveFile(vfs.file_obj_from(vnode)) as f:
             buf = f.read(vnode.size_u)
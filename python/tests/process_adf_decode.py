@@ -0,0 +1,519 @@
+import io
+import os
+import re
+import sys
+import time
+import shutil
+import struct
+import tempfile
+import tracemalloc
+import numpy as np
+from deca.errors import EDecaMissingAdfType
+from deca.db_core import VfsDatabase, db_to_vfs_node
+from deca.db_wrap import DbWrap
+from deca.ff_adf import \
+    Adf, InstanceEntry, AdfDatabase, AdfValue, AdfInstanceReader, AdfTypePlans, AdfLazyStruct, AdfLazyArray, TypeDef, MemberDef, EnumDef, StringHash, MetaType, \
+    read_instance, adf_value_extract, typedef_u8, typedef_u32, typedef_s32, typedef_f32, typedef_u64
+from deca.ff_adf_columns import adf_columns
+from deca.ff_types import FTYPE_ADF_BARE, FTYPE_ADF0, FTYPE_ADF5, ftype_adf_family
+from deca.util import Logger
+
+
+# python process_adf_decode.py [project.json] [n_files] [n_objects]
+# compares the compiled plans to read_instance over a synthetic corpus and all ADF nodes of the project, lazy
+# reads of a few fields to full reads, columns of the objects to tables built row by row, and with a project text
+# dumps streamed to dumps made as one string
+project_file = None
+n_files = 20
+n_objects = 2000
+
+if len(sys.argv) > 1:
+    project_file = sys.argv[1]
+if len(sys.argv) > 2:
+    n_files = int(sys.argv[2])
+if len(sys.argv) > 3:
+    n_objects = int(sys.argv[3])
+
+type_string = 0x8955583e
+type_deferred = 0xdefe88ed
+type_missing = 0x0badf00d
+
+
+def adf_value_key(v):
+    # comparable form of a read_instance tree
+    if isinstance(v, AdfValue):
+        return ('AdfValue', adf_value_key(v.value), v.type_id, v.info_offset, v.data_offset, v.bit_offset,
+                v.enum_string, v.hash_string)
+    elif isinstance(v, (dict, AdfLazyStruct)):
+        return 'dict', tuple((k, adf_value_key(iv)) for k, iv in v.items())
+    elif isinstance(v, (list, AdfLazyArray)):
+        return 'list', tuple(adf_value_key(iv) for iv in v)
+    elif isinstance(v, tuple):
+        return 'tuple', tuple(adf_value_key(iv) for iv in v)
+    return type(v).__name__, repr(v)
+
+
+def make_type(type_hash, metatype, size, name, element_type_hash=0, element_length=0, members=None):
+    td = TypeDef()
+    td.metatype = metatype
+    td.size = size
+    td.alignment = 4
+    td.type_hash = type_hash
+    td.name = name
+    td.flags = 0
+    td.element_type_hash = element_type_hash
+    td.element_length = element_length
+    td.members = members
+    return td
+
+
+def make_struct(type_hash, name, fields):
+    members = []
+    offset = 0
+    for field_name, type_id, size, bit_offset in fields:
+        m = MemberDef()
+        m.name = field_name
+        m.name_utf8 = field_name.decode('utf-8')
+        m.type_hash = type_id
+        m.size = size
+        if bit_offset and members:
+            m.offset = members[-1].offset  # bits share the word of the previous member
+        else:
+            offset = (offset + min(size, 8) - 1) // min(size, 8) * min(size, 8)
+            m.offset = offset
+            offset += size
+        m.bit_offset = bit_offset
+        m.default_type = 0
+        m.default_value = 0
+        members.append(m)
+    return make_type(type_hash, MetaType.Structure, (offset + 7) // 8 * 8, name, members=members)
+
+
+def make_types():
+    types = {}
+    enum_members = []
+    for i in range(5):
+        e = EnumDef()
+        e.name = f'Kind_{i}'.encode('ascii')
+        e.value = i
+        enum_members.append(e)
+    types[0x1000] = make_type(0x1000, MetaType.InlineArray, 64, b'Matrix', typedef_f32, 16)
+    types[0x1001] = make_type(0x1001, MetaType.InlineArray, 12, b'Vec3', typedef_f32, 3)
+    types[0x1002] = make_type(0x1002, MetaType.Enumeration, 4, b'Kind', members=enum_members)
+    types[0x1003] = make_type(0x1003, MetaType.Bitfield, 4, b'Bit')
+    types[0x1004] = make_type(0x1004, MetaType.StringHash, 4, b'Hash4')
+    types[0x1005] = make_type(0x1005, MetaType.StringHash, 6, b'Hash6')
+    types[0x1006] = make_type(0x1006, MetaType.StringHash, 8, b'Hash8')
+    types[0x1007] = make_type(0x1007, MetaType.Array, 12, b'U32Array', typedef_u32)
+    types[0x1008] = make_type(0x1008, MetaType.Array, 12, b'ByteArray', typedef_u8)
+    types[0x1009] = make_type(0x1009, MetaType.Pointer, 8, b'Pointer', 0x1000)
+    types[0x100a] = make_type(0x100a, MetaType.InlineArray, 16, b'Tags', 0x1004, 4)
+    types[0x100b] = make_type(0x100b, MetaType.Array, 12, b'MissingArray', type_missing)
+    types[0x2000] = make_struct(0x2000, b'Transform', [(b'Matrix', 0x1000, 64, 0), (b'Scale', typedef_f32, 4, 0)])
+    types[0x2001] = make_struct(0x2001, b'Object', [
+        (b'Id', typedef_u32, 4, 0),
+        (b'Kind', 0x1002, 4, 0),
+        (b'Active', 0x1003, 4, 0),
+        (b'Visible', 0x1003, 4, 3),
+        (b'Name', type_string, 8, 0),
+        (b'Position', 0x1001, 12, 0),
+        (b'Transform', 0x2000, 72, 0),
+        (b'Refs', 0x1007, 12, 0),
+        (b'NameHash', 0x1004, 4, 0),
+        (b'Hash6', 0x1005, 6, 0),
+        (b'Hash8', 0x1006, 8, 0),
+        (b'Extra', type_deferred, 16, 0),
+        (b'Data', 0x1008, 12, 0),
+        (b'Ptr', 0x1009, 8, 0),
+        (b'Tags', 0x100a, 16, 0),
+        (b'Offset', typedef_s32, 4, 0),
+        (b'Missing', 0x100b, 12, 0),
+    ])
+    types[0x3000] = make_type(0x3000, MetaType.Array, 12, b'ObjectArray', 0x2001)
+    types[0x3001] = make_type(0x3001, MetaType.Array, 12, b'F32Array', typedef_f32)
+    types[0x3002] = make_struct(0x3002, b'TreeNode', [(b'Value', typedef_u64, 8, 0), (b'Children', 0x3003, 12, 0)])
+    types[0x3003] = make_type(0x3003, MetaType.Array, 12, b'TreeNodeArray', 0x3002)
+    types[0x4000] = make_struct(0x4000, b'Mission', [
+        (b'Objects', 0x3000, 12, 0),
+        (b'Values', 0x3001, 12, 0),
+        (b'Tree', 0x3002, 24, 0),
+        (b'Tags', 0x100a, 16, 0),
+    ])
+    return types
+
+
+class InstanceBuilder:
+    def __init__(self, types, rng, hashes):
+        self.types = types
+        self.rng = rng
+        self.hashes = hashes
+        self.buffer = bytearray()
+
+    def alloc(self, size):
+        self.buffer += b'\0' * ((8 - len(self.buffer) % 8) % 8)
+        pos = len(self.buffer)
+        self.buffer += b'\0' * size
+        return pos
+
+    def stride(self, type_id):
+        fmt = {typedef_u8: 'B', typedef_u32: 'I', typedef_s32: 'i', typedef_f32: 'f', typedef_u64: 'Q'}.get(type_id)
+        return struct.calcsize(fmt) if fmt else self.types[type_id].size
+
+    def fill(self, type_id, pos, depth):
+        rng = self.rng
+        if type_id == typedef_u8:
+            struct.pack_into('<B', self.buffer, pos, int(rng.integers(0, 256)))
+        elif type_id == typedef_u32:
+            struct.pack_into('<I', self.buffer, pos, int(rng.integers(0, 2**32)))
+        elif type_id == typedef_s32:
+            struct.pack_into('<i', self.buffer, pos, int(rng.integers(-2**31, 2**31)))
+        elif type_id == typedef_u64:
+            struct.pack_into('<Q', self.buffer, pos, int(rng.integers(0, 2**63)))
+        elif type_id == typedef_f32:
+            struct.pack_into('<f', self.buffer, pos, float(rng.normal()))
+        elif type_id == type_string:
+            s = f'object_{int(rng.integers(0, 10**6))}'.encode('ascii')
+            offset = self.alloc(len(s) + 1)
+            self.buffer[offset:offset + len(s)] = s
+            struct.pack_into('<II', self.buffer, pos, offset, len(s))
+        elif type_id == type_deferred:
+            kind = rng.integers(0, 4)
+            if kind == 0:
+                struct.pack_into('<IIII', self.buffer, pos, 0, 0, 0, 0)
+            elif kind == 1:
+                struct.pack_into('<IIII', self.buffer, pos, 8, 7, type_missing, 0)
+            else:
+                offset = self.alloc(self.types[0x2000].size)
+                self.fill(0x2000, offset, depth + 1)
+                struct.pack_into('<IIII', self.buffer, pos, offset, 0, 0x2000, 0)
+        else:
+            td = self.types[type_id]
+            if td.metatype == MetaType.Structure:
+                for m in td.members:
+                    if td.type_hash == 0x2001 and m.name == b'Missing':
+                        struct.pack_into('<III', self.buffer, pos + m.offset, 0, 0, 0)
+                    elif self.types.get(m.type_hash) is not None and \
+                            self.types[m.type_hash].metatype == MetaType.Bitfield:
+                        if rng.integers(0, 2):
+                            word = struct.unpack_from('<I', self.buffer, pos + m.offset)[0]
+                            struct.pack_into('<I', self.buffer, pos + m.offset, word | (1 << m.bit_offset))
+                    else:
+                        self.fill(m.type_hash, pos + m.offset, depth)
+            elif td.metatype == MetaType.Array:
+                if td.type_hash == 0x3000:
+                    count = n_objects
+                elif td.type_hash == 0x3003:
+                    count = int(rng.integers(0, 4)) if depth < 4 else 0
+                else:
+                    count = int(rng.integers(0, 24))
+                stride = self.stride(td.element_type_hash)
+                offset = self.alloc(count * stride)
+                for i in range(count):
+                    self.fill(td.element_type_hash, offset + i * stride, depth + 1)
+                struct.pack_into('<III', self.buffer, pos, offset, 1, count)
+            elif td.metatype == MetaType.InlineArray:
+                stride = self.stride(td.element_type_hash)
+                for i in range(td.element_length):
+                    self.fill(td.element_type_hash, pos + i * stride, depth)
+            elif td.metatype == MetaType.Enumeration:
+                struct.pack_into('<I', self.buffer, pos, int(rng.integers(0, len(td.members) + 2)))
+            elif td.metatype == MetaType.StringHash:
+                h = self.hashes[int(rng.integers(0, len(self.hashes)))] if rng.integers(0, 2) else \
+                    int(rng.integers(0, 2**63))
+                if td.size == 4:
+                    struct.pack_into('<I', self.buffer, pos, h & 0xFFFFFFFF)
+                elif td.size == 6:
+                    struct.pack_into('<HHH', self.buffer, pos, (h >> 32) & 0xFFFF, (h >> 16) & 0xFFFF, h & 0xFFFF)
+                else:
+                    struct.pack_into('<Q', self.buffer, pos, h)
+            elif td.metatype == MetaType.Pointer:
+                struct.pack_into('<Q', self.buffer, pos, int(rng.integers(0, 2**63)))
+
+    def build(self, type_id):
+        pos = self.alloc(self.types[type_id].size)
+        self.fill(type_id, pos, 0)
+        return bytes(self.buffer), pos
+
+
+def read_interpreted(buffer, pos, type_id, map_typedef, map_string_hash, abs_offset):
+    found_strings = set()
+    full, _ = read_instance(
+        buffer, len(buffer), pos, type_id, map_typedef, map_string_hash, abs_offset, found_strings=found_strings)
+    return full, adf_value_extract(full), found_strings
+
+
+def read_compiled(type_plans, buffer, pos, type_id, map_typedef, map_string_hash, abs_offset):
+    found_strings = set()
+    reader = AdfInstanceReader(type_plans, map_typedef, map_string_hash, found_strings=found_strings)
+    full, value, _ = reader.read(buffer, pos, type_id, abs_offset)
+    return full, value, found_strings
+
+
+def compare(instances, type_plans):
+    t_interpreted = 0.0
+    t_compiled = 0.0
+    for buffer, pos, type_id, map_typedef, map_string_hash, abs_offset in instances:
+        t0 = time.time()
+        result_interpreted = read_interpreted(buffer, pos, type_id, map_typedef, map_string_hash, abs_offset)
+        t1 = time.time()
+        result_compiled = read_compiled(type_plans, buffer, pos, type_id, map_typedef, map_string_hash, abs_offset)
+        t2 = time.time()
+        t_interpreted += t1 - t0
+        t_compiled += t2 - t1
+
+        assert adf_value_key(result_interpreted[0]) == adf_value_key(result_compiled[0])
+        assert adf_value_key(result_interpreted[1]) == adf_value_key(result_compiled[1])
+        assert result_interpreted[2] == result_compiled[2]
+    return t_interpreted, t_compiled
+
+
+# synthetic missions, arrays of objects with nested structs, strings, deferred values, hashes, enums and bit fields
+types = make_types()
+rng = np.random.default_rng(0)
+string_hashes = {}
+for i in range(1000):
+    sh = StringHash()
+    sh.value = f'string_{i}'.encode('ascii')
+    sh.value_hash = int(rng.integers(0, 2**63))
+    string_hashes[sh.value_hash] = sh
+    string_hashes[sh.value_hash & 0xFFFFFFFF] = sh
+    string_hashes[sh.value_hash & 0xFFFFFFFFFFFF] = sh
+
+instances = []
+for i in range(n_files):
+    buffer, pos = InstanceBuilder(types, rng, list(string_hashes)).build(0x4000)
+    instances.append((buffer, pos, 0x4000, types, string_hashes, 0x40 * i))
+
+t_interpreted, t_compiled = compare(instances, AdfTypePlans())
+size = sum(len(v[0]) for v in instances)
+print(f'synthetic: {n_files} instances, {size / 1024**2:.1f} MiB: '
+      f'read_instance {t_interpreted:7.3f} s, compiled {t_compiled:7.3f} s')
+
+
+def read_lazy(type_plans, buffer, pos, type_id, map_typedef, map_string_hash, abs_offset):
+    reader = AdfInstanceReader(type_plans, map_typedef, map_string_hash, found_strings=set())
+    return reader.read_lazy(buffer, pos, type_id, abs_offset)
+
+
+def objects_names(value):
+    return [(obj['Id'], obj['Name']) for obj in value['Objects']]
+
+
+type_plans = AdfTypePlans()
+for instance in instances[:3]:
+    full, value, _ = read_compiled(type_plans, *instance)
+    full_lazy, value_lazy = read_lazy(type_plans, *instance)
+    assert adf_value_key(full) == adf_value_key(full_lazy)
+    assert adf_value_key(value) == adf_value_key(value_lazy)
+    assert adf_value_key(value['Objects']) == adf_value_key(value_lazy['Objects'].materialize())
+
+# a missing type raised by a lazy value after the read is reported to the reader
+buffer, pos, type_id, map_typedef, map_string_hash, abs_offset = instances[0]
+object_0 = read_lazy(type_plans, *instances[0])[1]['Objects'][0]
+missing_offset = [offset for name, _, offset in object_0._plan.members if name == 'Missing'][0]
+buffer = bytearray(buffer)
+struct.pack_into('<III', buffer, object_0._pos + missing_offset, 0, 1, 1)
+types_missing_found = []
+reader = AdfInstanceReader(
+    type_plans, map_typedef, map_string_hash, found_strings=set(), type_missing=types_missing_found.append)
+value_lazy = reader.read_lazy(bytes(buffer), pos, type_id, abs_offset)[1]
+assert types_missing_found == []
+try:
+    value_lazy['Objects'][0]['Missing']
+    assert False
+except EDecaMissingAdfType as ae:
+    assert ae.type_id == type_missing
+assert types_missing_found == [type_missing]
+
+for name, read in [
+        ('full', lambda instance: objects_names(read_compiled(type_plans, *instance)[1])),
+        ('lazy', lambda instance: objects_names(read_lazy(type_plans, *instance)[1]))]:
+    t0 = time.time()
+    for instance in instances:
+        read(instance)
+    t1 = time.time()
+    tracemalloc.start()
+    read(instances[0])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f'  {name} read of Objects[*].Id, Name: {t1 - t0:7.3f} s, '
+          f'peak {peak / 1024**2:6.1f} MiB per instance')
+
+
+
+def path_tokens(path):
+    return [int(t[1:-1]) if t.startswith('[') else t for t in re.findall(r'[^.\[\]]+|\[\d+\]', path)]
+
+
+def row_resolve(full, tokens):
+    # value of a column path in a full read of a row
+    for token in tokens:
+        if token == 'hash_string':
+            return full.hash_string
+        full = full.value[token]
+    v = adf_value_extract(full)
+    if isinstance(v, tuple):  # pointers
+        return v[0]
+    return list(v) if isinstance(v, bytes) and full.type_id in types and \
+        types[full.type_id].metatype == MetaType.InlineArray else v
+
+
+def objects_table(instance):
+    # table of the columns of objects_columns built row by row from a full read
+    full, value, _ = read_compiled(type_plans, *instance)
+    table = {path: [] for path in object_paths}
+    paths = [(table[path], path_tokens(path)) for path in object_paths]
+    for row_full in full.value['Objects'].value:
+        for column, tokens in paths:
+            column.append(row_resolve(row_full, tokens))
+    return table
+
+
+def objects_columns(instance):
+    return adf_columns(read_lazy(type_plans, *instance)[1]['Objects'])
+
+
+object_paths = list(objects_columns(instances[0]))
+assert {p.split('.')[0].split('[')[0] for p in object_paths} == {m.name_utf8 for m in types[0x2001].members}
+for instance in instances[:3]:
+    table = objects_table(instance)
+    columns = objects_columns(instance)
+    for path, column in columns.items():
+        assert table[path] == column.tolist(), path
+
+for name, read in [('rows', objects_table), ('columns', objects_columns)]:
+    t0 = time.time()
+    for instance in instances:
+        read(instance)
+    t1 = time.time()
+    print(f'  {name} table of Objects: {t1 - t0:7.3f} s')
+
+
+
+def make_adf(type_map, full, value, size):
+    adf = Adf()
+    adf.version = 4
+    adf.instance_count = 1
+    adf.instance_offset = 0
+    adf.typedef_count = len(type_map)
+    adf.typedef_offset = 0
+    adf.stringhash_count = 0
+    adf.stringhash_offset = 0
+    adf.nametable_count = 1
+    adf.nametable_offset = 0
+    adf.total_size = size
+    adf.unknown = [0, 0]
+    adf.comment = b'synthetic mission'
+    adf.table_name = [(0, b'mission')]
+    adf.map_stringhash = {}
+    adf.map_typedef = type_map
+    adf.extended_map_typedef = type_map
+    ins = InstanceEntry()
+    ins.name_hash = 0
+    ins.type_hash = 0x4000
+    ins.offset = 0
+    ins.size = size
+    ins.name = b'mission'
+    adf.table_instance = [ins]
+    adf.table_instance_values = [value]
+    adf.table_instance_full_values = [full]
+    return adf
+
+
+# text dumps of synthetic instances with hashes of the strings of a new database
+if project_file is not None:
+    working_dir = tempfile.mkdtemp() + '/'
+    try:
+        vfs = VfsDatabase(project_file, working_dir, Logger(None))
+        with DbWrap(vfs) as db:
+            for i in range(20000):
+                db.propose_string(f'Field_{i:07d}', None, is_field_name=True)
+        vfs.db_indexes_deferred_create()
+        db_hashes = [h for row in vfs.db_query_all("SELECT hash32, hash48 FROM core_strings") for h in row]
+
+        dump_types = dict(types)
+        dump_types[type_missing] = make_type(type_missing, MetaType.Primative, 4, b'Missing')
+        for td in dump_types.values():
+            td.META_position = 0
+
+        t_string = 0.0
+        t_stream = 0.0
+        t_first = 0.0
+        for i in range(min(n_files, 5)):
+            buffer, pos = InstanceBuilder(types, rng, db_hashes).build(0x4000)
+            full, value, _ = read_compiled(type_plans, buffer, pos, 0x4000, types, {}, 0)
+            adf = make_adf(dump_types, full, value, len(buffer))
+
+            t0 = time.time()
+            s = adf.dump_to_string(vfs)
+            t1 = time.time()
+            f = io.StringIO()
+            adf.dump_to(f, vfs)
+            t2 = time.time()
+            lines = adf.dump_lines(vfs)
+            for line in lines:
+                if line.startswith('instances'):
+                    next(lines)
+                    break
+            t3 = time.time()
+            t_string += t1 - t0
+            t_stream += t2 - t1
+            t_first += t3 - t2
+            assert f.getvalue() == s
+            assert all(line.endswith('\n') for line in adf.dump_lines(vfs))
+
+        tracemalloc.start()
+        adf.dump_to_string(vfs)
+        peak_string = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        with open(os.devnull, 'w') as f:
+            adf.dump_to(f, vfs)
+        peak_stream = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f'  dumps: string {t_string:7.3f} s, peak {peak_string / 1024**2:6.1f} MiB, '
+              f'stream {t_stream:7.3f} s, peak {peak_stream / 1024**2:6.1f} MiB, first instance line {t_first:7.3f} s')
+        vfs.shutdown()
+    finally:
+        shutil.rmtree(working_dir)
+
+# the ADF nodes of a project
+if project_file is not None:
+    vfs = VfsDatabase(project_file, os.path.join(os.path.split(project_file)[0], ''), Logger(None))
+    adf_db = AdfDatabase(vfs)
+    nodes = vfs.db_query_all(
+        f"SELECT * FROM core_nodes WHERE file_type IN ({','.join(['?'] * len(ftype_adf_family))})",
+        list(ftype_adf_family))
+    nodes = [db_to_vfs_node(n) for n in nodes]
+
+    instances = []
+    n_failed = 0
+    for node in nodes:
+        try:
+            adf = adf_db.read_node(vfs, node)
+            with vfs.file_obj_from(node) as f:
+                buffer = f.read()
+        except Exception:
+            n_failed += 1
+            continue
+        if adf is None:
+            continue
+        if node.file_type == FTYPE_ADF_BARE:
+            instances.append(
+                (buffer, node.offset, node.file_sub_type, adf.extended_map_typedef, adf.map_stringhash, 0))
+        elif node.file_type == FTYPE_ADF0:
+            ins = adf.table_instance[0]
+            instances.append(
+                (buffer[8:], 0, ins.type_hash, adf.extended_map_typedef, adf.map_stringhash, 0))
+        else:
+            if node.file_type == FTYPE_ADF5:
+                buffer = buffer[5:]
+            for ins in adf.table_instance:
+                instances.append((
+                    buffer[ins.offset:ins.offset + ins.size], 0, ins.type_hash,
+                    adf.extended_map_typedef, adf.map_stringhash, ins.offset))
+
+    t_interpreted, t_compiled = compare(instances, AdfTypePlans())
+    size = sum(len(v[0]) for v in instances)
+    print(f'project: {len(nodes)} ADF nodes ({n_failed} failed), {len(instances)} instances, '
+          f'{size / 1024**2:.1f} MiB: read_instance {t_interpreted:7.3f} s, compiled {t_compiled:7.3f} s')
+    vfs.shutdown()
@@ -0,0 +1,144 @@
+import io
+import os
+import sys
+import time
+import pickle
+import shutil
+import tempfile
+from deca.db_core import VfsDatabase
+from deca.ff_adf import AdfDatabase, TypeDef, MemberDef, EnumDef, MetaType, typedef_pack
+from deca.ff_adf import adf_type_registry_cache, adf_type_registry_load
+from deca.util import Logger
+
+
+# python process_adf_types.py ../work/gz/project.json [n_types]
+project_file = sys.argv[1]
+n_types = 20000
+
+if len(sys.argv) > 2:
+    n_types = int(sys.argv[2])
+
+
+def make_typedef(i):
+    td = TypeDef()
+    td.META_position = 0x40 + i * 0x60
+    td.size = 8 * (1 + i % 20)
+    td.alignment = 4
+    td.type_hash = (i * 0x9E3779B1) & 0xFFFFFFFF
+    td.name = f'Type_{i:06d}'.encode('ascii')
+    td.flags = i % 3
+    td.element_type_hash = 0
+    td.element_length = 0
+    if i % 4 == 3:
+        td.metatype = MetaType.Enumeration
+        td.members = []
+        for k in range(1 + i % 12):
+            m = EnumDef()
+            m.name = f'Value_{k}'.encode('ascii')
+            m.value = k
+            td.members.append(m)
+    elif i % 4 == 2:
+        td.metatype = MetaType.Array
+        td.element_type_hash = 0x075e4e4f
+    else:
+        td.metatype = MetaType.Structure
+        td.members = []
+        for k in range(1 + i % 20):
+            m = MemberDef()
+            m.name = f'Member_{k}'.encode('ascii')
+            m.name_utf8 = m.name.decode('utf-8')
+            m.type_hash = 0x7515a207
+            m.size = 4
+            m.offset = 4 * k
+            m.bit_offset = 0
+            m.default_type = 0
+            m.default_value = 0xFFFFFFFFFFFFFFFF if k == 0 else k
+            td.members.append(m)
+    return td
+
+
+def typedef_fields(td):
+    members = None if td.members is None else [vars(m) for m in td.members]
+    return {**vars(td), 'metatype': int(td.metatype), 'members': members}
+
+
+def adf_type_map_load_pickled(vfs):
+    # previous implementation, every row unpickled by every AdfDatabase
+    adf_map = {}
+    for k, miss, b in vfs.db_query_all("SELECT * FROM core_adf_types"):
+        if len(b) > 0:
+            with io.BytesIO(b) as f:
+                adf_map[k] = pickle.load(f)
+    return adf_map
+
+
+working_dir = tempfile.mkdtemp() + '/'
+try:
+    vfs = VfsDatabase(project_file, working_dir, Logger(None))
+    typedefs = {td.type_hash: td for td in [make_typedef(i) for i in range(n_types)]}
+
+    # a database of an older version, pickled types
+    vfs.db_execute_many(
+        "INSERT INTO core_adf_types VALUES (?,?,?)", [(k, 0, pickle.dumps(v)) for k, v in typedefs.items()])
+    vfs.db_conn.commit()
+
+    t0 = time.time()
+    adf_map = adf_type_map_load_pickled(vfs)
+    t1 = time.time()
+    adf_db = AdfDatabase(vfs)
+    t2 = time.time()
+    adf_db = AdfDatabase(vfs)
+    t3 = time.time()
+    adf_type_registry_cache.clear()
+    adf_db = AdfDatabase(vfs)
+    t4 = time.time()
+    print(f'{n_types} types: unpickle all {t1 - t0:7.3f} s, registry file from pickles {t2 - t1:7.3f} s, '
+          f'load cached {t3 - t2:7.4f} s, load mapped {t4 - t3:7.4f} s')
+
+    lookups = list(typedefs)[::max(1, n_types // 100)]
+    t0 = time.time()
+    for k in lookups:
+        assert typedef_fields(adf_db.type_map_def[k]) == typedef_fields(typedefs[k])
+    t1 = time.time()
+    print(f'  {len(lookups)} types unpacked on first use in {t1 - t0:7.4f} s')
+
+    # types found by processing are saved packed and bump the registry version
+    td = make_typedef(n_types)
+    adf_db.typedefs_add({td.type_hash: td})
+    assert adf_db.has_type_map_changed()
+    adf_db.save_to_database(vfs)
+    adf_db = AdfDatabase(vfs)
+    assert len(adf_db.type_map_def) == n_types + 1
+    assert all(typedef_fields(adf_db.type_map_def[k]) == typedef_fields(v) for k, v in typedefs.items())
+    assert typedef_fields(adf_db.type_map_def[td.type_hash]) == typedef_fields(td)
+    print(f'  all {len(adf_db.type_map_def)} types identical after adding a type')
+
+    # a type added between the version query and reading the types, the registry is named by the types read
+    db_dir = os.path.dirname(vfs.db_filename)
+    version_before = vfs.adf_type_map_version()
+    td = make_typedef(n_types + 1)
+    vfs.adf_type_map_save({td.type_hash: typedef_pack(td)}, set())
+    vfs.adf_type_map_version = lambda: version_before
+    adf_type_registry_cache.clear()
+    for fn in os.listdir(db_dir):
+        if fn.startswith('adf_types_'):
+            os.remove(os.path.join(db_dir, fn))
+    registry = adf_type_registry_load(vfs)
+    del vfs.adf_type_map_version
+    assert registry.version == vfs.adf_type_map_version() and td.type_hash in registry
+
+    # registries of a later version are kept, a registry removed by another process is written again
+    registry_later = os.path.join(db_dir, 'adf_types_1_{}_0.bin'.format(registry.version[1] + 1))
+    open(registry_later, 'wb').close()
+    registry_files = [fn for fn in os.listdir(db_dir) if fn.startswith('adf_types_')]
+    assert len(registry_files) == 2 and os.path.basename(registry_later) in registry_files
+    os.remove(registry.filename)
+    adf_type_registry_cache.clear()
+    registry = adf_type_registry_load(vfs)
+    assert len(registry) == n_types + 2 and os.path.isfile(registry_later)
+    print('  registry named by the types read, written again when removed, later registries kept')
+
+    vfs.shutdown()
+finally:
+    adf_type_registry_cache.clear()
+    shutil.rmtree(working_dir)
@@ -0,0 +1,82 @@
+import io
+import sys
+import time
+import zlib
+import multiprocessing
+import concurrent.futures
+import numpy as np
+import zstandard as zstd
+from deca.ff_types import compression_v4_01_zlib, compression_v4_03_zstd
+from deca.decompress import blocks_decompress, blocks_decompress_parallel
+
+
+size_u = 64 * 1024 * 1024
+block_size = 64 * 1024
+
+if len(sys.argv) > 1:
+    size_u = int(sys.argv[1]) * 1024 * 1024
+if len(sys.argv) > 2:
+    block_size = int(sys.argv[2]) * 1024
+
+n_threads = multiprocessing.cpu_count()
+executor = concurrent.futures.ThreadPoolExecutor(max_workers=n_threads)
+
+
+def make_archive(compression_type):
+    # semi compressible data, random bytes from a small alphabet
+    rng = np.random.default_rng(0)
+    data = rng.integers(0, 16, size=size_u, dtype=np.uint8).tobytes()
+
+    if compression_type == compression_v4_01_zlib:
+        compress = zlib.compress
+    else:
+        compress = zstd.ZstdCompressor(level=3).compress
+
+    archive = io.BytesIO()
+    blocks = []
+    for pos in range(0, size_u, block_size):
+        block_in = data[pos:pos + block_size]
+        block_c = compress(block_in)
+        blocks.append((archive.tell(), len(block_c), len(block_in)))
+        archive.write(block_c)
+
+    return data, archive.getvalue(), blocks
+
+
+def blocks_decompress_concat(f_in, blocks, compression_type):
+    # previous implementation, repeated bytes concatenation
+    buffer_out = b''
+    for block_offset, compressed_len, uncompressed_len in blocks:
+        f_in.seek(block_offset)
+        in_buffer = f_in.read(compressed_len)
+        if compression_type == compression_v4_01_zlib:
+            buffer_ret = zlib.decompress(in_buffer)
+        else:
+            buffer_ret = zstd.ZstdDecompressor().decompress(in_buffer)
+        buffer_out = buffer_out + buffer_ret
+    return buffer_out
+
+
+for name, compression_type in [('zlib', compression_v4_01_zlib), ('zstd', compression_v4_03_zstd)]:
+    data, archive, blocks = make_archive(compression_type)
+    mib = size_u / (1024 * 1024)
+
+    t0 = time.time()
+    buffer_concat = blocks_decompress_concat(io.BytesIO(archive), blocks, compression_type)
+    t1 = time.time()
+    buffer_pre, good_blocks, bad_blocks = blocks_decompress(io.BytesIO(archive), blocks, compression_type)
+    t2 = time.time()
+    buffer_par, _, _ = blocks_decompress_parallel(io.BytesIO(archive), blocks, compression_type, executor)
+    t3 = time.time()
+
+    assert buffer_concat == data
+    assert buffer_pre == data
+    assert buffer_par == data
+    assert len(good_blocks) == len(blocks) and len(bad_blocks) == 0
+
+    print(f'{name}: {mib:.0f} MiB in {len(blocks)} blocks')
+    print(f'  concat:       {t1 - t0:8.3f} s {mib / (t1 - t0):8.1f} MiB/s')
+    print(f'  preallocated: {t2 - t1:8.3f} s {mib / (t2 - t1):8.1f} MiB/s')
+    print(f'  parallel({n_threads:2d}): {t3 - t2:8.3f} s {mib / (t3 - t2):8.1f} MiB/s')
+
+executor.shutdown()
@@ -0,0 +1,102 @@
+import sys
+import time
+import shutil
+import tempfile
+from deca.db_core import VfsDatabase, VfsNode, core_nodes_all_fields, db_from_vfs_node
+from deca.db_types import make_hash_string_tuples, to_str, to_bytes
+from deca.util import Logger
+
+
+# python process_db_bulk_insert.py ../work/gz/project.json [n_strings] [n_nodes]
+project_file = sys.argv[1]
+n_strings = 1000000
+n_nodes = 500000
+
+if len(sys.argv) > 2:
+    n_strings = int(sys.argv[2])
+if len(sys.argv) > 3:
+    n_nodes = int(sys.argv[3])
+
+
+def hash_string_add_many_basic_per_row(db, hash_list):
+    # previous implementation, one query per unique string after the insert
+    hash_list_str = [(to_str(h[0]), h[1], h[2], h[3], h[4]) for h in hash_list]
+    hash_list_str_unique = list(set(hash_list_str))
+    db.db_execute_many("INSERT OR IGNORE INTO core_strings VALUES (?,?,?,?,?)", hash_list_str_unique)
+    db.db_conn.commit()
+
+    str_to_row_map = {}
+    for rec in hash_list_str_unique:
+        result = db.db_query_all(
+            "SELECT rowid FROM core_strings WHERE string=(?) and hash32=(?) and hash48=(?) and hash64=(?) and ext_hash32=(?)",
+            rec)
+        str_to_row_map[to_bytes(rec[0])] = result[0][0]
+    return str_to_row_map
+
+
+def nodes_add_many_per_row(db, nodes):
+    # previous implementation, one query per node with blocks after the insert
+    db.db_execute_many(
+        f"insert into core_nodes values {core_nodes_all_fields}", [db_from_vfs_node(node) for node in nodes])
+    db.db_conn.commit()
+
+    blocks = []
+    for node in nodes:
+        result = db.db_query_all(
+            "SELECT node_id FROM core_nodes WHERE parent_id=(?) and parent_index=(?)", [node.pid, node.index])
+        node.uid = result[0][0]
+        for bi, block in enumerate(node.blocks_raw()):
+            blocks.append((node.uid, bi, block[0], block[1], block[2]))
+    db.db_execute_many("insert into core_node_blocks values (?,?,?,?,?)", blocks)
+    db.db_conn.commit()
+
+
+def make_nodes(pid, n):
+    return [
+        VfsNode(pid=pid, index=i, offset=i * 0x10000, size_c=0x8000, size_u=0x10000,
+                blocks=[(i * 0x10000, 0x8000, 0x10000)])
+        for i in range(n)
+    ]
+
+
+def db_open(working_dir):
+    db = VfsDatabase(project_file, working_dir, Logger(None))
+    return db
+
+
+strings = [f'models/bench/{i // 1000:04d}/bench_model_{i:08d}.modelc'.encode('ascii') for i in range(n_strings)]
+hash_list = make_hash_string_tuples(strings)
+
+# each method starts from an empty database
+results = {}
+for name in ['per row select', 'join select']:
+    working_dir = tempfile.mkdtemp() + '/'
+    try:
+        db = db_open(working_dir)
+
+        t0 = time.time()
+        if name == 'per row select':
+            str_to_row_map = hash_string_add_many_basic_per_row(db, hash_list)
+        else:
+            _, _, str_to_row_map = db.hash_string_add_many_basic(hash_list)
+        t1 = time.time()
+        assert len(str_to_row_map) == n_strings
+
+        nodes = make_nodes(1, n_nodes)
+        t2 = time.time()
+        if name == 'per row select':
+            nodes_add_many_per_row(db, nodes)
+        else:
+            db.nodes_add_many(nodes)
+        t3 = time.time()
+        assert len(set(node.uid for node in nodes)) == n_nodes
+
+        results[name] = (t1 - t0, t3 - t2)
+        db.shutdown()
+    finally:
+        shutil.rmtree(working_dir)
+
+print(f'{n_strings} strings, {n_nodes} blocked nodes')
+for name, (t_strings, t_nodes) in results.items():
+    print(f'  {name:15s} strings: {t_strings:8.3f} s {n_strings / t_strings:10.0f}/s, '
+          f'nodes: {t_nodes:8.3f} s {n_nodes / t_nodes:10.0f}/s')
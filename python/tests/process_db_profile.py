@@ -0,0 +1,38 @@
+import sys
+import time
+import shutil
+import tempfile
+from deca.db_processor import VfsProcessor
+from deca.db_types import db_profile_default, db_profile_sqlite
+from deca.util import Logger
+
+
+# full processing of a project with the SQLite defaults and with the default deca profile
+#   python process_db_profile.py ../work/gz/project.json
+project_file = sys.argv[1]
+
+results = {}
+for name, db_profile in [('sqlite defaults', db_profile_sqlite), ('deca profile', db_profile_default)]:
+    # cross_game.db is created next to the working directory, keep it out of the way too
+    root_dir = tempfile.mkdtemp()
+    working_dir = root_dir + '/work/'
+    try:
+        logger = Logger(working_dir)
+        t0 = time.time()
+        vfs = VfsProcessor(project_file, working_dir, logger, db_profile=db_profile)
+        try:
+            vfs.process()
+        except IndexError:
+            # the equipment and translation lookups after processing need files of a full game install
+            pass
+        t1 = time.time()
+        assert vfs.db_query_one("PRAGMA user_version")[0] == 2
+        n_nodes = vfs.db_query_one("SELECT COUNT(*) FROM core_nodes")[0]
+        n_strings = vfs.db_query_one("SELECT COUNT(*) FROM core_strings")[0]
+        vfs.shutdown()
+        results[name] = (t1 - t0, n_nodes, n_strings)
+    finally:
+        shutil.rmtree(root_dir)
+
+for name, (t, n_nodes, n_strings) in results.items():
+    print(f'{name:16s}: {t:8.1f} s, {n_nodes} nodes, {n_strings} strings')
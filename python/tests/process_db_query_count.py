@@ -0,0 +1,112 @@
+import sys
+import time
+import shutil
+import tempfile
+from deca.db_core import VfsDatabase, VfsNode
+from deca.decompress_cache import DecompressCacheDir
+from deca.util import Logger
+
+
+# python process_db_query_count.py ../work/gz/project.json [n_archives] [n_files] [n_entries]
+project_file = sys.argv[1]
+n_archives = 20
+n_files = 500
+n_entries = 10
+
+if len(sys.argv) > 2:
+    n_archives = int(sys.argv[2])
+if len(sys.argv) > 3:
+    n_files = int(sys.argv[3])
+if len(sys.argv) > 4:
+    n_entries = int(sys.argv[4])
+
+
+def add_level(vfs, pids, n, name):
+    nodes = []
+    for pid in pids:
+        for i in range(n):
+            nodes.append(VfsNode(
+                pid=pid, index=i, v_path=f'{name}_{pid}_{i:04d}'.encode('ascii'),
+                p_path=f'/game/{name}_{i:04d}' if pid is None else None,
+                v_hash=(len(nodes) * 0x9E3779B1) & 0xFFFFFFFF, offset=i, size_c=1, size_u=1))
+    vfs.nodes_add_many(nodes)
+    # nodes_add_many only sets the uids of nodes with blocks, the new nodes are the last rows
+    uids = vfs.db_query_all("SELECT node_id FROM core_nodes ORDER BY node_id DESC LIMIT ?", [len(nodes)])
+    return [v[0] for v in reversed(uids)]
+
+
+def ancestors_per_node(vfs, uid):
+    # previous implementation, a query for each step up the parent chain
+    chain = []
+    node = vfs.node_where_uid(uid)
+    while node is not None:
+        chain.append(node)
+        node = None if node.pid is None else vfs.node_where_uid(node.pid)
+    return chain
+
+
+def measure(vfs, name, func_old, func_new):
+    q0 = vfs.db_query_count
+    t0 = time.time()
+    result_old = func_old()
+    t1 = time.time()
+    q1 = vfs.db_query_count
+    result_new = func_new()
+    t2 = time.time()
+    q2 = vfs.db_query_count
+    assert result_old == result_new, name
+    print(f'  {name:24s} per node {q1 - q0:8d} queries {t1 - t0:7.3f} s, '
+          f'batched {q2 - q1:8d} queries {t2 - t1:7.3f} s')
+
+
+def uids_of(nodes):
+    return [None if node is None else node.uid for node in nodes]
+
+
+working_dir = tempfile.mkdtemp() + '/'
+try:
+    vfs = VfsDatabase(project_file, working_dir, Logger(None))
+    archives = add_level(vfs, [None], n_archives, 'archive')
+    files = add_level(vfs, archives, n_files, 'file')
+    entries = add_level(vfs, files, n_entries, 'entry')
+    vfs.db_indexes_deferred_create()
+    print(f'{len(archives)} archives, {len(files)} files, {len(entries)} entries')
+
+    # loop_over_uid_wrapper, node of each uid of a work unit
+    measure(
+        vfs, 'loop_over_uid',
+        lambda: uids_of([vfs.node_where_uid(uid) for uid in entries]),
+        lambda: uids_of(vfs.nodes_where_uids(entries)))
+
+    # error reporting of loop_over_uid_wrapper and the cache file names, chain of parents
+    sample = entries[::max(1, len(entries) // 2000)]
+    measure(
+        vfs, 'ancestor chains',
+        lambda: [uids_of(ancestors_per_node(vfs, uid)) for uid in sample],
+        lambda: [uids_of(vfs.node_ancestors_where_uid(uid)) for uid in sample])
+
+    # build_dir, parent of every node to build
+    measure(
+        vfs, 'build parents',
+        lambda: {uid: vfs.node_where_uid(vfs.node_where_uid(uid).pid).uid for uid in entries},
+        lambda: (lambda ancestors: {uid: ancestors[ancestors[uid].pid].uid for uid in entries})(
+            vfs.nodes_ancestors_where_uids(entries)))
+
+    # children of each file
+    measure(
+        vfs, 'children',
+        lambda: {pid: uids_of(vfs.nodes_where_match(pid_in=pid)) for pid in files},
+        lambda: {pid: uids_of(nodes) for pid, nodes in vfs.nodes_where_pids(files).items()})
+
+    # cache file name, walks up from the node of every entry
+    cache = DecompressCacheDir(vfs)
+    sample_nodes = vfs.nodes_where_uids(sample)
+    q0 = vfs.db_query_count
+    t0 = time.time()
+    file_names = [cache.file_name(node) for node in sample_nodes]
+    t1 = time.time()
+    print(f'  {"cache file names":24s} {len(file_names)} names, {vfs.db_query_count - q0} queries {t1 - t0:7.3f} s')
+
+    vfs.shutdown()
+finally:
+    shutil.rmtree(working_dir)
@@ -0,0 +1,151 @@
+import os
+import sys
+import time
+import shutil
+import struct
+import tempfile
+import tracemalloc
+import numpy as np
+from io import BytesIO
+from deca.errors import EDecaMissingAdfType
+from deca.file import ArchiveFile
+from deca.ff_adf import Adf, AdfDatabase, typedef_u32, typedef_f32
+
+
+# python process_exe_scan.py [exe size in MiB] [number of ADFs]
+exe_size = 32
+n_adfs = 500
+
+if len(sys.argv) > 1:
+    exe_size = int(sys.argv[1])
+if len(sys.argv) > 2:
+    n_adfs = int(sys.argv[2])
+
+type_missing_hash = 0x0BADC0DE
+
+
+def make_adf(i):
+    """
+    ADF with a struct type of its own and an instance of it, every 10th also has an instance of the struct of the
+    previous ADF, every 50th one of a type that is in no ADF
+    """
+    names = [b'Id', b'Value', f'Type_{i}'.encode('ascii'), f'Instance_{i}'.encode('ascii')]
+    type_hash = 0x10000 + i
+    typedefs = [struct.pack(
+        '<IIIIQIIII', 1, 8, 4, type_hash, 2, 0, 0, 0, 2) +
+        struct.pack('<QIIIIQ', 0, typedef_u32, 4, 0, 0, 0) +
+        struct.pack('<QIIIIQ', 1, typedef_f32, 4, 4, 0, 0)]
+    instances = [(type_hash, struct.pack('<If', i, i * 0.5))]
+    if i % 10 == 9:
+        instances.append((type_hash - 1, struct.pack('<If', i - 1, 0.0)))
+    if i % 50 == 49:
+        instances.append((type_missing_hash, struct.pack('<I', i)))
+
+    comment = b'synthetic\x00'
+    name_table_offset = 0x40 + len(comment)
+    name_table = bytes(len(n) for n in names) + b''.join(n + b'\x00' for n in names)
+    typedef_offset = name_table_offset + len(name_table)
+    typedef_table = b''.join(typedefs)
+    instance_offset = typedef_offset + len(typedef_table)
+    data_offset = instance_offset + len(instances) * 24
+    instance_table = b''
+    data = b''
+    for type_id, value in instances:
+        instance_table += struct.pack('<IIIIQ', 0xA000 + i, type_id, data_offset + len(data), len(value), 3)
+        data += value
+    total_size = data_offset + len(data)
+
+    header = struct.pack(
+        '<4sIIIIIIIIIIIIIII', b' FDA', 4, len(instances), instance_offset, len(typedefs), typedef_offset,
+        0, 0, len(names), name_table_offset, total_size, 0, 0, 0, 0, 0)
+    return header + comment + name_table + typedef_table + instance_table + data
+
+
+def process_adf_in_exe_copy(exepath):
+    # before: the EXE read into memory, the rest of it copied for each ADF
+    adf_db = AdfDatabase()
+    adf_sub_files = []
+    type_missing = set()
+    with open(exepath, 'rb') as f:
+        exe = f.read()
+    poss = 0
+    while True:
+        poss = exe.find(b' FDA\x04\x00\x00\x00', poss + 1)
+        if poss < 0:
+            break
+        with ArchiveFile(BytesIO(exe[poss:])) as f:
+            try:
+                adf = Adf()
+                adf.deserialize(f, map_typedef=adf_db.type_map_def, type_plans=adf_db.type_plans)
+            except EDecaMissingAdfType as ae:
+                type_missing.add(ae.type_id)
+        adf_sub_files.append((poss, adf.total_size))
+        adf_db.typedefs_add(adf.map_typedef)
+    return adf_sub_files, type_missing, adf_db.type_map_new_packed()
+
+
+def measure(title, func):
+    tracemalloc.start()
+    t0 = time.time()
+    result = func()
+    t1 = time.time()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f'{title:24s} {t1 - t0:8.3f} s, peak {peak / 2**20:8.1f} MiB')
+    return result
+
+
+def process_adf_in_exe_mapped(exepath, cache_dir=None):
+    adf_db = AdfDatabase()
+    adf_sub_files = adf_db.process_adf_in_exe(exepath, 1, cache_dir)
+    type_missing = {type_id for type_id, _ in adf_db.type_missing}
+    return adf_sub_files, type_missing, adf_db.type_map_new_packed()
+
+
+working_dir = tempfile.mkdtemp()
+try:
+    exepath = os.path.join(working_dir, 'game.exe')
+    rng = np.random.default_rng(0)
+    exe = bytearray(rng.integers(0, 256, exe_size * 2**20, dtype=np.uint8).tobytes())
+    offsets = np.sort(rng.choice(len(exe) // 1024 - 1, n_adfs, replace=False)) * 1024 + 512
+    for i, offset in enumerate(offsets.tolist()):
+        blob = make_adf(i)
+        exe[offset:offset + len(blob)] = blob
+    with open(exepath, 'wb') as f:
+        f.write(exe)
+    del exe
+    print(f'EXE of {exe_size} MiB with {n_adfs} ADFs')
+
+    expected = measure('copy per ADF', lambda: process_adf_in_exe_copy(exepath))
+    assert [offset for offset, _ in expected[0]] == offsets.tolist()
+    assert expected[1] == {type_missing_hash}
+    assert len(expected[2]) == n_adfs
+
+    cache_dir = os.path.join(working_dir, 'db')
+    os.makedirs(cache_dir)
+    results = [
+        measure('mapped', lambda: process_adf_in_exe_mapped(exepath)),
+        measure('mapped, cache saved', lambda: process_adf_in_exe_mapped(exepath, cache_dir)),
+        measure('cache loaded', lambda: process_adf_in_exe_mapped(exepath, cache_dir)),
+    ]
+    assert len(os.listdir(cache_dir)) == 1
+    for result in results:
+        assert result == expected
+    print('  ADFs, missing types and packed types identical')
+
+    # a changed EXE is scanned again
+    with open(exepath, 'r+b') as f:
+        f.seek(int(offsets[0]))
+        f.write(b'\x00')
+    cache_files = os.listdir(cache_dir)
+    result = measure('changed EXE', lambda: process_adf_in_exe_mapped(exepath, cache_dir))
+    assert result[0] == expected[0][1:]
+    # the scan of the old EXE is replaced
+    assert len(os.listdir(cache_dir)) == 1 and os.listdir(cache_dir) != cache_files
+
+    # an empty EXE has no ADFs
+    exepath_empty = os.path.join(working_dir, 'empty.exe')
+    open(exepath_empty, 'wb').close()
+    assert process_adf_in_exe_mapped(exepath_empty, cache_dir) == ([], set(), {})
+finally:
+    shutil.rmtree(working_dir)
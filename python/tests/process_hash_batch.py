@@ -0,0 +1,41 @@
+import sys
+import time
+import numpy as np
+from deca.hashes import hash_all_func, hash32_func, hash_all_batch
+from deca.db_types import make_hash_string_tuple, make_hash_string_tuples
+
+
+n_strings = 200000
+
+if len(sys.argv) > 1:
+    n_strings = int(sys.argv[1])
+
+# path like strings with an extension
+rng = np.random.default_rng(0)
+alphabet = np.frombuffer(b'abcdefghijklmnopqrstuvwxyz0123456789_/', dtype=np.uint8)
+strings = [
+    bytes(alphabet[rng.integers(0, len(alphabet), size=rng.integers(8, 96))]) + b'.ddsc'
+    for i in range(n_strings)
+]
+
+# first call compiles
+hash_all_batch(strings[:16])
+
+t0 = time.time()
+tuples_single = [make_hash_string_tuple(s) for s in strings]
+t1 = time.time()
+tuples_batch = make_hash_string_tuples(strings)
+t2 = time.time()
+
+assert tuples_single == tuples_batch
+
+print(f'{n_strings} strings')
+print(f'  make_hash_string_tuple:  {t1 - t0:8.3f} s {n_strings / (t1 - t0):12.0f} strings/s')
+print(f'  make_hash_string_tuples: {t2 - t1:8.3f} s {n_strings / (t2 - t1):12.0f} strings/s')
+
+# worker processes forked after the parallel batch ran, the process has to exit afterwards
+if __name__ == '__main__':
+    import multiprocessing
+    with multiprocessing.Pool(2) as pool:
+        assert pool.map(len, strings[:4]) == [len(s) for s in strings[:4]]
+    print('  worker processes forked after the parallel batch')
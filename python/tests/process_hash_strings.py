@@ -0,0 +1,77 @@
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+from deca.db_core import VfsDatabase
+from deca.db_wrap import DbWrap
+from deca.ff_rtpc import FieldNameMap
+from deca.util import Logger
+
+
+# python process_hash_strings.py ../work/gz/project.json [n_strings] [n_lookups]
+project_file = sys.argv[1]
+n_strings = 500000
+n_lookups = 200000
+
+if len(sys.argv) > 2:
+    n_strings = int(sys.argv[2])
+if len(sys.argv) > 3:
+    n_lookups = int(sys.argv[3])
+
+
+class FieldNameMapQuery:
+    # previous implementation, a query for every hash not seen by this instance
+    def __init__(self, vfs):
+        self._vfs = vfs
+        self._dicts = {'hash32': {}, 'hash48': {}, 'hash64': {}}
+
+    def lookup(self, column, hash_value):
+        d = self._dicts[column]
+        v = d.get(hash_value, ())
+        if v == ():
+            v = self._vfs.hash_string_match(**{column: hash_value})
+            v = v[0][1].decode('utf-8') if len(v) > 0 else None
+            d[hash_value] = v
+        return v
+
+
+working_dir = tempfile.mkdtemp() + '/'
+try:
+    vfs = VfsDatabase(project_file, working_dir, Logger(None))
+    with DbWrap(vfs) as db:
+        for i in range(n_strings):
+            db.propose_string(f'Field_{i:07d}', None, is_field_name=True)
+    vfs.db_indexes_deferred_create()
+
+    rows = vfs.db_query_all("SELECT hash32, hash48, hash64 FROM core_strings")
+    rng = np.random.default_rng(0)
+    picks = rng.integers(0, len(rows), n_lookups).tolist()
+    misses = rng.integers(0, 2**31, n_lookups // 4).tolist()
+
+    for k, column in enumerate(['hash32', 'hash48', 'hash64']):
+        hashes = [rows[i][k] for i in picks] + misses
+
+        field_map = FieldNameMapQuery(vfs)
+        q0 = vfs.db_query_count
+        t0 = time.time()
+        result_query = [field_map.lookup(column, h) for h in hashes]
+        t1 = time.time()
+        q1 = vfs.db_query_count
+
+        vfs.hash_string_resolver_changed()
+        resolver = vfs.hash_string_resolver()
+        t2 = time.time()
+        field_map = FieldNameMap(vfs)
+        result_resolver = [field_map.lookup(**{column: h}) for h in hashes]
+        t3 = time.time()
+        q2 = vfs.db_query_count
+
+        assert result_query == result_resolver
+        print(f'{column}: {len(hashes)} lookups: query per hash {q1 - q0:7d} queries {t1 - t0:7.3f} s, '
+              f'resolver {q2 - q1:3d} queries {t3 - t1:7.3f} s (built in {t2 - t1:.3f} s, '
+              f'{resolver.nbytes() / 1024**2:.1f} MiB)')
+
+    vfs.shutdown()
+finally:
+    shutil.rmtree(working_dir)
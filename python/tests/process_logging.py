@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+import queue
+import shutil
+import datetime
+import tempfile
+from deca.db_commands import MultiProcessVfsBase
+from deca.util import Logger, log_level_log
+
+
+# python process_logging.py [n_messages]
+n_messages = 200000
+
+if len(sys.argv) > 1:
+    n_messages = int(sys.argv[1])
+
+
+class LoggerPerLine:
+    # previous implementation, the file is opened for every message
+    def __init__(self, working_dir):
+        self.working_dir = working_dir
+
+    def trace(self, s):
+        msg = '{}: {}'.format(datetime.datetime.now(), s)
+        with open(self.working_dir + 'log.txt', 'a') as f:
+            f.write(msg + '\n')
+
+
+working_dir_old = tempfile.mkdtemp() + '/'
+working_dir_new = tempfile.mkdtemp() + '/'
+try:
+    logger = LoggerPerLine(working_dir_old)
+    t0 = time.time()
+    for i in range(n_messages):
+        logger.trace(f'Processing SARC: {i}')
+    t1 = time.time()
+
+    logger = Logger(working_dir_new)
+    t2 = time.time()
+    for i in range(n_messages):
+        logger.trace(f'Processing SARC: {i}')
+    t3 = time.time()
+    logger.flush()
+    t4 = time.time()
+    logger.shutdown()
+
+    with open(working_dir_old + 'log.txt') as f:
+        lines_old = [line.split(': ', 1)[1] for line in f]
+    with open(working_dir_new + 'log.txt') as f:
+        lines_new = [line.split(': ', 1)[1] for line in f]
+    assert lines_old == lines_new
+    print(f'{n_messages} traces: open per line {t1 - t0:7.3f} s, '
+          f'writer thread {t3 - t2:7.3f} s queued + {t4 - t3:7.3f} s flush, '
+          f'{os.path.getsize(working_dir_new + "log.txt") / 1024**2:.1f} MiB')
+
+    # worker side, traces and per node status the manager would drop are not sent
+    for log_level in [Logger(working_dir_new).level, log_level_log]:
+        q_out = queue.SimpleQueue()
+        p = MultiProcessVfsBase('process_0', None, q_out, log_level=log_level)
+        t0 = time.time()
+        for i in range(n_messages):
+            p.status(i, n_messages)
+            p.trace(f'Processing SARC: {i}')
+        p.status(n_messages, n_messages)
+        t1 = time.time()
+        print(f'  worker log level {log_level}: {2 * n_messages + 1} calls sent {q_out.qsize()} messages '
+              f'in {t1 - t0:7.3f} s')
+
+    # a writer that could not open the log file, flush raises its exception instead of waiting forever
+    logger = Logger(working_dir_new + 'missing/')
+    logger.log('not written')
+    t0 = time.time()
+    try:
+        logger.flush()
+        assert False
+    except FileNotFoundError:
+        pass
+    logger.shutdown()
+    print(f'  flush of a failed writer raised in {time.time() - t0:7.3f} s')
+finally:
+    shutil.rmtree(working_dir_old)
+    shutil.rmtree(working_dir_new)
@@ -0,0 +1,95 @@
+import sys
+import time
+import shutil
+import tempfile
+import tracemalloc
+import numpy as np
+from deca.db_core import VfsDatabase, VfsNode, db_to_vfs_node
+from deca.util import Logger
+
+
+# python process_node_snapshot.py ../work/gz/project.json [n_nodes] [n_lookups]
+project_file = sys.argv[1]
+n_nodes = 1700000
+n_lookups = 100000
+
+if len(sys.argv) > 2:
+    n_nodes = int(sys.argv[2])
+if len(sys.argv) > 3:
+    n_lookups = int(sys.argv[3])
+
+
+def make_nodes(n):
+    nodes = []
+    for i in range(n):
+        nodes.append(VfsNode(
+            pid=1 + i // 1000, index=i % 1000, v_hash=(i * 0x9E3779B1) & 0xFFFFFFFF, ext_hash=0x1234567 + i % 16,
+            v_path=f'models/group_{i // 5000:03d}/item_{i:07d}.modelc'.encode('ascii'),
+            file_type='adf', offset=i * 0x1000, size_c=0x800 + i % 100, size_u=0x1000 + i % 100))
+    return nodes
+
+
+working_dir = tempfile.mkdtemp() + '/'
+try:
+    vfs = VfsDatabase(project_file, working_dir, Logger(None))
+    vfs.nodes_add_many(make_nodes(n_nodes))
+    uid_max = vfs.db_query_one("SELECT MAX(node_id) FROM core_nodes")[0]
+    uids = np.random.default_rng(0).integers(1, uid_max + 1, n_lookups).tolist()
+
+    # memory of a dict of VfsNode, like a cache of every node, and of the snapshot
+    tracemalloc.start()
+    m0 = tracemalloc.get_traced_memory()[0]
+    nodes_dict = {v[0]: db_to_vfs_node(v) for v in vfs.db_query_all("SELECT * FROM core_nodes")}
+    m1 = tracemalloc.get_traced_memory()[0]
+    del nodes_dict
+    m2 = tracemalloc.get_traced_memory()[0]
+    snapshot = vfs.nodes_snapshot()
+    m3 = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    vfs.nodes_snapshot_changed()
+    t0 = time.time()
+    snapshot = vfs.nodes_snapshot()
+    t1 = time.time()
+    print(f'{n_nodes} nodes: dict of VfsNode {(m1 - m0) / 1024**2:8.1f} MiB, '
+          f'snapshot {(m3 - m2) / 1024**2:8.1f} MiB (arrays {snapshot.nbytes() / 1024**2:.1f} MiB), '
+          f'built in {t1 - t0:.3f} s')
+
+    t0 = time.time()
+    nodes_query = [vfs.node_where_uid(uid) for uid in uids]
+    t1 = time.time()
+    nodes_snapshot_one = [vfs.node_snapshot_where_uid(uid) for uid in uids]
+    t2 = time.time()
+    nodes_snapshot = vfs.nodes_snapshot_where_uids(uids)
+    t3 = time.time()
+    nodes_batch = vfs.nodes_where_uids(uids)
+    t4 = time.time()
+
+    for a, b, c, d in zip(nodes_query, nodes_snapshot_one, nodes_snapshot, nodes_batch):
+        assert [getattr(a, k) for k in VfsNode.__slots__] == [getattr(b, k) for k in VfsNode.__slots__]
+        assert [getattr(a, k) for k in VfsNode.__slots__] == [getattr(c, k) for k in VfsNode.__slots__]
+        assert [getattr(a, k) for k in VfsNode.__slots__] == [getattr(d, k) for k in VfsNode.__slots__]
+
+    print(f'{n_lookups} lookups: query per node {t1 - t0:7.3f} s, snapshot per node {t2 - t1:7.3f} s, '
+          f'snapshot batch {t3 - t2:7.3f} s, query batch {t4 - t3:7.3f} s')
+
+    t0 = time.time()
+    children_query = [vfs.nodes_where_match(pid_in=pid, uid_only=True) for pid in range(1, 1001)]
+    t1 = time.time()
+    children_snapshot = [snapshot.uids_where_pid(pid).tolist() for pid in range(1, 1001)]
+    t2 = time.time()
+    assert [sorted(c) for c in children_query] == children_snapshot
+    print(f'1000 children of: query {t1 - t0:7.3f} s, snapshot {t2 - t1:7.3f} s')
+
+    # a change committed by another connection replaces the snapshot
+    other = VfsDatabase(project_file, working_dir, Logger(None))
+    other.db_execute_one("UPDATE core_nodes SET size_u = 7 WHERE node_id = ?", [uids[0]])
+    other.db_conn.commit()
+    other.shutdown()
+    assert vfs.nodes_snapshot() is not snapshot
+    assert vfs.nodes_snapshot_where_uids(uids[:1])[0].size_u == 7
+    print('snapshot built again after a commit of another connection')
+
+    vfs.shutdown()
+finally:
+    shutil.rmtree(working_dir)
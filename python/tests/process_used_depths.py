@@ -0,0 +1,94 @@
+import sys
+import time
+import shutil
+import tempfile
+from deca.db_processor import VfsProcessor
+from deca.db_core import VfsNode, db_to_vfs_node
+from deca.db_wrap import DbWrap
+from deca.util import Logger
+
+
+# python process_used_depths.py ../work/gz/project.json [n_roots] [fan_out] [levels]
+project_file = sys.argv[1]
+n_roots = 100
+fan_out = 6
+levels = 6
+
+if len(sys.argv) > 2:
+    n_roots = int(sys.argv[2])
+if len(sys.argv) > 3:
+    fan_out = int(sys.argv[3])
+if len(sys.argv) > 4:
+    levels = int(sys.argv[4])
+
+
+def update_used_depths_per_level(vfs):
+    # previous implementation, a query and node updates per level
+    level = 0
+    keep_going = True
+    while keep_going:
+        keep_going = False
+        child_nodes = vfs.db_query_all(
+            "SELECT * FROM core_nodes WHERE "
+            "parent_id IN (SELECT node_id FROM core_nodes WHERE used_at_runtime_depth == (?))",
+            [level])
+        child_nodes = [db_to_vfs_node(n) for n in child_nodes]
+        level = level + 1
+        with DbWrap(vfs, logger=vfs) as db:
+            for child_node in child_nodes:
+                if child_node.used_at_runtime_depth is None or child_node.used_at_runtime_depth > level:
+                    keep_going = True
+                    child_node.used_at_runtime_depth = level
+                    db.node_update(child_node)
+
+
+def make_db(working_dir):
+    # archive -> sarc -> adf -> rtpc ... chains, every 7th node is used at runtime
+    vfs = VfsProcessor(project_file, working_dir, Logger(None))
+    pids = [None]
+    n = n_roots
+    for level in range(levels):
+        nodes = [
+            VfsNode(pid=pid, index=i, offset=i, size_c=1, size_u=1)
+            for pid in pids for i in range(n)]
+        vfs.nodes_add_many(nodes)
+        uids = vfs.db_query_all("SELECT node_id FROM core_nodes ORDER BY node_id DESC LIMIT ?", [len(nodes)])
+        pids = [v[0] for v in uids]
+        n = fan_out
+    vfs.db_execute_one("UPDATE core_nodes SET used_at_runtime_depth = 0 WHERE node_id % 7 == 0")
+    vfs.db_conn.commit()
+    return vfs
+
+
+working_dir_old = tempfile.mkdtemp() + '/'
+working_dir_new = tempfile.mkdtemp() + '/'
+try:
+    vfs_old = make_db(working_dir_old)
+    vfs_new = make_db(working_dir_new)
+    n_nodes = vfs_old.db_query_one("SELECT COUNT(*) FROM core_nodes")[0]
+
+    t0 = time.time()
+    update_used_depths_per_level(vfs_old)
+    t1 = time.time()
+    vfs_new.update_used_depths()
+    t2 = time.time()
+
+    depths_old = vfs_old.db_query_all("SELECT node_id, used_at_runtime_depth FROM core_nodes ORDER BY node_id")
+    depths_new = vfs_new.db_query_all("SELECT node_id, used_at_runtime_depth FROM core_nodes ORDER BY node_id")
+    assert depths_old == depths_new
+    n_used = sum(1 for v in depths_new if v[1] is not None)
+    print(f'{n_nodes} nodes, {n_used} used: per level {t1 - t0:7.3f} s, parent array {t2 - t1:7.3f} s')
+
+    # second run, nothing changes
+    t0 = time.time()
+    update_used_depths_per_level(vfs_old)
+    t1 = time.time()
+    vfs_new.update_used_depths()
+    t2 = time.time()
+    print(f'  unchanged: per level {t1 - t0:7.3f} s, parent array {t2 - t1:7.3f} s')
+
+    vfs_old.shutdown()
+    vfs_new.shutdown()
+finally:
+    shutil.rmtree(working_dir_old)
+    shutil.rmtree(working_dir_new)
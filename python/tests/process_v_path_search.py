@@ -0,0 +1,121 @@
+import re
+import sys
+import time
+import shutil
+import tempfile
+from deca.db_core import VfsDatabase, VfsNode
+from deca.db_types import regexp
+from deca.util import Logger
+
+
+# python process_v_path_search.py ../work/gz/project.json [n_nodes]
+project_file = sys.argv[1]
+n_nodes = 1700000
+
+if len(sys.argv) > 2:
+    n_nodes = int(sys.argv[2])
+
+
+def regexp_uncompiled(expr, item):
+    # previous implementation, compiled the pattern and encoded the row for every row
+    if item is None or expr is None:
+        return False
+    if isinstance(expr, str):
+        expr = expr.encode('ascii')
+    if isinstance(item, str):
+        item = item.encode('ascii')
+    reg = re.compile(expr)
+    return reg.search(item) is not None
+
+
+def make_nodes(n):
+    dirs = ['models', 'textures', 'animations', 'sound', 'settings', 'gdc', 'editor/entities', 'terrain']
+    exts = ['modelc', 'meshc', 'ddsc', 'atx1', 'bnk', 'bin', 'blo', 'ee']
+    nodes = []
+    for i in range(n):
+        # about a third of the nodes share a v_path with another node, like files found in several archives
+        k = i if i % 3 else i // 3
+        v_path = f'{dirs[k % 8]}/group_{k // 5000:03d}/item_{k:07d}_lod{k % 4}.{exts[(k // 8) % 8]}'.encode('ascii')
+        nodes.append(VfsNode(pid=1, index=i, v_path=v_path, offset=i, size_c=1, size_u=1))
+    return nodes
+
+
+queries = [
+    ('like', dict(v_path_like='%item_00012%')),
+    ('like ext', dict(v_path_like='%group_012/%.ddsc')),
+    ('regexp', dict(v_path_regexp=r'textures/group_03\d/item_\d+_lod1\.ddsc')),
+    ('regexp short', dict(v_path_regexp=r'_lod[13]\.ee$')),
+]
+
+working_dir = tempfile.mkdtemp() + '/'
+try:
+    vfs = VfsDatabase(project_file, working_dir, Logger(None))
+    vfs.nodes_add_many(make_nodes(n_nodes))
+    vfs.db_indexes_deferred_create()
+
+    t0 = time.time()
+    vfs.v_path_search_update()
+    t1 = time.time()
+    vfs.v_path_search_changed()
+    vfs.v_path_search_update()
+    t2 = time.time()
+    print(f'{n_nodes} nodes, search table filled in {t1 - t0:.3f} s, checked unchanged in {t2 - t1:.3f} s')
+
+    for name, query in queries:
+        # previous implementation, a scan of core_nodes
+        vfs.db_conn.create_function("REGEXP", 2, regexp_uncompiled)
+        where_str, params = vfs.nodes_v_path_where(**query)
+        t0 = time.time()
+        scan = vfs.db_query_all("SELECT node_id FROM core_nodes WHERE " + where_str, params)
+        t1 = time.time()
+
+        vfs.db_conn.create_function("REGEXP", 2, regexp)
+        t2 = time.time()
+        cached = vfs.db_query_all("SELECT node_id FROM core_nodes WHERE " + where_str, params)
+        t3 = time.time()
+        indexed = vfs.nodes_where_match(uid_only=True, **query)
+        t4 = time.time()
+
+        assert sorted(r[0] for r in scan) == sorted(r[0] for r in cached) == sorted(indexed)
+        print(f'  {name:12s} {len(indexed):7d} nodes: scan {t1 - t0:7.3f} s, '
+              f'scan cached regexp {t3 - t2:7.3f} s, search table {t4 - t3:7.3f} s')
+
+    # the triggers keep the search table up to date, a rename, a new node and a removed node
+    vfs.db_execute_one(
+        "UPDATE core_nodes SET v_path = ? WHERE v_path = ?",
+        ['renamed/item_x.ddsc', 'textures/group_000/item_0000001_lod1.modelc'])
+    vfs.nodes_add_many([VfsNode(pid=1, index=n_nodes, v_path=b'added/item_y.ddsc', offset=0, size_c=1, size_u=1)])
+    vfs.db_execute_one("DELETE FROM core_nodes WHERE v_path = ?", ['models/group_000/item_0000000_lod0.modelc'])
+    vfs.db_conn.commit()
+    vfs.v_path_search_changed()
+    t0 = time.time()
+    assert vfs.v_paths_where_match(v_path_like='%item_0000001_lod1%') == []
+    assert vfs.v_paths_where_match(v_path_like='renamed/%') == ['renamed/item_x.ddsc']
+    assert vfs.v_paths_where_match(v_path_like='added/%') == ['added/item_y.ddsc']
+    assert vfs.v_paths_where_match(v_path_like='%item_0000000_%') == []
+    t1 = time.time()
+    print(f'  renamed, added and removed v_paths found without filling the search table again in {t1 - t0:.3f} s')
+
+    # nodes added with the triggers in place, and as a bulk load without them, filled once afterwards
+    nodes = make_nodes(n_nodes // 10)
+    t0 = time.time()
+    vfs.nodes_add_many(nodes)
+    t1 = time.time()
+    vfs.v_path_search_suspend()
+    t2 = time.time()
+    vfs.nodes_add_many(nodes)
+    t3 = time.time()
+    vfs.v_path_search_update()
+    t4 = time.time()
+    print(f'  {len(nodes)} more nodes added with the triggers in {t1 - t0:.3f} s, '
+          f'without them in {t3 - t2:.3f} s, search table filled again in {t4 - t3:.3f} s')
+
+    for name, query in queries:
+        where_str, params = vfs.nodes_v_path_where(**query)
+        scan = vfs.db_query_all("SELECT node_id FROM core_nodes WHERE " + where_str, params)
+        assert sorted(r[0] for r in scan) == sorted(vfs.nodes_where_match(uid_only=True, **query))
+    print('  search table matches a scan of core_nodes')
+
+    vfs.shutdown()
+finally:
+    shutil.rmtree(working_dir)
@@ -0,0 +1,155 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+from deca.db_core import VfsDatabase, VfsNode
+from deca.db_types import node_flag_v_hash_type_4
+from deca.db_wrap import DbWrap
+from deca.db_commands import Processor, LogWrapper
+from deca.ff_types import *
+from deca.util import Logger
+
+
+# python process_vhash_final.py ../work/gz/project.json [n_nodes]
+project_file = sys.argv[1]
+n_nodes = 200000
+
+if len(sys.argv) > 2:
+    n_nodes = int(sys.argv[2])
+
+
+def process_vhash_final_per_hash(processor, v_hash_in, db):
+    # previous implementation, a node, string and reference query per v_hash
+    nodes = db.db().nodes_where_match(v_hash=v_hash_in)
+
+    if db.file_hash_type == node_flag_v_hash_type_4:
+        hash_strings = db.db().hash_string_match(hash32=v_hash_in)
+    else:
+        hash_strings = db.db().hash_string_match(hash64=v_hash_in)
+
+    missed_vpaths = set()
+    h4ref_map = {}
+    for rowid, v_path, _, _, _, _ in hash_strings:
+        missed_vpaths.add(v_path)
+        h4ref_map[rowid] = db.db().hash_string_references_match(hash_row_id=rowid)
+
+    for node in nodes:
+        if node.is_valid():
+            updated = False
+            ftype_int = ftype_list[FTYPE_NO_TYPE if node.file_type is None else node.file_type]
+
+            for rowid, v_path, _, _, _, _ in hash_strings:
+                h4ref = h4ref_map[rowid]
+                if node.v_path is None:
+                    for _, src_node, _, _, possible_ftypes in h4ref:
+                        if possible_ftypes is None or possible_ftypes == 0:
+                            possible_ftypes = ftype_list[FTYPE_ANY_TYPE]
+                        if (ftype_int & possible_ftypes) != 0:
+                            node.v_path = v_path
+                            updated = True
+                            break
+                        else:
+                            processor._comm.log('v_path:skip {} {} {} {} {}'.format(
+                                node.v_hash_to_str(), v_path, node.file_type, possible_ftypes, src_node))
+
+                if node.v_path == v_path:
+                    for _, _, _, used_at_runtime, _ in h4ref:
+                        if used_at_runtime:
+                            node.used_at_runtime_depth = 0
+                            updated = True
+                            break
+
+            if node.file_type is None and node.v_path is not None:
+                file, ext = os.path.splitext(node.v_path)
+                if ext[0:4] == b'.atx':
+                    node.file_type = FTYPE_ATX
+                    updated = True
+                elif ext == b'.hmddsc':
+                    node.file_type = FTYPE_HMDDSC
+                    updated = True
+
+            missed_vpaths.discard(node.v_path)
+
+            if node.ext_hash is None and node.v_path is not None:
+                file, ext = os.path.splitext(node.v_path)
+                node.ext_hash = processor._vfs.ext_hash(ext)
+                updated = True
+
+            if updated:
+                db.node_update(node)
+
+    for v_path in missed_vpaths:
+        v_hash = db.file_hash(v_path)
+        processor._comm.trace('v_path:miss {} {:016X}'.format(v_path, np.uint64(v_hash)))
+
+    return True
+
+
+def make_db(working_dir):
+    vfs = VfsDatabase(project_file, working_dir, Logger(None))
+    exts = ['.modelc', '.atx1', '.atx2', '.hmddsc', '.ee', '.bin']
+    ftypes = [None, FTYPE_ADF, FTYPE_AVTX, FTYPE_TXT, FTYPE_RTPC]
+    paths = [f'models/group_{i // 1000:03d}/item_{i:07d}{exts[i % 6]}' for i in range(n_nodes)]
+    v_hashes = vfs.file_hash_batch(paths)
+    rng = np.random.default_rng(0)
+
+    nodes = []
+    for i, (path, v_hash) in enumerate(zip(paths, v_hashes)):
+        # some files are found in several archives, some already have their name from the archive
+        for k in range(1 + (i % 7 == 0)):
+            nodes.append(VfsNode(
+                v_hash_type=vfs.file_hash_type, v_hash=v_hash, pid=1 + k, index=i,
+                v_path=path.encode('ascii') if i % 11 == 0 else None, file_type=ftypes[(i + k) % 5],
+                offset=i, size_c=1, size_u=1))
+    vfs.nodes_add_many(nodes)
+
+    with DbWrap(vfs) as db:
+        for i, path in enumerate(paths):
+            if i % 5 == 4:
+                continue
+            for k in range(1 + (i % 3 == 0)):
+                possible = [None, FTYPE_ADF, [FTYPE_AVTX, FTYPE_TXT], FTYPE_RTPC][rng.integers(0, 4)]
+                db.propose_string(path, None, possible_file_types=possible, used_at_runtime=bool(rng.integers(0, 2)))
+        for i in range(n_nodes // 10):
+            db.propose_string(f'unused/item_{i:07d}.bin', None)
+    return vfs
+
+
+working_dir_old = tempfile.mkdtemp() + '/'
+working_dir_new = tempfile.mkdtemp() + '/'
+try:
+    vfs_old = make_db(working_dir_old)
+    vfs_new = make_db(working_dir_new)
+    v_hashes = vfs_old.nodes_select_distinct_vhash()
+    assert v_hashes == vfs_new.nodes_select_distinct_vhash()
+    print(f'{n_nodes} paths, {len(v_hashes)} v_hashes')
+
+    processor = Processor(vfs_old, LogWrapper(Logger(None)))
+    q0 = vfs_old.db_query_count
+    t0 = time.time()
+    with DbWrap(vfs_old) as db:
+        for v_hash in v_hashes:
+            process_vhash_final_per_hash(processor, v_hash, db)
+    t1 = time.time()
+    print(f'  per v_hash {vfs_old.db_query_count - q0:8d} queries {t1 - t0:7.3f} s')
+
+    processor = Processor(vfs_new, LogWrapper(Logger(None)))
+    q0 = vfs_new.db_query_count
+    t0 = time.time()
+    processor.process_command('process_vhash_final', [v_hashes])
+    t1 = time.time()
+    print(f'  set based  {vfs_new.db_query_count - q0:8d} queries {t1 - t0:7.3f} s')
+
+    nodes_old = vfs_old.db_query_all("SELECT * FROM core_nodes ORDER BY node_id")
+    nodes_new = vfs_new.db_query_all("SELECT * FROM core_nodes ORDER BY node_id")
+    assert nodes_old == nodes_new
+    n_named = sum(1 for v in nodes_new if v[6] is not None)
+    print(f'  identical core_nodes, {n_named} of {len(nodes_new)} nodes named')
+
+    vfs_old.shutdown()
+    vfs_new.shutdown()
+finally:
+    shutil.rmtree(working_dir_old)
+    shutil.rmtree(working_dir_new)